@@ -10,34 +10,133 @@ How token handling works
   `token="…"` keyword to the helper functions.
 * If the variable / argument is **absent** we fall back to anonymous requests –
   still useful if the service drops auth requirements again.
+* For long syncs pass an `ArcGISTokenProvider(username, password)` as `token`
+  (or `--username` / `ARCGIS_USERNAME` on the CLI).  It calls `generateToken`,
+  caches the token with its expiry and refreshes it on a background thread
+  shortly before it expires; a page rejected with an auth error is retried
+  once with a fresh token instead of aborting the sync.
 
 Public helpers
 --------------
 ```python
 list_activations(code_prefix=None, limit=20, offset=0, *,
-                 cache:Path|None=None, token:str|None=None) -> List[dict]
-activation_by_code(code, *, cache=None, token=None) -> dict|None
+                 cache:Path|None=None, token:str|None=None,
+                 workers:int=1, max_age:float|None=None,
+                 category:str|None=None, since=None, until=None) -> List[dict]
+activation_by_code(code, *, cache=None, token=None, workers=1,
+                   max_age=None) -> dict|None
+sync_activations(*, cache=None, token=None, workers=1) -> int
+iter_activations(…same filters…, limit=0) -> Iterator[dict]
+write_activations(rows, "ndjson"|"csv"|"parquet", output=None) -> int
 ```
-Other exported names: `OntologyClient`, `ActivationsFetchError`, `run_cli`.
+
+`limit=0` (`--limit 0`) means the whole layer.
+
+Concurrent paging
+-----------------
+With `workers > 1` (or `--workers N` on the CLI) the layer size is asked for
+first (`returnCountOnly`) and every `resultOffset` page is then fetched in
+parallel over the shared pooled client (`core.http_client`, which also caps
+connections per host); pages are retried with exponential backoff and merged
+back in offset order, so the result is identical to the serial walk.
+
+Incremental sync
+----------------
+The cache remembers the newest `lastUpdate` / `activationTime` (or object id)
+it has seen.  `sync_activations()` – or `python CEMS.py sync` – asks ArcGIS
+only for features changed since then (`where=` filter) and upserts them by
+`code`.  Pass `max_age=<seconds>` (`--max-age`) to the helpers to delta-sync
+automatically whenever the cache is older than that; without it the cache is
+reused forever as before.  Deletions on the server are not seen by a delta
+sync; drop the cache file to force a full download.
+
+Indexed lookups
+---------------
+Each cached snapshot is loaded once into an `ActivationIndex`: a dict keyed
+by `code`, a sorted code array for `bisect` prefix ranges and secondary
+indexes on `category` and `activationTime`.  `activation_by_code` is a dict
+lookup and `list_activations(category=…, since=…, until=…)` intersects the
+indexes instead of scanning the layer.
+
+SQLite store
+------------
+A `--cache` path ending in `.sqlite`, `.sqlite3` or `.db` selects a WAL-mode
+SQLite store (`SQLiteActivationStore`) with one row per feature instead of
+the JSON blob.  Prefix, category, time-window and offset/limit queries run
+in SQL, nothing is loaded wholesale into memory, and several CLI / Streamlit
+processes can share one file: readers never block and only one writer
+refreshes a stale store while the others wait and reuse its result.
+
+Streaming output
+----------------
+`python CEMS.py list --format ndjson|csv|parquet` streams rows one at a time
+through `iter_activations`; on a cold cache the first rows are written as
+soon as their page arrives instead of after the whole layer (and a full
+`json.dumps`) has been built.  Parquet needs `pyarrow` and `--output`.
+
+Activation graph
+----------------
+`OntologyClient` parses `cems_activations.ttl` once and keeps the graph as a
+snapshot in the shared ontology store (`core.ontology_store`,
+`$ONTOLOGY_CACHE_DIR`), so repeated `python CEMS.py sparql …` calls skip
+the Turtle parse.  `python CEMS.py materialize` (or
+`OntologyClient.sync_activations(rows)`) turns activations into `cems:`
+triples and only adds, replaces or removes the ones whose attributes changed.
+`OntologyClient.run(q, bindings=None, columnar=False)` caches results per
+graph version, reuses compiled (`prepareQuery`) queries with `initBindings`
+and can return one list per variable instead of a list of dicts.
+
+Other exported names: `activation_triples`, `normalize_sparql`, `ActivationIndex`,
+`SQLiteActivationStore`, `ArcGISTokenProvider`, `OntologyClient`,
+`ActivationsFetchError`, `run_cli`.
 """
 from __future__ import annotations
 
 import argparse
+import csv
+import getpass
+import hashlib
 import json
 import os
+import re
+import sqlite3
 import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Union
+from urllib.parse import quote
 
 import pandas as pd
 import requests
-from rdflib import Graph
+from rdflib import Graph, Literal, Namespace
+from rdflib.namespace import RDF, XSD
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.term import Node
+
+from core.http_client import HttpClient, get_client
+from core.ontology_store import OntologyStore, get_ontology_store
+from core.token_refresh import RefreshingToken
 
 __all__ = [
     "list_activations",
+    "iter_activations",
+    "write_activations",
     "activation_by_code",
+    "sync_activations",
+    "ActivationIndex",
+    "SQLiteActivationStore",
     "OntologyClient",
     "ActivationsFetchError",
+    "ArcGISTokenProvider",
+    "activation_triples",
+    "normalize_sparql",
     "run_cli",
 ]
 
@@ -63,6 +162,7 @@ _HEADERS = {
     "Accept": "application/json",
 }
 PAGE_SIZE = 1000  # ArcGIS max features per page without server-side flows
+WATERMARK_FIELDS = ("lastUpdate", "activationTime")  # preferred change markers, in order
 
 # ---------------------------------------------------------------------------
 # Error & cache
@@ -70,98 +170,1009 @@ PAGE_SIZE = 1000  # ArcGIS max features per page without server-side flows
 class ActivationsFetchError(RuntimeError):
     pass
 
+
+class _TokenRejected(ActivationsFetchError):
+    def __init__(self, message: str, token: str | None):
+        super().__init__(message)
+        self.token = token
+
 _CACHE: Dict[str, Any] | None = None
 
 # ---------------------------------------------------------------------------
-# Internal fetch with token + paging
+# Token lifecycle
 # ---------------------------------------------------------------------------
+GENERATE_TOKEN_URL = "https://services-eu1.arcgis.com/sharing/rest/generateToken"
+TOKEN_REFERER = "https://services-eu1.arcgis.com"
+AUTH_ERROR_CODES = {498, 499}  # invalid/expired token, token required
 
-def _download_all_features(token: str | None) -> List[Dict[str, Any]]:
-    features: List[Dict[str, Any]] = []
-    offset = 0
-    while True:
-        params = {
-            **COMMON_PARAMS,
-            "resultRecordCount": PAGE_SIZE,
-            "resultOffset": offset,
+
+class ArcGISTokenProvider(RefreshingToken):
+    """Generates an ArcGIS token and keeps it valid for as long as it is used.
+
+    The token and its expiry are cached; a daemon thread regenerates it
+    ``refresh_margin`` seconds before it expires, so every page request of a
+    long sync picks up a valid token.  Pass an instance wherever a ``token``
+    string is accepted.  A page rejected with an auth error triggers one
+    forced refresh and is retried once.
+    """
+    error = ActivationsFetchError
+    thread_name = "arcgis-token-refresh"
+
+    def __init__(self, username: str, password: str, *, referer: str = TOKEN_REFERER,
+                 url: str = GENERATE_TOKEN_URL, expiration: int = 60,
+                 refresh_margin: float = 300.0, background: bool = True):
+        super().__init__(refresh_margin=refresh_margin, background=background)
+        self.username = username
+        self._password = password
+        self.referer = referer
+        self.url = url
+        self.expiration = expiration  # minutes, as requested from generateToken
+
+    def _request(self) -> tuple[str, float, Dict[str, Any]]:
+        payload = {
+            "f": "json",
+            "username": self.username,
+            "password": self._password,
+            "referer": self.referer,
+            "expiration": self.expiration,
         }
-        if token:
-            params["token"] = token
         try:
-            r = requests.get(BASE_URL, params=params, headers=_HEADERS, timeout=30)
+            r = get_client().post(self.url, data=payload, retry=True, timeout=30)
             r.raise_for_status()
             data = r.json()
         except (requests.RequestException, json.JSONDecodeError) as e:
-            raise ActivationsFetchError(f"ArcGIS request failed → {e}") from None
+            raise ActivationsFetchError(f"ArcGIS token request failed → {e}") from None
+        if "error" in data or "token" not in data:
+            msg = data.get("error", {}).get("message", str(data))
+            raise ActivationsFetchError(f"ArcGIS token error → {msg}")
+        expires = data.get("expires")  # epoch milliseconds
+        return data["token"], expires / 1000 if expires else time.time() + self.expiration * 60, data
+
 
-        if "error" in data:
-            msg = data["error"].get("message", str(data["error"]))
-            raise ActivationsFetchError(f"ArcGIS error → {msg}")
+Token = Union[str, ArcGISTokenProvider, None]
+
+
+def _resolve_token(token: Token) -> str | None:
+    return token.get() if isinstance(token, ArcGISTokenProvider) else token
+
+# ---------------------------------------------------------------------------
+# Internal fetch with token + paging
+# ---------------------------------------------------------------------------
 
-        feats = data.get("features", [])
-        features.extend(feats)
+def _query_layer_once(client: HttpClient, params: Dict[str, Any], token: str | None) -> Dict[str, Any]:
+    params = {**COMMON_PARAMS, **params}
+    if token:
+        params["token"] = token
+    try:
+        # the shared client retries 429/5xx and dropped connections with backoff
+        r = client.get(BASE_URL, params=params, headers=_HEADERS, timeout=30)
+        if r.status_code in (401, 403):
+            raise _TokenRejected(f"HTTP {r.status_code}", token)
+        r.raise_for_status()
+        data = r.json()
+    except (requests.RequestException, json.JSONDecodeError) as e:
+        raise ActivationsFetchError(f"ArcGIS request failed → {e}") from None
+    if "error" in data:
+        msg = data["error"].get("message", str(data["error"]))
+        if data["error"].get("code") in AUTH_ERROR_CODES:
+            raise _TokenRejected(f"ArcGIS error → {msg}", token)
+        raise ActivationsFetchError(f"ArcGIS error → {msg}")
+    return data
+
+
+def _query_layer(client: HttpClient, params: Dict[str, Any], token: Token) -> Dict[str, Any]:
+    try:
+        return _query_layer_once(client, params, _resolve_token(token))
+    except _TokenRejected as e:
+        if not isinstance(token, ArcGISTokenProvider):
+            raise
+        # one retry with a fresh token instead of aborting the whole sync
+        return _query_layer_once(client, params, token.refresh(rejected=e.token))
+
+
+def _fetch_page(client: HttpClient, offset: int, token: Token, where: str = "1=1") -> List[Dict[str, Any]]:
+    data = _query_layer(client, {"where": where, "resultRecordCount": PAGE_SIZE, "resultOffset": offset}, token)
+    return data.get("features", [])
+
+
+def _count_features(client: HttpClient, token: Token, where: str = "1=1") -> int:
+    data = _query_layer(client, {"where": where, "returnCountOnly": "true"}, token)
+    try:
+        return int(data["count"])
+    except (KeyError, TypeError, ValueError):
+        raise ActivationsFetchError(f"ArcGIS count query returned no count → {data}") from None
+
+
+def _iter_serial_pages(client: HttpClient, token: Token, where: str = "1=1", offset: int = 0) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        feats = _fetch_page(client, offset, token, where)
+        yield feats
         if len(feats) < PAGE_SIZE:
             break  # last page reached
         offset += PAGE_SIZE
-    return features
 
 
-def _fetch_activations(cache_path: Path | None = None, token: str | None = None) -> Dict[str, Any]:
+def _iter_concurrent_pages(client: HttpClient, token: Token, workers: int, where: str = "1=1") -> Iterator[List[Dict[str, Any]]]:
+    total = _count_features(client, token, where)
+    offsets = list(range(0, total, PAGE_SIZE))
+    if not offsets:
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(offsets))) as pool:
+        futures = [pool.submit(_fetch_page, client, off, token, where) for off in offsets]
+        try:
+            # yield in offset order as soon as each page is in, not after the last one
+            for fut in futures:
+                last = fut.result()
+                yield last
+        finally:
+            for fut in futures:
+                fut.cancel()
+    # the layer may have grown between the count and the last page
+    if len(last) == PAGE_SIZE:
+        yield from _iter_serial_pages(client, token, where, offsets[-1] + PAGE_SIZE)
+
+
+def _iter_pages(token: Token, workers: int = 1, where: str = "1=1") -> Iterator[List[Dict[str, Any]]]:
+    """Feature pages in layer order, yielded as they arrive."""
+    client = get_client()
+    if workers > 1:
+        yield from _iter_concurrent_pages(client, token, workers, where)
+    else:
+        yield from _iter_serial_pages(client, token, where)
+
+
+def _download_all_features(token: Token, workers: int = 1, where: str = "1=1") -> List[Dict[str, Any]]:
+    return [f for page in _iter_pages(token, workers, where) for f in page]
+
+# ---------------------------------------------------------------------------
+# Incremental (delta) sync
+# ---------------------------------------------------------------------------
+
+def _watermark(feats: List[Dict[str, Any]]) -> Dict[str, Any] | None:
+    """Newest change marker seen in *feats*: a date field if the layer has one, else the object id."""
+    if not feats:
+        return None
+    sample = feats[0]["attributes"]
+    for field in WATERMARK_FIELDS:
+        if field not in sample:
+            continue
+        values = [v for v in (f["attributes"].get(field) for f in feats) if isinstance(v, (int, float))]
+        if values:
+            return {"field": field, "value": max(values), "kind": "date"}
+    oid = next((k for k in sample if k.lower() == "objectid"), None)
+    if oid:
+        values = [f["attributes"][oid] for f in feats if isinstance(f["attributes"].get(oid), int)]
+        if values:
+            return {"field": oid, "value": max(values), "kind": "oid"}
+    return None
+
+
+def _delta_where(mark: Dict[str, Any]) -> str:
+    if mark["kind"] == "date":
+        # ArcGIS dates are epoch milliseconds; standardized SQL wants a UTC TIMESTAMP literal.
+        # ">=" re-reads the boundary record, which the upsert absorbs.
+        ts = datetime.fromtimestamp(mark["value"] / 1000, tz=timezone.utc)
+        return f"{mark['field']} >= TIMESTAMP '{ts:%Y-%m-%d %H:%M:%S}'"
+    return f"{mark['field']} > {int(mark['value'])}"
+
+
+def _upsert(feats: List[Dict[str, Any]], changed: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    by_code = {f["attributes"].get("code"): i for i, f in enumerate(feats)}
+    merged = list(feats)
+    for f in changed:
+        code = f["attributes"].get("code")
+        if code in by_code:
+            merged[by_code[code]] = f
+        else:
+            by_code[code] = len(merged)
+            merged.append(f)
+    return merged
+
+
+def _is_fresh(data: Dict[str, Any], max_age: float | None) -> bool:
+    if max_age is None:
+        return True  # legacy behaviour: a cache never expires
+    synced_at = data.get("sync", {}).get("synced_at")
+    return synced_at is not None and time.time() - synced_at < max_age
+
+
+def _store(data: Dict[str, Any], cache_path: Path | None) -> Dict[str, Any]:
     global _CACHE
+    _CACHE = data
+    if cache_path:
+        cache_path.write_text(json.dumps(data))
+    return data
+
+
+def _iter_fill(cache_path: Path | None, token: Token, workers: int) -> Iterator[List[Dict[str, Any]]]:
+    """Full download that yields each page as it arrives and stores the snapshot at the end."""
+    feats: List[Dict[str, Any]] = []
+    for page in _iter_pages(token, workers):
+        feats.extend(page)
+        yield page
+    _store({"features": feats, "sync": {"synced_at": time.time(), "mark": _watermark(feats)}}, cache_path)
+
+
+def _full_download(cache_path: Path | None, token: Token, workers: int) -> Dict[str, Any]:
+    for _ in _iter_fill(cache_path, token, workers):
+        pass
+    return _CACHE
+
+
+def _delta_sync(data: Dict[str, Any], cache_path: Path | None, token: Token, workers: int) -> Dict[str, Any]:
+    mark = data.get("sync", {}).get("mark") or _watermark(data["features"])
+    if mark is None:
+        return _full_download(cache_path, token, workers)
+    changed = _download_all_features(token, workers, where=_delta_where(mark))
+    feats = _upsert(data["features"], changed)
+    new_mark = _watermark(changed) if changed else None
+    if new_mark is None or new_mark["field"] != mark["field"] or new_mark["value"] < mark["value"]:
+        new_mark = mark
+    return _store({"features": feats, "sync": {"synced_at": time.time(), "mark": new_mark, "last_changed": len(changed)}}, cache_path)
+
+
+def _load_cached(cache_path: Path | None) -> Dict[str, Any] | None:
     if _CACHE is not None:
         return _CACHE
-
     if cache_path and cache_path.exists():
-        _CACHE = json.loads(cache_path.read_text())
-        return _CACHE
+        return json.loads(cache_path.read_text())
+    return None
 
-    feats = _download_all_features(token)
-    _CACHE = {"features": feats}
-    if cache_path:
-        cache_path.write_text(json.dumps(_CACHE))
-    return _CACHE
+
+def _fetch_activations(cache_path: Path | None = None, token: Token = None, workers: int = 1, max_age: float | None = None) -> Dict[str, Any]:
+    global _CACHE
+    data = _load_cached(cache_path)
+    if data is None:
+        return _full_download(cache_path, token, workers)
+    _CACHE = data
+    if _is_fresh(data, max_age):
+        return data
+    return _delta_sync(data, cache_path, token, workers)
+
+
+def sync_activations(*, cache: Path | None = None, token: Token = None, workers: int = 1) -> int:
+    """Pull only the features changed since the last sync into the cache; returns how many changed."""
+    token = token or os.getenv("ARCGIS_TOKEN")
+    if _is_sqlite(cache):
+        return _sqlite_store(cache).refresh(token, workers, force=True) or 0
+    data = _load_cached(cache)
+    if data is None:
+        data = _full_download(cache, token, workers)
+        return len(data["features"])
+    data = _delta_sync(data, cache, token, workers)
+    return data["sync"].get("last_changed", len(data["features"]))
 
 # ---------------------------------------------------------------------------
 # Public helper functions
 # ---------------------------------------------------------------------------
 
-def _filter_prefix(feats: List[Dict[str, Any]], prefix: str | None):
-    return feats if not prefix else [f for f in feats if f["attributes"].get("code", "").startswith(prefix)]
+TimeBound = Union[int, float, str, datetime, None]
+
+
+def _to_epoch_ms(value: TimeBound) -> float | None:
+    """Accept epoch milliseconds, an ISO date/datetime string or a datetime (naive = UTC)."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp() * 1000
+
+
+class ActivationIndex:
+    """Read-only indexes over one snapshot of the activation features.
+
+    * ``by_code``      – dict code → attributes (first occurrence wins, like the old scan)
+    * sorted codes     – prefix queries are a ``bisect`` range, not a ``startswith`` scan
+    * ``by_category``  – category → feature positions
+    * sorted times     – ``activationTime`` windows are a ``bisect`` range
+
+    Query results keep the layer order so paging is unchanged.
+    """
+
+    def __init__(self, features: List[Dict[str, Any]]):
+        self.features = features
+        self.by_code: Dict[str, Dict[str, Any]] = {}
+        self.by_category: Dict[str, List[int]] = {}
+        codes, times = [], []
+        for pos, f in enumerate(features):
+            attrs = f["attributes"]
+            code = attrs.get("code")
+            if code is not None:
+                self.by_code.setdefault(code, attrs)
+                codes.append((code, pos))
+            category = attrs.get("category")
+            if category is not None:
+                self.by_category.setdefault(category, []).append(pos)
+            t = attrs.get("activationTime")
+            if isinstance(t, (int, float)):
+                times.append((t, pos))
+        codes.sort()
+        times.sort()
+        self._code_keys = [c for c, _ in codes]
+        self._code_pos = [p for _, p in codes]
+        self._time_keys = [t for t, _ in times]
+        self._time_pos = [p for _, p in times]
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def get(self, code: str) -> Dict[str, Any] | None:
+        return self.by_code.get(code)
+
+    def _prefix_range(self, prefix: str) -> tuple[int, int]:
+        lo = bisect_left(self._code_keys, prefix)
+        # every string starting with prefix sorts below prefix + U+10FFFF
+        return lo, bisect_left(self._code_keys, prefix + "\U0010ffff", lo)
+
+    def _time_range(self, since: float | None, until: float | None) -> tuple[int, int]:
+        lo = 0 if since is None else bisect_left(self._time_keys, since)
+        hi = len(self._time_keys) if until is None else bisect_right(self._time_keys, until)
+        return lo, hi
+
+    def _iter_positions(self, need: int | None = None, *, code_prefix: str | None = None, category: str | None = None,
+                        since: TimeBound = None, until: TimeBound = None) -> Iterator[int]:
+        """Matching layer positions, lazily and in layer order.
+
+        ``need`` is how many matches the caller will take at most.  The code
+        and time ranges come out of ``bisect`` in key order: a small range is
+        sorted back into layer order, while for a broad one it is cheaper to
+        walk the layer (or the category list, which is in layer order) and
+        stop after ``need`` matches than to sort every match.
+        """
+        since, until = _to_epoch_ms(since), _to_epoch_ms(until)
+        n = len(self.features)
+        checks = []  # (match count, positions, in layer order?, predicate on attributes)
+        if code_prefix:
+            lo, hi = self._prefix_range(code_prefix)
+            checks.append((hi - lo, lambda: self._code_pos[lo:hi], False,
+                           lambda a: str(a.get("code") or "").startswith(code_prefix)))
+        if category is not None:
+            posting = self.by_category.get(category, [])
+            checks.append((len(posting), lambda: posting, True, lambda a: a.get("category") == category))
+        if since is not None or until is not None:
+            t_lo, t_hi = self._time_range(since, until)
+
+            def in_window(a: Dict[str, Any]) -> bool:
+                t = a.get("activationTime")
+                return (isinstance(t, (int, float)) and (since is None or t >= since)
+                        and (until is None or t <= until))
+            checks.append((t_hi - t_lo, lambda: self._time_pos[t_lo:t_hi], False, in_window))
+        if not checks:
+            return iter(range(n))
+        checks.sort(key=lambda c: c[0])
+        k, first, ordered, first_pred = checks[0]
+        if not k:
+            return iter(())
+        if ordered:
+            source, skip = first(), first_pred
+        else:
+            layer = next((c for c in checks if c[2]), None)  # the category list, if filtered on
+            walk_len = layer[0] if layer else n
+            wanted = k if need is None else min(need, k)
+            # sorting costs ~k log k; a walk visits ~wanted / (match density) positions
+            if k * k.bit_length() <= wanted * walk_len / k:
+                source, skip = sorted(first()), first_pred
+            elif layer:
+                source, skip = layer[1](), layer[3]
+            else:
+                source, skip = range(n), None
+        preds = [c[3] for c in checks if c[3] is not skip]
+        feats = self.features
+        return (p for p in source if all(pred(feats[p]["attributes"]) for pred in preds))
+
+    def positions(self, *, code_prefix: str | None = None, category: str | None = None,
+                  since: TimeBound = None, until: TimeBound = None) -> List[int] | range:
+        """Layer positions matching every given filter, in layer order."""
+        if not (code_prefix or category is not None or since is not None or until is not None):
+            return range(len(self.features))
+        return list(self._iter_positions(code_prefix=code_prefix, category=category, since=since, until=until))
+
+    def query(self, *, limit: int = 20, offset: int = 0, **filters) -> List[Dict[str, Any]]:
+        """Matching attributes; ``limit <= 0`` means no limit."""
+        stop = offset + limit if limit > 0 else None
+        pos = self._iter_positions(stop, **filters)
+        return [self.features[p]["attributes"] for p in islice(pos, offset, stop)]
+
+
+_INDEX: ActivationIndex | None = None
+
+
+def _activation_index(data: Dict[str, Any]) -> ActivationIndex:
+    """Index for the current snapshot; rebuilt only when the feature list is replaced."""
+    global _INDEX
+    if _INDEX is None or _INDEX.features is not data["features"]:
+        _INDEX = ActivationIndex(data["features"])
+    return _INDEX
+
+
+# ---------------------------------------------------------------------------
+# SQLite store (shared between processes)
+# ---------------------------------------------------------------------------
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+SQLITE_BUSY_TIMEOUT = 300.0  # seconds a writer waits for the lock, or a full download goes without a page
+FILL_POLL = 0.5  # seconds between checks while another process runs the full download
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS features (
+    pos             INTEGER PRIMARY KEY AUTOINCREMENT,
+    code            TEXT UNIQUE,
+    category        TEXT,
+    activation_time REAL,
+    attributes      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS features_category ON features(category);
+CREATE INDEX IF NOT EXISTS features_activation_time ON features(activation_time);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS features_fill (
+    pos             INTEGER PRIMARY KEY AUTOINCREMENT,
+    code            TEXT UNIQUE,
+    category        TEXT,
+    activation_time REAL,
+    attributes      TEXT NOT NULL
+);
+"""
+
+
+def _is_sqlite(cache_path: Path | None) -> bool:
+    return cache_path is not None and Path(cache_path).suffix.lower() in SQLITE_SUFFIXES
+
+
+def _feature_row(f: Dict[str, Any]) -> tuple:
+    attrs = f["attributes"]
+    t = attrs.get("activationTime")
+    return (
+        attrs.get("code"),
+        attrs.get("category"),
+        t if isinstance(t, (int, float)) else None,
+        json.dumps(attrs),
+    )
+
+
+class SQLiteActivationStore:
+    """One row per feature in a WAL-mode SQLite file.
+
+    Readers never block (WAL); writers serialise on ``BEGIN IMMEDIATE`` and
+    re-check freshness once they hold the lock, so when several CLI or
+    Streamlit processes find the store stale only the first one downloads.
+    A full download commits page by page into ``features_fill`` under a
+    lease in ``meta`` (other processes wait for it) and replaces ``features``
+    in one short transaction at the end, so readers always see a complete
+    layer and no lock is held while pages are downloaded or consumed.
+    Prefix, category, time-window and offset/limit queries run in SQL.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def sync_info(self) -> Dict[str, Any]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'sync'").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _write_rows(self, conn: sqlite3.Connection, feats: List[Dict[str, Any]], table: str = "features"):
+        # ON CONFLICT keeps the row's pos, so updated activations stay in layer order
+        conn.executemany(
+            f"INSERT INTO {table}(code, category, activation_time, attributes) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(code) DO UPDATE SET category = excluded.category, "
+            "activation_time = excluded.activation_time, attributes = excluded.attributes",
+            (_feature_row(f) for f in feats),
+        )
+
+    def _write_sync(self, conn: sqlite3.Connection, sync: Dict[str, Any]):
+        conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('sync', ?)", (json.dumps(sync),))
 
+    def _fill_owner(self) -> str | None:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'fill'").fetchone()
+        lease = json.loads(row[0]) if row else None
+        if lease is None or time.time() - lease["at"] >= SQLITE_BUSY_TIMEOUT:
+            return None  # no fill running, or its process stopped writing pages
+        return lease["owner"]
 
-def list_activations(*, code_prefix: str | None = None, limit: int = 20, offset: int = 0, cache: Path | None = None, token: str | None = None) -> List[Dict[str, Any]]:
+    def _hold_fill(self, conn: sqlite3.Connection, owner: str):
+        """Take or renew the full-download lease (inside a write transaction)."""
+        if self._fill_owner() not in (None, owner):
+            raise ActivationsFetchError("Another process took over the full download of this store")
+        conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('fill', ?)",
+                     (json.dumps({"owner": owner, "at": time.time()}),))
+
+    def _stored_pages(self) -> Iterator[List[Dict[str, Any]]]:
+        page: List[Dict[str, Any]] = []
+        for attrs in self.iter_query(limit=0):
+            page.append({"attributes": attrs})
+            if len(page) == PAGE_SIZE:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def fill_pages(self, token: Token, workers: int = 1) -> Iterator[List[Dict[str, Any]]]:
+        """Full download that commits each page into ``features_fill`` before yielding it.
+
+        The layer replaces ``features`` only after the last page.  If another
+        process is filling the store, waits for it and yields its rows instead.
+        Closing the generator early discards the staged pages.
+        """
+        before = self.sync_info()
+        owner = f"{os.getpid()}.{threading.get_ident()}.{time.time()}"
+        while True:
+            with self._transaction() as conn:
+                info = self.sync_info()
+                synced = bool(info) and info.get("synced_at") != before.get("synced_at")
+                busy = not synced and self._fill_owner() is not None
+                if not synced and not busy:
+                    conn.execute("DELETE FROM features_fill")  # staged by an interrupted fill
+                    self._hold_fill(conn, owner)
+            if synced:
+                yield from self._stored_pages()
+                return
+            if not busy:
+                break
+            time.sleep(FILL_POLL)
+
+        done = False
+        try:
+            marks = []
+            for page in _iter_pages(token, workers):
+                with self._transaction() as conn:
+                    self._hold_fill(conn, owner)
+                    self._write_rows(conn, page, "features_fill")
+                marks.append(_watermark(page))
+                yield page
+            marks = [m for m in marks if m]
+            marks = [m for m in marks if m["field"] == marks[0]["field"]]
+            mark = max(marks, key=lambda m: m["value"]) if marks else None
+            with self._transaction() as conn:
+                self._hold_fill(conn, owner)
+                conn.execute("DELETE FROM features")
+                conn.execute("INSERT INTO features(code, category, activation_time, attributes) "
+                             "SELECT code, category, activation_time, attributes FROM features_fill ORDER BY pos")
+                conn.execute("DELETE FROM features_fill")
+                conn.execute("DELETE FROM meta WHERE key = 'fill'")
+                self._write_sync(conn, {"synced_at": time.time(), "mark": mark})
+            done = True
+        finally:
+            if not done:  # failed, or the consumer stopped early (GeneratorExit)
+                with self._transaction() as conn:
+                    if self._fill_owner() == owner:
+                        conn.execute("DELETE FROM features_fill")
+                        conn.execute("DELETE FROM meta WHERE key = 'fill'")
+
+    def refresh(self, token: Token, workers: int = 1, max_age: float | None = None, force: bool = False) -> int | None:
+        """Bring the store up to date; returns the number of features written, or None if it was fresh."""
+        before = self.sync_info()
+        if not force and before and _is_fresh({"sync": before}, max_age):
+            return None
+        if not before.get("mark"):
+            return sum(len(page) for page in self.fill_pages(token, workers))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            info = self.sync_info()
+            if info.get("synced_at") != before.get("synced_at"):
+                conn.execute("ROLLBACK")  # another process synced while we waited for the lock
+                return None
+            mark = info["mark"]
+            feats = _download_all_features(token, workers, where=_delta_where(mark))
+            new_mark = _watermark(feats) if feats else None
+            if new_mark is None or new_mark["field"] != mark["field"] or new_mark["value"] < mark["value"]:
+                new_mark = mark
+            self._write_rows(conn, feats)
+            self._write_sync(conn, {"synced_at": time.time(), "mark": new_mark, "last_changed": len(feats)})
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(feats)
+
+    def get(self, code: str) -> Dict[str, Any] | None:
+        row = self._conn().execute("SELECT attributes FROM features WHERE code = ?", (code,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_query(self, *, limit: int = 20, offset: int = 0, code_prefix: str | None = None, category: str | None = None,
+                   since: TimeBound = None, until: TimeBound = None) -> Iterator[Dict[str, Any]]:
+        """Matching attributes straight off the cursor; ``limit <= 0`` means no limit."""
+        clauses, args = [], []
+        if code_prefix:
+            clauses.append("code >= ? AND code < ?")
+            args += [code_prefix, code_prefix + "\U0010ffff"]
+        if category is not None:
+            clauses.append("category = ?")
+            args.append(category)
+        since, until = _to_epoch_ms(since), _to_epoch_ms(until)
+        if since is not None:
+            clauses.append("activation_time >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("activation_time <= ?")
+            args.append(until)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        sql = f"SELECT attributes FROM features{where} ORDER BY pos LIMIT ? OFFSET ?"
+        for (attrs,) in self._conn().execute(sql, (*args, limit if limit > 0 else -1, offset)):
+            yield json.loads(attrs)
+
+    def query(self, **kwargs) -> List[Dict[str, Any]]:
+        return list(self.iter_query(**kwargs))
+
+
+_STORES: Dict[Path, SQLiteActivationStore] = {}
+
+
+def _sqlite_store(cache_path: Path) -> SQLiteActivationStore:
+    key = Path(cache_path).resolve()
+    if key not in _STORES:
+        _STORES[key] = SQLiteActivationStore(key)
+    return _STORES[key]
+
+
+def list_activations(*, code_prefix: str | None = None, limit: int = 20, offset: int = 0, cache: Path | None = None, token: Token = None, workers: int = 1, max_age: float | None = None,
+                     category: str | None = None, since: TimeBound = None, until: TimeBound = None) -> List[Dict[str, Any]]:
     token = token or os.getenv("ARCGIS_TOKEN")
-    data = _fetch_activations(cache, token)
-    feats = _filter_prefix(data["features"], code_prefix)
-    sliced = feats[offset : offset + limit]
-    return [f["attributes"] for f in sliced]
+    if _is_sqlite(cache):
+        store = _sqlite_store(cache)
+        store.refresh(token, workers, max_age)
+        return store.query(limit=limit, offset=offset, code_prefix=code_prefix, category=category, since=since, until=until)
+    data = _fetch_activations(cache, token, workers, max_age)
+    index = _activation_index(data)
+    return index.query(limit=limit, offset=offset, code_prefix=code_prefix, category=category, since=since, until=until)
 
 
-def activation_by_code(code: str, *, cache: Path | None = None, token: str | None = None) -> Dict[str, Any] | None:
+def activation_by_code(code: str, *, cache: Path | None = None, token: Token = None, workers: int = 1, max_age: float | None = None) -> Dict[str, Any] | None:
     token = token or os.getenv("ARCGIS_TOKEN")
-    data = _fetch_activations(cache, token)
-    for f in data["features"]:
-        if f["attributes"].get("code") == code:
-            return f["attributes"]
-    return None
+    if _is_sqlite(cache):
+        store = _sqlite_store(cache)
+        store.refresh(token, workers, max_age)
+        return store.get(code)
+    data = _fetch_activations(cache, token, workers, max_age)
+    return _activation_index(data).get(code)
+
+def _row_filter(code_prefix: str | None = None, category: str | None = None,
+                since: TimeBound = None, until: TimeBound = None):
+    since, until = _to_epoch_ms(since), _to_epoch_ms(until)
+
+    def keep(attrs: Dict[str, Any]) -> bool:
+        if code_prefix and not str(attrs.get("code") or "").startswith(code_prefix):
+            return False
+        if category is not None and attrs.get("category") != category:
+            return False
+        if since is not None or until is not None:
+            t = attrs.get("activationTime")
+            if not isinstance(t, (int, float)):
+                return False
+            if (since is not None and t < since) or (until is not None and t > until):
+                return False
+        return True
+
+    return keep
+
+
+def iter_activations(*, code_prefix: str | None = None, limit: int = 0, offset: int = 0, cache: Path | None = None, token: Token = None, workers: int = 1, max_age: float | None = None,
+                     category: str | None = None, since: TimeBound = None, until: TimeBound = None) -> Iterator[Dict[str, Any]]:
+    """Like `list_activations` but yields rows one at a time; ``limit=0`` means the whole layer.
+
+    On a cold cache rows are yielded as soon as their page arrives, before the
+    last page has been downloaded; the rest of the layer is still fetched
+    afterwards so the cache ends up complete.
+    """
+    token = token or os.getenv("ARCGIS_TOKEN")
+    filters = dict(code_prefix=code_prefix, category=category, since=since, until=until)
+    if _is_sqlite(cache):
+        store = _sqlite_store(cache)
+        if store.sync_info():
+            store.refresh(token, workers, max_age)
+            yield from store.iter_query(limit=limit, offset=offset, **filters)
+            return
+        pages = store.fill_pages(token, workers)
+    elif _load_cached(cache) is None:
+        pages = _iter_fill(cache, token, workers)
+    else:
+        data = _fetch_activations(cache, token, workers, max_age)
+        yield from _activation_index(data).query(limit=limit, offset=offset, **filters)
+        return
+    keep = _row_filter(**filters)
+    rows = (f["attributes"] for page in pages for f in page if keep(f["attributes"]))
+    yield from islice(rows, offset, offset + limit if limit > 0 else None)
+    for _ in pages:
+        pass  # finish the download so the cache is stored
 
 # ---------------------------------------------------------------------------
-# Ontology helper (unchanged)
+# Streaming writers (list --format)
+# ---------------------------------------------------------------------------
+STREAM_BATCH = PAGE_SIZE  # rows per flush / Parquet row group
+
+
+def _write_ndjson(rows: Iterator[Dict[str, Any]], out) -> int:
+    n = 0
+    for n, row in enumerate(rows, 1):
+        out.write(json.dumps(row) + "\n")
+        if n % STREAM_BATCH == 0:
+            out.flush()
+    out.flush()
+    return n
+
+
+def _write_csv(rows: Iterator[Dict[str, Any]], out) -> int:
+    n = 0
+    writer = None
+    for n, row in enumerate(rows, 1):
+        if writer is None:
+            # the layer has a fixed schema, so the first row's keys are the header
+            writer = csv.DictWriter(out, fieldnames=list(row), extrasaction="ignore")
+            writer.writeheader()
+        writer.writerow(row)
+        if n % STREAM_BATCH == 0:
+            out.flush()
+    out.flush()
+    return n
+
+
+def _parquet_schema(pa, batch: List[Dict[str, Any]]):
+    """Schema for the whole file, taken from the first batch.
+
+    Known layer fields get their ArcGIS type, and a column that is null in
+    every row of the first batch becomes a string column: left as the
+    inferred ``null`` type it would reject the first value of a later batch.
+    """
+    fields = []
+    for field in pa.Table.from_pylist(batch).schema:
+        if field.name in DATE_FIELDS:
+            field = field.with_type(pa.int64())  # epoch milliseconds
+        elif field.name in ("code", "category", "name") or pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _write_parquet(rows: Iterator[Dict[str, Any]], path: Path) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ActivationsFetchError("--format parquet needs pyarrow (pip install pyarrow)") from None
+    n, writer, batch, text = 0, None, [], []
+
+    def flush():
+        nonlocal writer, text
+        if writer is None:
+            schema = _parquet_schema(pa, batch)
+            text = [f.name for f in schema if pa.types.is_string(f.type)]
+            writer = pq.ParquetWriter(str(path), schema)
+        for row in batch:
+            for name in text:
+                value = row.get(name)
+                if value is not None and not isinstance(value, str):
+                    row[name] = str(value)
+        writer.write_table(pa.Table.from_pylist(batch, schema=writer.schema))
+        batch.clear()
+
+    try:
+        for n, row in enumerate(rows, 1):
+            batch.append(dict(row))
+            if len(batch) == STREAM_BATCH:
+                flush()
+        if batch:
+            flush()
+    except BaseException as e:
+        if writer is not None:
+            writer.close()
+        Path(path).unlink(missing_ok=True)  # no truncated file left behind
+        if isinstance(e, pa.ArrowException):
+            raise ActivationsFetchError(f"Parquet export failed → {e}") from None
+        raise
+    if writer is not None:
+        writer.close()
+    return n
+
+
+def write_activations(rows: Iterator[Dict[str, Any]], fmt: str, output: Path | None = None) -> int:
+    """Stream *rows* as ndjson, csv or parquet to *output* (stdout for the text formats); returns the row count."""
+    if fmt == "parquet":
+        if output is None:
+            raise ActivationsFetchError("--format parquet needs --output FILE")
+        return _write_parquet(rows, output)
+    writer = {"ndjson": _write_ndjson, "csv": _write_csv}[fmt]
+    if output is None:
+        return writer(rows, sys.stdout)
+    with open(output, "w", encoding="utf-8", newline="") as out:
+        return writer(rows, out)
+
+# ---------------------------------------------------------------------------
+# Ontology helper
 # ---------------------------------------------------------------------------
 DEFAULT_TTL = Path("cems_activations.ttl")
+CEMS_NS = Namespace("http://example.org/cems#")
+DATE_FIELDS = {"activationTime", "lastUpdate", "eventTime", "closed"}  # ArcGIS epoch-ms attributes
+
+
+def _snapshot_name(ttl_path: Path) -> str:
+    """Store name of the graph built from *ttl_path* (one per file location)."""
+    return f"{ttl_path.name}-{hashlib.sha1(str(ttl_path.resolve()).encode('utf-8')).hexdigest()[:12]}"
+
+
+def _attributes_digest(attrs: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(attrs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def activation_triples(attrs: Dict[str, Any]) -> List[tuple]:
+    """RDF triples for one activation, subject ``cems:<code>``; ArcGIS epoch-ms dates become xsd:dateTime."""
+    subj = CEMS_NS[quote(str(attrs["code"]), safe="")]
+    triples = [
+        (subj, RDF.type, CEMS_NS.Activation),
+        (subj, CEMS_NS.attributesHash, Literal(_attributes_digest(attrs))),
+    ]
+    for key, value in attrs.items():
+        if value is None or value == "":
+            continue
+        if key in DATE_FIELDS and isinstance(value, (int, float)):
+            value = Literal(datetime.fromtimestamp(value / 1000, tz=timezone.utc), datatype=XSD.dateTime)
+        else:
+            value = Literal(value)
+        triples.append((subj, CEMS_NS[quote(key, safe="")], value))
+    return triples
+
+
+_SPARQL_TOKENS = re.compile(
+    r'("""[\s\S]*?"""' r"|'''[\s\S]*?'''"
+    r'|"(?:[^"\\\n]|\\.)*"' r"|'(?:[^'\\\n]|\\.)*'"
+    r'|<[^<>"{}|^`\\\s]*>)'  # string literals and IRIs: kept verbatim
+    r"|((?:\s|#[^\n]*)+)"  # whitespace and comments: collapsed to one space
+)
+
+
+def normalize_sparql(q: str) -> str:
+    """Drop comments and collapse whitespace outside string literals and IRIs."""
+    return _SPARQL_TOKENS.sub(lambda m: m.group(1) or " ", q).strip()
+
 
 class OntologyClient:
-    def __init__(self, ttl_path: Path | str = DEFAULT_TTL):
-        ttl_path = Path(ttl_path)
-        if not ttl_path.exists():
-            raise FileNotFoundError(ttl_path)
-        self.graph = Graph().parse(str(ttl_path), format="ttl")
+    """SPARQL over the CEMS activation graph.
+
+    The Turtle file is parsed once and the graph is kept as a snapshot in
+    the ontology store (``core.ontology_store``); later constructions load
+    the snapshot while the Turtle file has the content it was built from.  `sync_activations`
+    materialises downloaded activations into the graph, touching only the
+    activations whose attributes changed, and `save` persists the result.
 
-    def run(self, q: str):
-        return [{str(k): str(v) for k, v in row.asdict().items()} for row in self.graph.query(q)]
+    `run` keeps an LRU cache of results keyed on the normalised query text,
+    its bindings and ``version``, which every graph update through this
+    client bumps (call `invalidate` after editing ``graph`` directly).
+    Query texts are compiled once with ``prepareQuery`` and reused, and
+    ``bindings`` are passed as ``initBindings`` for parameterised lookups.
+    """
 
-    def pretty(self, q: str):
-        rows = self.run(q)
+    def __init__(self, ttl_path: Path | str = DEFAULT_TTL, *, snapshot: str | None = None, create: bool = False,
+                 cache_size: int = 128, store: OntologyStore | None = None):
+        self.ttl_path = Path(ttl_path)
+        self.store = store or get_ontology_store()
+        self.snapshot_name = snapshot or _snapshot_name(self.ttl_path)
+        self.version = 0
+        self.cache_size = cache_size
+        self._results: OrderedDict = OrderedDict()
+        self._prepared: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        # a snapshot made without a Turtle source stays valid until one appears
+        self._source = self.store.source_key(self.ttl_path, "turtle") if self.ttl_path.exists() else None
+        self.graph = self.store.read_graph(self.snapshot_name, self._source)
+        if self.graph is None:
+            if self._source is not None:
+                parsed = self.store.load(self.ttl_path, "turtle")  # shared and read-only: copy it
+                self.graph = Graph()
+                for prefix, ns in parsed.namespaces():
+                    self.graph.bind(prefix, ns, override=True)
+                self.graph += parsed
+            elif create:
+                self.graph = Graph()
+            else:
+                raise FileNotFoundError(self.ttl_path)
+            self.graph.bind("cems", CEMS_NS)
+            self.save()
+
+    def save(self):
+        """Write the graph snapshot to the store (atomically, so concurrent CLI calls never read half a file)."""
+        self.store.write_graph(self.snapshot_name, self._source, self.graph)
+
+    def sync_activations(self, activations, *, prune: bool = True) -> Dict[str, int]:
+        """Upsert activation attribute dicts into the graph; returns added/updated/removed counts.
+
+        Unchanged activations are skipped by comparing a digest of their
+        attributes.  With ``prune`` the input is taken as the whole layer and
+        activations missing from it are removed.
+        """
+        existing = dict(self.graph.subject_objects(CEMS_NS.attributesHash))
+        seen = set()
+        stats = {"added": 0, "updated": 0, "removed": 0}
+        for attrs in activations:
+            if not attrs.get("code"):
+                continue
+            triples = activation_triples(attrs)
+            subj, digest = triples[1][0], triples[1][2]
+            seen.add(subj)
+            old = existing.get(subj)
+            if old == digest:
+                continue
+            if old is None:
+                stats["added"] += 1
+            else:
+                self.graph.remove((subj, None, None))
+                stats["updated"] += 1
+            for t in triples:
+                self.graph.add(t)
+        if prune:
+            for subj in existing.keys() - seen:
+                self.graph.remove((subj, None, None))
+                stats["removed"] += 1
+        if any(stats.values()):
+            self.invalidate()
+        return stats
+
+    def invalidate(self):
+        """Mark the graph as changed so cached query results are not reused."""
+        with self._lock:
+            self.version += 1
+            self._results.clear()
+
+    def _prepare(self, text: str):
+        prepared = self._prepared.get(text)
+        if prepared is None:
+            prepared = prepareQuery(text, initNs=dict(self.graph.namespaces()))
+            self._prepared[text] = prepared
+        return prepared
+
+    def _evaluate(self, q: str, bindings: Dict[str, Any] | None):
+        text = normalize_sparql(q)
+        init = {k: v if isinstance(v, Node) else Literal(v) for k, v in (bindings or {}).items()}
+        key = (self.version, text, tuple(sorted((k, v.n3()) for k, v in init.items())))
+        with self._lock:
+            hit = self._results.get(key)
+            if hit is not None:
+                self._results.move_to_end(key)
+                return hit
+            prepared = self._prepare(text)
+        result = self.graph.query(prepared, initBindings=init)
+        names = [str(v) for v in result.vars]
+        rows = [tuple(None if v is None else str(v) for v in row) for row in result]
+        hit = (names, rows)
+        with self._lock:
+            if key[0] == self.version:
+                self._results[key] = hit
+                if len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+        return hit
+
+    def run(self, q: str, bindings: Dict[str, Any] | None = None, *, columnar: bool = False):
+        """Rows as ``{var: str}`` dicts (unbound vars omitted), or with ``columnar`` one list per var."""
+        names, rows = self._evaluate(q, bindings)
+        if columnar:
+            return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+        return [{name: v for name, v in zip(names, row) if v is not None} for row in rows]
+
+    def pretty(self, q: str, bindings: Dict[str, Any] | None = None):
+        rows = self.run(q, bindings)
         if not rows:
             print("<no results>")
             return
@@ -174,6 +1185,14 @@ EXAMPLE_LINES = [
     "python CEMS.py list --limit 10",
     "python CEMS.py list --code EMSR56 --limit 5",
     "python CEMS.py get EMSR568",
+    "python CEMS.py list --category Flood --since 2024-01-01 --limit 10",
+    "python CEMS.py --workers 8 list --limit 10",
+    "python CEMS.py --cache cems.json --max-age 300 list --limit 10",
+    "python CEMS.py --cache cems.json sync",
+    "python CEMS.py --cache cems.sqlite --max-age 300 list --code EMSR7",
+    "python CEMS.py --workers 8 list --limit 0 --format ndjson > activations.ndjson",
+    "python CEMS.py --cache cems.sqlite materialize",
+    "python CEMS.py sparql \"SELECT ?a WHERE { ?a a <http://example.org/cems#Activation> } LIMIT 5\"",
 ]
 
 
@@ -185,6 +1204,13 @@ def _build_parser():
     lst.add_argument("--code", dest="code_prefix")
     lst.add_argument("--limit", type=int, default=20)
     lst.add_argument("--offset", type=int, default=0)
+    lst.add_argument("--category", help="exact category, e.g. Flood")
+    lst.add_argument("--since", help="activationTime lower bound (ISO date)")
+    lst.add_argument("--until", help="activationTime upper bound (ISO date)")
+    lst.add_argument("--format", choices=["ndjson", "csv", "parquet"], help="stream rows instead of a table (--limit 0 = whole layer)")
+    lst.add_argument("--output", type=Path, help="file for --format output (default stdout; required for parquet)")
+
+    sub.add_parser("sync", help="pull features changed since the last sync into --cache")
 
     g = sub.add_parser("get")
     g.add_argument("code")
@@ -192,9 +1218,14 @@ def _build_parser():
     s = sub.add_parser("sparql")
     s.add_argument("query")
 
+    sub.add_parser("materialize", help="sync the cached activations into the --ontology graph snapshot")
+
     p.add_argument("--cache", type=Path)
     p.add_argument("--ontology", type=Path, default=DEFAULT_TTL)
     p.add_argument("--token", help="ArcGIS token (overrides ARCGIS_TOKEN env)")
+    p.add_argument("--username", help="generate and auto-refresh a token for this ArcGIS user (password: ARCGIS_PASSWORD env or prompt)")
+    p.add_argument("--max-age", type=float, help="seconds before a cached layer is delta-synced again")
+    p.add_argument("--workers", type=int, default=1, help="parallel page downloads on a cold cache")
     p.add_argument("--json", action="store_true")
     return p
 
@@ -222,17 +1253,35 @@ def _show(rows: List[Dict[str, Any]]):
 
 def run_cli(argv: List[str] | None = None):
     args = _build_parser().parse_args(argv)
-    token = args.token or os.getenv("ARCGIS_TOKEN")
+    token: Token = args.token or os.getenv("ARCGIS_TOKEN")
+    username = args.username or os.getenv("ARCGIS_USERNAME")
+    if not token and username:
+        password = os.getenv("ARCGIS_PASSWORD") or getpass.getpass("ArcGIS password: ")
+        token = ArcGISTokenProvider(username, password)
     try:
-        if args.cmd == "list":
-            rows = list_activations(code_prefix=args.code_prefix, limit=args.limit, offset=args.offset, cache=args.cache, token=token)
+        if args.cmd == "list" and args.format:
+            rows = iter_activations(code_prefix=args.code_prefix, limit=args.limit, offset=args.offset, cache=args.cache, token=token, workers=args.workers, max_age=args.max_age,
+                                    category=args.category, since=args.since, until=args.until)
+            write_activations(rows, args.format, args.output)
+        elif args.cmd == "list":
+            rows = list_activations(code_prefix=args.code_prefix, limit=args.limit, offset=args.offset, cache=args.cache, token=token, workers=args.workers, max_age=args.max_age,
+                                    category=args.category, since=args.since, until=args.until)
             print(json.dumps(rows, indent=2) if args.json else _show(rows))
         elif args.cmd == "get":
-            row = activation_by_code(args.code, cache=args.cache, token=token)
+            row = activation_by_code(args.code, cache=args.cache, token=token, workers=args.workers, max_age=args.max_age)
             if not row:
                 print("Activation not found")
             else:
                 print(json.dumps(row, indent=2) if args.json else _show([row]))
+        elif args.cmd == "sync":
+            changed = sync_activations(cache=args.cache, token=token, workers=args.workers)
+            print(json.dumps({"changed": changed}) if args.json else f"{changed} activation(s) added or updated")
+        elif args.cmd == "materialize":
+            oc = OntologyClient(args.ontology, create=True)
+            rows = iter_activations(limit=0, cache=args.cache, token=token, workers=args.workers, max_age=args.max_age)
+            stats = oc.sync_activations(rows)
+            oc.save()
+            print(json.dumps(stats) if args.json else ", ".join(f"{v} {k}" for k, v in stats.items()))
         elif args.cmd == "sparql":
             oc = OntologyClient(args.ontology)
             print(json.dumps(oc.run(args.query), indent=2) if args.json else oc.pretty(args.query))
@@ -1,17 +1,15 @@
-from CEMS import list_activations
+from CEMS import ArcGISTokenProvider, list_activations
 
-import requests, getpass, json
+import getpass
 
-url = "https://services-eu1.arcgis.com/sharing/rest/generateToken"
-payload = {
-    "f": "json",
-    "username": input("ArcGIS username: "),
-    "password": getpass.getpass("ArcGIS password: "),
-    "referer": "https://services-eu1.arcgis.com",
-    "expiration": 60,      # minutes
-}
-tok = requests.post(url, data=payload, timeout=30).json()
-print(json.dumps(tok, indent=2))
+# generateToken is called on first use and the token is refreshed in the
+# background shortly before its 60-minute expiry, so long syncs never stall.
+tokens = ArcGISTokenProvider(
+    input("ArcGIS username: "),
+    getpass.getpass("ArcGIS password: "),
+    referer="https://services-eu1.arcgis.com",
+    expiration=60,      # minutes
+)
 
-acts = list_activations(limit=3, token="<your_token>")
+acts = list_activations(limit=3, token=tokens)
 print(acts[0]["name"])
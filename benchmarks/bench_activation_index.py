@@ -0,0 +1,102 @@
+"""
+Micro-benchmark: ``ActivationIndex`` lookups vs the old linear scans as the
+activation layer grows to 100k synthetic features.
+
+    python benchmarks/bench_activation_index.py [--sizes 1000 10000 100000]
+
+Indexed lookup cost should stay flat (dict / ``bisect`` / early-stopping
+walks for the first page of 20) while the scans grow linearly with the layer.
+Selective and broad filters are both timed: a prefix matching 10 codes and
+one matching every code, a single category, and narrow and wide time windows.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CEMS import ActivationIndex  # noqa: E402
+
+CATEGORIES = ("Flood", "Fire", "Storm", "Earthquake", "Volcano", "Other")
+DAY_MS = 86_400_000
+START_MS = 1_262_304_000_000  # 2010-01-01
+
+
+def synthetic_features(n: int, seed: int = 0):
+    """Codes, categories and times that are not in layer order, like a real layer."""
+    rng = random.Random(seed)
+    feats = [
+        {"attributes": {
+            "code": f"EMSR{i:06d}",
+            "category": rng.choice(CATEGORIES),
+            "activationTime": START_MS + rng.randrange(5000 * DAY_MS),
+        }}
+        for i in range(n)
+    ]
+    rng.shuffle(feats)
+    return feats
+
+
+def _scan_code(features, code):
+    return next((f["attributes"] for f in features if f["attributes"].get("code") == code), None)
+
+
+def _scan(features, code_prefix=None, category=None, since=None, until=None, limit=20):
+    """The filtered-list rebuild ``list_activations`` did before the index."""
+    return [a for a in (f["attributes"] for f in features)
+            if (not code_prefix or a.get("code", "").startswith(code_prefix))
+            and (category is None or a.get("category") == category)
+            and (since is None or a["activationTime"] >= since)
+            and (until is None or a["activationTime"] <= until)][:limit]
+
+
+def _best(fn, number: int) -> float:
+    """Best of 5 runs, in microseconds per call."""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def _cases(feats):
+    n = len(feats)
+    times = sorted(f["attributes"]["activationTime"] for f in feats)
+    return [
+        ("prefix, 10 codes", {"code_prefix": f"EMSR{(n - 1) // 10:05d}"}),
+        ("prefix, every code", {"code_prefix": "EMSR"}),
+        ("category", {"category": "Flood"}),
+        ("category + broad prefix", {"category": "Flood", "code_prefix": "EMSR"}),
+        ("window, 10 activations", {"since": times[n // 2], "until": times[n // 2 + 9]}),
+        ("window, half the layer", {"since": times[n // 2]}),
+    ]
+
+
+def run(sizes):
+    layers = {n: synthetic_features(n) for n in sizes}
+    indexes = {n: ActivationIndex(feats) for n, feats in layers.items()}
+    width = 24
+    print(f"{'µs per call (index / scan)':<{width}}" + "".join(f" | {n:>19}" for n in sizes))
+    print("-" * (width + 22 * len(sizes)))
+    print(f"{'build index (ms)':<{width}}" + "".join(
+        f" | {_best(lambda: ActivationIndex(layers[n]), 1) / 1000:>19.1f}" for n in sizes))
+
+    row = f"{'get by code':<{width}}"
+    for n in sizes:
+        code = layers[n][-1]["attributes"]["code"]  # worst case for the scan
+        scan_n = max(1, 2000 // n)
+        row += f" | {_best(lambda: indexes[n].get(code), 10000):>7.2f} / {_best(lambda: _scan_code(layers[n], code), scan_n):>9.1f}"
+    print(row)
+
+    for i, (label, _) in enumerate(_cases(layers[sizes[0]])):
+        row = f"{label:<{width}}"
+        for n in sizes:
+            filters = _cases(layers[n])[i][1]
+            scan_n = max(1, 2000 // n)
+            row += (f" | {_best(lambda: indexes[n].query(**filters), 1000):>7.2f}"
+                    f" / {_best(lambda: _scan(layers[n], **filters), scan_n):>9.1f}")
+        print(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    run(parser.parse_args().sizes)
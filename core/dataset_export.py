@@ -0,0 +1,113 @@
+"""
+Columnar export of harvested tables.
+
+* ``dataframe_to_bytes(df, fmt)`` serializes in memory: ``csv``, ``parquet``
+  (zstd) or ``feather`` (Arrow IPC, zstd) -- Streamlit downloads are served
+  from these buffers instead of writing a file and reading it back
+* ``save_dataset(df, fmt, source=..., endpoint=...)`` writes one file into a
+  Hive-partitioned layout that pyarrow / pandas / Spark read as one dataset::
+
+      output/source=reliefweb/endpoint=reports/date=2024-05-01/part-134501-3f2a9c.parquet
+
+Parquet and Feather need ``pyarrow``; CSV always works.  List cells (see
+``core.flattening``) become Arrow ``list<...>`` columns, and are joined with
+", " for CSV.
+"""
+import io
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from core.flattening import join_list_cells
+
+FORMATS: Dict[str, Dict[str, str]] = {
+    "csv": {"ext": "csv", "mime": "text/csv"},
+    "parquet": {"ext": "parquet", "mime": "application/vnd.apache.parquet"},
+    "feather": {"ext": "feather", "mime": "application/vnd.apache.arrow.file"},
+}
+COMPRESSION = "zstd"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet/Feather export needs pyarrow (pip install pyarrow)") from None
+    return pa, pq, feather
+
+
+def available_formats() -> List[str]:
+    try:
+        _pyarrow()
+    except RuntimeError:
+        return ["csv"]
+    return list(FORMATS)
+
+
+def to_arrow_table(df: pd.DataFrame):
+    """``pyarrow.Table`` of ``df``; columns Arrow can't type (mixed objects) are stored as strings."""
+    pa, _, _ = _pyarrow()
+    arrays = []
+    for name in df.columns:
+        col = df[name]
+        try:
+            arrays.append(pa.array(col, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            arrays.append(pa.array(col.map(lambda v: None if v is None else str(v)), type=pa.string(), from_pandas=True))
+    return pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+
+
+def dataframe_to_bytes(df: pd.DataFrame, fmt: str = "csv") -> bytes:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' (choose from {', '.join(FORMATS)})")
+    if fmt == "csv":
+        return join_list_cells(df).to_csv(index=False).encode("utf-8")
+    _, pq, feather = _pyarrow()
+    table = to_arrow_table(df)
+    buf = io.BytesIO()
+    if fmt == "parquet":
+        pq.write_table(table, buf, compression=COMPRESSION)
+    else:
+        feather.write_feather(table, buf, compression=COMPRESSION)
+    return buf.getvalue()
+
+
+def _partition_value(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(value).strip("/")) or "_"
+
+
+def partition_dir(output_dir: str, source: str, endpoint: str, date: Optional[datetime] = None) -> str:
+    date = date or datetime.now()
+    return os.path.join(
+        output_dir,
+        f"source={_partition_value(source)}",
+        f"endpoint={_partition_value(endpoint)}",
+        f"date={date.strftime('%Y-%m-%d')}",
+    )
+
+
+def save_dataset(df: pd.DataFrame, fmt: str = "parquet", *, source: str, endpoint: str,
+                 output_dir: str = "output", date: Optional[datetime] = None, data: Optional[bytes] = None) -> str:
+    """Write ``df`` as one part file of the partitioned dataset; returns its path.
+
+    Pass ``data`` (from ``dataframe_to_bytes(df, fmt)``) to reuse a buffer that
+    was already serialized for a download.
+    """
+    date = date or datetime.now()
+    directory = partition_dir(output_dir, source, endpoint, date)
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{date.strftime('%H%M%S')}-{uuid.uuid4().hex[:6]}.{FORMATS[fmt]['ext']}"
+    path = os.path.join(directory, name)
+    if data is None:
+        data = dataframe_to_bytes(df, fmt)
+    tmp = os.path.join(directory, f".{name}.tmp")  # dot-files are skipped by dataset readers
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)  # readers of the dataset never see half-written parts
+    return path
@@ -1,3 +1,7 @@
+import os
+import threading
+from typing import Dict, List, Optional
+
 import streamlit as st
 import pandas as pd
 from core.semantic_model import load_ontology, extract_endpoint_fields
@@ -7,10 +11,36 @@ from core.semantic_model import load_ontology, extract_endpoint_fields
 # powered by an OWL ontology
 # ----------------------------------------------
 
-# 🔄 Load the ontology (once) and extract the field mapping
-# result: FIELDS_INCLUDE = {"/reports": [...], "/disasters": [...], ...}
-g = load_ontology("data/api_semantics.owl")
-FIELDS_INCLUDE = extract_endpoint_fields(g)
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+# First existing file wins; $API_SEMANTICS_OWL overrides
+ONTOLOGY_CANDIDATES = [p for p in (
+    os.getenv("API_SEMANTICS_OWL"),
+    os.path.join(_DATA_DIR, "api_semantics.owl"),
+    os.path.join(_DATA_DIR, "api_semantics_enhanced.owl"),
+) if p]
+
+_FIELDS: Optional[Dict[str, List[str]]] = None
+_FIELDS_LOCK = threading.Lock()
+
+
+def get_fields_include() -> Dict[str, List[str]]:
+    """🔄 Field mapping from the API ontology, loaded on first use (not at import).
+
+    result: {"/reports": [...], "/disasters": [...], ...}; empty if no ontology file exists.
+    """
+    global _FIELDS
+    with _FIELDS_LOCK:
+        if _FIELDS is None:
+            path = next((p for p in ONTOLOGY_CANDIDATES if os.path.exists(p)), None)
+            _FIELDS = extract_endpoint_fields(load_ontology(path)) if path else {}
+        return _FIELDS
+
+
+def __getattr__(name):
+    # ``FIELDS_INCLUDE`` used to be computed at import time; keep it as a lazy module attribute
+    if name == "FIELDS_INCLUDE":
+        return get_fields_include()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def render_field_selector(endpoint_path="/disasters"):
     """
@@ -25,7 +55,7 @@ def render_field_selector(endpoint_path="/disasters"):
     """
 
     # 🎯 Get valid field names for this endpoint from the ontology
-    field_options = FIELDS_INCLUDE.get(endpoint_path, [])
+    field_options = get_fields_include().get(endpoint_path, [])
 
     # 🔽 Show UI multiselect to choose which fields to include
     selected_fields = st.multiselect(
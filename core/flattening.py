@@ -0,0 +1,277 @@
+"""
+Schema-stable, columnar flattening of ReliefWeb ``data`` items.
+
+Flattening one dict per item and numbering list elements
+(``country.0.name``, ``country.1.name`` ...) makes the columns of a frame
+depend on the page it came from.  Here a ``RecordSchema`` is fixed once per endpoint:
+
+* either inferred from the pages seen so far and only ever extended (new
+  columns, nested ones included, are appended; earlier rows get nulls), or
+* taken from a ``fields[include][]`` selection passed by the caller (the
+  field selector offers the ontology's list, ``core.field_selector.get_fields_include()``)
+
+and items are written straight into one Python list per column through
+precompiled paths.  Values reached through a list (``country.name``) stay
+lists, so they map onto Arrow ``list<...>`` columns instead of joined strings.
+
+    schema = schema_for("/reports", items)
+    frame = records_to_frame(items, schema)        # pandas, list cells kept
+"""
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+ITEM_COLUMNS = ("id", "score", "href")  # taken from the item, not from its "fields"
+
+
+class Column(NamedTuple):
+    name: str
+    path: Tuple[str, ...]  # keys under "fields"; a "[]" suffix marks a list of objects
+    is_list: bool
+    is_point: bool = False
+    inferred: bool = True  # False: shape unknown (from a field list), walk generically
+
+
+def _is_point(value: Any) -> bool:
+    return type(value) is dict and len(value) == 2 and "lat" in value and "lon" in value
+
+
+def _leaf(value: Any) -> Any:
+    if _is_point(value):
+        return f"POINT({value['lon']} {value['lat']})"
+    if type(value) is list:
+        return [_leaf(v) for v in value]
+    return value
+
+
+def _wkt(value: Any) -> Any:
+    if type(value) is dict and "lat" in value and "lon" in value:
+        return f"POINT({value['lon']} {value['lat']})"
+    return value
+
+
+def _dig(node: Any, keys: Tuple[str, ...]) -> Any:
+    for key in keys:
+        if type(node) is not dict:
+            return None
+        node = node.get(key)
+    return node
+
+
+def _column_name(path: Tuple[str, ...]) -> str:
+    return ".".join(p[:-2] if p.endswith("[]") else p for p in path)
+
+
+def _getter(path: Tuple[str, ...]):
+    """Compile a path into a function of an item's ``fields`` dict."""
+    key, rest = path[0], path[1:]
+    if key.endswith("[]"):
+        key = key[:-2]
+        sub = _getter(rest) if rest else None
+
+        def get_each(node):
+            seq = node.get(key) if type(node) is dict else None
+            if not seq or sub is None or type(seq) is not list:
+                return seq
+            out = []
+            for element in seq:
+                value = sub(element)
+                if type(value) is list:
+                    out.extend(value)
+                else:
+                    out.append(value)  # keep None so sibling columns stay aligned
+            return out
+        return get_each
+    if not rest:
+        return lambda node: node.get(key) if type(node) is dict else None
+    sub = _getter(rest)
+    return lambda node: sub(node.get(key)) if type(node) is dict else None
+
+
+def _walk(node: Dict[str, Any], prefix: Tuple[str, ...], in_list: bool, out: Dict[Tuple[str, ...], Tuple[bool, bool]]):
+    """Record the leaf paths under a ``fields`` dict as ``path -> (is_list, is_point)``."""
+    for key, value in node.items():
+        path = prefix + (key,)
+        kind = type(value)
+        if kind is dict and not _is_point(value):
+            _walk(value, path, in_list, out)
+            continue
+        if kind is list and value and type(value[0]) is dict and not _is_point(value[0]):
+            marked = prefix + (key + "[]",)
+            for element in value:
+                if type(element) is dict:
+                    _walk(element, marked, True, out)
+            continue
+        is_list = in_list or kind is list
+        is_point = kind is dict or (kind is list and bool(value) and _is_point(value[0]))
+        known = out.get(path)
+        if known is None:
+            out[path] = (is_list, is_point)
+        elif (is_list and not known[0]) or (is_point and not known[1]):
+            out[path] = (known[0] or is_list, known[1] or is_point)
+
+
+class RecordSchema:
+    """Ordered, append-only set of columns.
+
+    Every ``extend`` walks the items down to their leaf paths and appends
+    the ones not seen before, so a sub-field that first shows up on a later
+    page (``date.closing``) gets its column even though its parent is known.
+    """
+
+    def __init__(self, columns: Iterable[Column] = ()):
+        self.columns: List[Column] = []
+        self._by_name: Dict[str, int] = {}
+        self._getters: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        for column in columns:
+            self._add(column)
+
+    def _add(self, column: Column):
+        if column.name in self._by_name:
+            i = self._by_name[column.name]
+            old = self.columns[i]
+            if (column.is_list and not old.is_list) or (column.is_point and not old.is_point):
+                self.columns[i] = old._replace(is_list=old.is_list or column.is_list,
+                                               is_point=old.is_point or column.is_point)
+            return
+        self._by_name[column.name] = len(self.columns)
+        self.columns.append(column)
+
+    @property
+    def names(self) -> List[str]:
+        return [c.name for c in self.columns]
+
+    def getter(self, column: Column):
+        fn = self._getters.get(column.path)
+        if fn is None:
+            fn = self._getters[column.path] = _getter(column.path)
+        return fn
+
+    @classmethod
+    def from_fields(cls, fields: Sequence[str]) -> "RecordSchema":
+        """Columns for a ``fields[include][]`` list; parents of listed sub-fields are dropped.
+
+        The list/object structure isn't known up front, so these columns use
+        the generic path walker.
+        """
+        fields = sorted(set(fields))
+        leaves = [f for f in fields if not any(g.startswith(f + ".") for g in fields)]
+        columns = [Column(c, (c,), False) for c in ITEM_COLUMNS]
+        columns += [Column(f, tuple(f.split(".")), False, inferred=False) for f in leaves if f not in ITEM_COLUMNS]
+        return cls(columns)
+
+    def extend(self, items: Sequence[Dict[str, Any]]) -> "RecordSchema":
+        """Append the columns of ``items`` that aren't in the schema yet."""
+        found: Dict[Tuple[str, ...], Tuple[bool, bool]] = {}
+        for item in items:
+            _walk(item.get("fields") or {}, (), False, found)
+        with self._lock:
+            if not self.columns:
+                for c in ITEM_COLUMNS:
+                    self._add(Column(c, (c,), False))
+            for path, (is_list, is_point) in found.items():
+                self._add(Column(_column_name(path), path, is_list, is_point))
+        return self
+
+
+_SCHEMAS: Dict[Any, RecordSchema] = {}
+_SCHEMAS_LOCK = threading.Lock()
+
+
+def schema_for(endpoint: str, items: Optional[Iterable[Dict[str, Any]]] = None,
+               fields: Optional[Sequence[str]] = None) -> RecordSchema:
+    """The shared schema of an endpoint (or of an endpoint + field selection).
+
+    Without ``fields`` the schema is inferred from ``items`` and extended with
+    any new columns later pages bring.  The ontology's field list is not
+    consulted here; callers pass it (or the user's selection) as ``fields``.
+    """
+    key = (endpoint, tuple(sorted(fields))) if fields else endpoint
+    with _SCHEMAS_LOCK:
+        schema = _SCHEMAS.get(key)
+        if schema is None:
+            schema = _SCHEMAS[key] = RecordSchema.from_fields(fields) if fields else RecordSchema()
+    if items is not None and not fields:
+        schema.extend(items)
+    return schema
+
+
+def _extract(node: Any, path: Tuple[str, ...]) -> Any:
+    """Generic walk for paths of unknown shape: lists met on the way are mapped over."""
+    for i, part in enumerate(path):
+        if type(node) is dict:
+            node = node.get(part)
+        elif type(node) is list:
+            out = []
+            for element in node:
+                value = _extract(element, path[i:])
+                if type(value) is list:
+                    out.extend(value)
+                elif value is not None:
+                    out.append(value)
+            return out
+        else:
+            return None
+    return node
+
+
+def flatten_columns(items: Sequence[Dict[str, Any]], schema: RecordSchema) -> Dict[str, List[Any]]:
+    """One list per schema column, each filled by a single pass over the items."""
+    fields_list = [item.get("fields") or {} for item in items]
+    tops: Dict[str, List[Any]] = {}  # top-level field -> its values, shared by sibling columns
+
+    def top(key: str) -> List[Any]:
+        if key not in tops:
+            tops[key] = [f.get(key) for f in fields_list]
+        return tops[key]
+
+    data: Dict[str, List[Any]] = {}
+    for c in schema.columns:
+        if c.name in ITEM_COLUMNS and len(c.path) == 1:
+            data[c.name] = [item.get(c.name) for item in items]
+            continue
+        if not c.inferred:
+            cells = [_extract(f, c.path) for f in fields_list]
+            data[c.name] = [_leaf(v) for v in cells]
+            continue
+        # Common shapes (a.b, list[].b, list[].b.c) are inlined; deeper lists use compiled getters
+        first, rest = c.path[0], c.path[1:]
+        if any(p.endswith("[]") for p in rest):
+            get = schema.getter(c)
+            cells = [get(f) for f in fields_list]
+        elif not rest:
+            cells = top(first)
+        elif first.endswith("[]") and len(rest) == 1:
+            leaf = rest[0]
+            cells = [[e.get(leaf) if type(e) is dict else None for e in v] if type(v) is list else None
+                     for v in top(first[:-2])]
+        elif first.endswith("[]"):
+            cells = [[_dig(e, rest) for e in v] if type(v) is list else None for v in top(first[:-2])]
+        elif len(rest) == 1:
+            leaf = rest[0]
+            cells = [v.get(leaf) if type(v) is dict else None for v in top(first)]
+        else:
+            cells = [_dig(v, rest) for v in top(first)]
+        if c.is_point:
+            cells = [[_wkt(e) for e in v] if type(v) is list else _wkt(v) for v in cells]
+        data[c.name] = cells
+    return data
+
+
+def records_to_frame(items: Sequence[Dict[str, Any]], schema: Optional[RecordSchema] = None,
+                     endpoint: str = "") -> pd.DataFrame:
+    if schema is None:
+        schema = schema_for(endpoint, items)
+    return pd.DataFrame(flatten_columns(items, schema), columns=schema.names)
+
+
+def join_list_cells(frame: pd.DataFrame, sep: str = ", ") -> pd.DataFrame:
+    """Copy of ``frame`` with list cells joined into strings, for CSV output."""
+    out = frame.copy()
+    for name in out.columns:
+        col = out[name]
+        if col.dtype == object and col.map(lambda v: isinstance(v, list)).any():
+            out[name] = col.map(lambda v: sep.join(str(x) for x in v) if isinstance(v, list) else v)
+    return out
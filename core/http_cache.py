@@ -0,0 +1,244 @@
+"""
+On-disk HTTP response cache used by ``core.http_client``.
+
+Entries are content-addressed: the key is a SHA-256 over the method, URL,
+canonicalised query params, request body and the headers that change the
+response (Accept, Authorization).  Bodies live in ``<dir>/<k[:2]>/<k>`` and
+an SQLite index (WAL, shared between processes) keeps the validators,
+timestamps and sizes.
+
+* an entry younger than its source's TTL is served straight from disk
+* an older entry with an ``ETag`` / ``Last-Modified`` is revalidated with
+  ``If-None-Match`` / ``If-Modified-Since``; a 304 serves the stored body
+* the least recently used entries are evicted once the byte budget is exceeded
+* responses that would never be served (TTL 0 and no validators, e.g. ArcGIS
+  query pages) are not stored, and the index keeps only the scheme, host and
+  path of a URL -- never query strings, which may carry ``token=``
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Seconds a response is reused without asking the server, by host (suffix match).
+# 0 means "always revalidate"; entries without validators are then re-downloaded.
+DEFAULT_TTLS: Dict[str, float] = {
+    "gdacs.org": 300,             # RSS feed and event detail JSON
+    "api.reliefweb.int": 3600,
+    "arcgis.com": 0,              # CEMS pages already have their own sync policy
+    "sentinel-hub.com": 0,
+}
+VARY_HEADERS = ("Accept", "Authorization")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key           TEXT PRIMARY KEY,
+    url           TEXT NOT NULL,
+    status        INTEGER NOT NULL,
+    headers       TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    stored_at     REAL NOT NULL,
+    accessed_at   REAL NOT NULL,
+    size          INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries(accessed_at);
+"""
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _body_digest(kwargs: Dict[str, Any]) -> Optional[str]:
+    """Hash of the request body, or None if the body can't be cached (multipart uploads)."""
+    if kwargs.get("files"):
+        return None
+    if kwargs.get("json") is not None:
+        raw = _canonical(kwargs["json"]).encode("utf-8")
+    else:
+        data = kwargs.get("data")
+        if data is None:
+            raw = b""
+        elif isinstance(data, bytes):
+            raw = data
+        elif isinstance(data, str):
+            raw = data.encode("utf-8")
+        elif isinstance(data, dict):
+            raw = _canonical(data).encode("utf-8")
+        else:
+            return None  # file objects / generators
+    return hashlib.sha256(raw).hexdigest()
+
+
+def cache_key(method: str, url: str, headers: Optional[Dict[str, str]] = None, **kwargs: Any) -> Optional[str]:
+    body = _body_digest(kwargs)
+    if body is None:
+        return None
+    params = kwargs.get("params") or {}
+    items = params.items() if isinstance(params, dict) else params
+    headers = CaseInsensitiveDict(headers or {})
+    parts = {
+        "method": method.upper(),
+        "url": url,
+        # sorted by name only: repeated keys (``sort[]=a&sort[]=b``) keep their order, which is significant
+        "params": sorted(((str(k), _canonical(v)) for k, v in items), key=lambda kv: kv[0]),
+        "body": body,
+        "vary": {h: hashlib.sha256(headers[h].encode("utf-8")).hexdigest() for h in VARY_HEADERS if h in headers},
+    }
+    return hashlib.sha256(_canonical(parts).encode("utf-8")).hexdigest()
+
+
+def _stored_url(url: str) -> str:
+    """The URL without credentials, query or fragment (the key already covers the params)."""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return urlunsplit((parts.scheme, host, parts.path, "", ""))
+
+
+class CachedEntry:
+    def __init__(self, key: str, url: str, status: int, headers: Dict[str, str], etag: Optional[str],
+                 last_modified: Optional[str], stored_at: float, body_path: Path):
+        self.key = key
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.body_path = body_path
+
+    def validators(self) -> Dict[str, str]:
+        out = {}
+        if self.etag:
+            out["If-None-Match"] = self.etag
+        if self.last_modified:
+            out["If-Modified-Since"] = self.last_modified
+        return out
+
+    def to_response(self, how: str) -> requests.Response:
+        r = requests.Response()
+        r.status_code = self.status
+        r.headers = CaseInsensitiveDict(self.headers)
+        r.headers["X-Cache"] = how
+        r.url = self.url
+        r.reason = "OK"
+        r._content = self.body_path.read_bytes()
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+        return r
+
+
+class ResponseCache:
+    def __init__(self, directory: str = ".http_cache", max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttls: Optional[Dict[str, float]] = None, default_ttl: float = 0.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.directory / "index.sqlite"), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _body_path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def ttl_for(self, url: str) -> float:
+        host = urlsplit(url).hostname or ""
+        best: Tuple[int, float] = (-1, self.default_ttl)
+        for suffix, ttl in self.ttls.items():
+            if (host == suffix or host.endswith("." + suffix)) and len(suffix) > best[0]:
+                best = (len(suffix), ttl)
+        return best[1]
+
+    def lookup(self, key: str) -> Optional[CachedEntry]:
+        row = self._conn().execute(
+            "SELECT url, status, headers, etag, last_modified, stored_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        path = self._body_path(key)
+        if not path.exists():
+            self._conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        url, status, headers, etag, last_modified, stored_at = row
+        return CachedEntry(key, url, status, json.loads(headers), etag, last_modified, stored_at, path)
+
+    def is_fresh(self, entry: CachedEntry) -> bool:
+        return time.time() - entry.stored_at < self.ttl_for(entry.url)
+
+    def touch(self, key: str, revalidated: bool = False):
+        now = time.time()
+        if revalidated:
+            self._conn().execute("UPDATE entries SET accessed_at = ?, stored_at = ? WHERE key = ?", (now, now, key))
+        else:
+            self._conn().execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+
+    def store(self, key: str, response: requests.Response):
+        if "no-store" in response.headers.get("Cache-Control", ""):
+            return
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if self.ttl_for(response.url) <= 0 and not (etag or last_modified):
+            return  # never fresh and can't be revalidated: it would only be downloaded again
+        body = response.content
+        path = self._body_path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+        now = time.time()
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in ("content-encoding", "transfer-encoding", "content-length")}
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries(key, url, status, headers, etag, last_modified, stored_at, accessed_at, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, _stored_url(response.url), response.status_code, json.dumps(headers), etag, last_modified,
+             now, now, len(body)),
+        )
+        self.evict()
+
+    def total_bytes(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in ``max_bytes``."""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        conn = self._conn()
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if excess <= 0:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            try:
+                self._body_path(key).unlink()
+            except FileNotFoundError:
+                pass
+            excess -= size
+
+    def clear(self):
+        conn = self._conn()
+        for (key,) in conn.execute("SELECT key FROM entries").fetchall():
+            try:
+                self._body_path(key).unlink()
+            except FileNotFoundError:
+                pass
+        conn.execute("DELETE FROM entries")
@@ -0,0 +1,226 @@
+"""
+Shared HTTP transport for all connectors (CEMS, ReliefWeb, SentinelHub, GDACS).
+
+* one ``requests.Session`` with keep-alive connection pools per host
+* default (connect, read) timeouts on every call
+* exponential backoff with full jitter on 429 / 5xx and connection errors,
+  honouring ``Retry-After`` when the server sends it -- for idempotent
+  methods only; a POST is retried just on 429 / 503 and connect timeouts
+  (the server never processed it) unless the caller passes ``retry=True``
+  for a read-only POST such as a search
+* a per-host concurrency cap so parallel harvests don't hammer one API
+* per-request latency and byte counts, aggregated per host
+* an optional on-disk response cache (``core.http_cache``) with
+  ``ETag`` / ``Last-Modified`` revalidation, used for GETs by default
+
+Use the process-wide instance from ``get_client()`` unless a connector really
+needs different settings.  Its cache lives in ``$HTTP_CACHE_DIR``
+(default ``.http_cache``; set it to an empty string to disable caching) with a
+byte budget of ``$HTTP_CACHE_MAX_BYTES``.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.http_cache import DEFAULT_MAX_BYTES, ResponseCache, cache_key
+
+DEFAULT_TIMEOUT = (5.0, 60.0)  # (connect, read) seconds
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+UNPROCESSED_STATUSES = frozenset({429, 503})  # safe to resend even a non-idempotent request
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+
+
+class RequestRecord(NamedTuple):
+    method: str
+    url: str
+    host: str
+    status: Optional[int]  # None when the request failed without a response
+    seconds: float
+    bytes: int
+    attempt: int
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpClient:
+    def __init__(
+        self,
+        *,
+        timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+        retries: int = 3,
+        backoff: float = 0.5,
+        backoff_max: float = 30.0,
+        max_per_host: int = 8,
+        pool_maxsize: int = 16,
+        headers: Optional[Dict[str, str]] = None,
+        history: int = 1000,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_per_host = max_per_host
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max(pool_maxsize, max_per_host))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self.history: deque = deque(maxlen=history)
+
+    # ---- bookkeeping ---------------------------------------------------
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._slots[host]
+
+    def _record(self, rec: RequestRecord):
+        with self._lock:
+            self.history.append(rec)
+            t = self._totals.setdefault(rec.host, {"requests": 0, "errors": 0, "bytes": 0, "seconds": 0.0})
+            t["requests"] += 1
+            t["bytes"] += rec.bytes
+            t["seconds"] += rec.seconds
+            if rec.status is None or rec.status >= 400:
+                t["errors"] += 1
+
+    def _record_hit(self, host: str):
+        with self._lock:
+            t = self._totals.setdefault(host, {"requests": 0, "errors": 0, "bytes": 0, "seconds": 0.0})
+            t["cache_hits"] = t.get("cache_hits", 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-host totals: requests, errors, bytes, seconds spent waiting on responses and cache hits."""
+        with self._lock:
+            return {host: dict(t) for host, t in self._totals.items()}
+
+    def recent(self) -> List[RequestRecord]:
+        with self._lock:
+            return list(self.history)
+
+    def _sleep_for(self, attempt: int, response: Optional[requests.Response]) -> float:
+        if response is not None:
+            hinted = _retry_after(response)
+            if hinted is not None:
+                return min(hinted, self.backoff_max)
+        # "full jitter": uniform in [0, backoff * 2^attempt]
+        return random.uniform(0, min(self.backoff * 2 ** attempt, self.backoff_max))
+
+    # ---- requests ------------------------------------------------------
+    def request(self, method: str, url: str, *, cache: Optional[bool] = None, retry: Optional[bool] = None,
+                **kwargs: Any) -> requests.Response:
+        """Like ``requests.request`` but pooled, rate-capped per host, retried on 429/5xx and cached.
+
+        The final response is returned whatever its status (callers keep using
+        ``raise_for_status``); connection errors are re-raised after the last attempt.
+        ``retry`` defaults to True for idempotent methods; otherwise only
+        429 / 503 answers and connect timeouts are retried, so a POST that
+        creates a job or spends quota is never sent twice.  ``retry=False``
+        disables retries.
+        ``cache`` defaults to True for GET and False otherwise; streamed and
+        multipart requests are never cached.  Responses served from disk carry
+        an ``X-Cache: HIT`` or ``X-Cache: REVALIDATED`` header.
+        """
+        if cache is None:
+            cache = method.upper() == "GET"
+        key = None
+        if self.cache is not None and cache and not kwargs.get("stream"):
+            key = cache_key(method, url, {**self.session.headers, **(kwargs.get("headers") or {})}, **kwargs)
+        entry = self.cache.lookup(key) if key else None
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                self.cache.touch(key)
+                self._record_hit(urlsplit(url).netloc)
+                return entry.to_response("HIT")
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **entry.validators()}
+
+        response = self._send(method, url, retry, **kwargs)
+
+        if entry is not None and response.status_code == 304:
+            self.cache.touch(key, revalidated=True)
+            self._record_hit(urlsplit(url).netloc)
+            return entry.to_response("REVALIDATED")
+        if key and response.status_code == 200:
+            self.cache.store(key, response)
+        return response
+
+    def _send(self, method: str, url: str, retry: Optional[bool] = None, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        slot = self._slot(host)
+        # full policy for idempotent methods (or retry=True), otherwise only what was never processed
+        full = retry if retry is not None else method.upper() in IDEMPOTENT_METHODS
+        retries = 0 if retry is False else self.retries
+        statuses = RETRY_STATUSES if full else UNPROCESSED_STATUSES
+        attempt = 0
+        while True:
+            response = None
+            start = time.perf_counter()
+            try:
+                with slot:
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(RequestRecord(method, url, host, None, time.perf_counter() - start, 0, attempt))
+                # a read timeout or dropped connection may come after the server acted on the request
+                if attempt == retries or not (full or isinstance(e, requests.ConnectTimeout)):
+                    raise
+            else:
+                if kwargs.get("stream"):
+                    size = int(response.headers.get("Content-Length") or 0)
+                else:
+                    size = len(response.content)
+                self._record(RequestRecord(method, url, host, response.status_code, time.perf_counter() - start, size, attempt))
+                if response.status_code not in statuses or attempt == retries:
+                    return response
+                response.close()
+            time.sleep(self._sleep_for(attempt, response))
+            attempt += 1
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+_DEFAULT: Optional[HttpClient] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """The process-wide client shared by every connector."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            cache_dir = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+            cache = None
+            if cache_dir:
+                cache = ResponseCache(cache_dir, max_bytes=int(os.getenv("HTTP_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
+            _DEFAULT = HttpClient(cache=cache)
+        return _DEFAULT
@@ -0,0 +1,198 @@
+"""
+Parse-once store for the RDF/OWL ontologies used by the apps.
+
+Parsing RDF/XML with rdflib is slow (~0.25 s for the 314 KB
+``sentinelhub_api_ontology_NEW.owl``) and every app did it again per session
+or rerun.  ``OntologyStore.load(source)``:
+
+* hashes the file content (SHA-256); the hash plus the RDF format is the key
+* returns the already-loaded ``Graph`` for that key when there is one --
+  graphs are shared by every app, session and rerun in the process, so
+  treat them as read-only
+* otherwise reads a compact binary snapshot from ``$ONTOLOGY_CACHE_DIR``
+  (default ``.ontology_cache``): a term table plus integer triples and the
+  namespace bindings, ~4x smaller than a pickled graph and ~6x faster to
+  load than re-parsing
+* and only parses the file when neither exists, writing the snapshot for
+  the next process
+
+Graphs an app modifies (``CEMS.OntologyClient`` materialises activations
+into its Turtle graph) are kept with ``write_graph(name, source_key, graph)``
+in the same format and directory.  ``read_graph`` returns a private copy,
+and only while the source still has the content hash it was built from.
+This is the single invalidation rule for every snapshot.
+
+``get_ontology_store()`` is the process-wide instance; nothing is read
+before the first ``load``.  Sources can be paths, bytes or file-like objects
+(Streamlit uploads included).
+"""
+import hashlib
+import os
+import pickle
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.util import guess_format
+
+ONTOLOGY_CACHE_DIR = os.getenv("ONTOLOGY_CACHE_DIR", ".ontology_cache")
+_SNAPSHOT_FORMAT = 1
+_URI, _BNODE, _LITERAL = 0, 1, 2
+
+
+def _read_source(source) -> Tuple[bytes, str]:
+    """Content and file name (for format guessing) of a path, bytes or file-like source."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source), ""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(), os.fspath(source)
+    if hasattr(source, "getvalue"):  # Streamlit UploadedFile / BytesIO: whole content regardless of position
+        raw = source.getvalue()
+    else:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        raw = source.read()
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    return raw, getattr(source, "name", "") or ""
+
+
+def _guess_format(name: str, raw: bytes) -> str:
+    fmt = guess_format(name) if name else None
+    if fmt:
+        return fmt
+    head = raw[:512].lstrip()
+    return "xml" if head.startswith(b"<") else "turtle"
+
+
+def _encode(graph: Graph) -> Dict:
+    terms: Dict = {}
+    table: List[Tuple] = []
+
+    def term_id(term) -> int:
+        i = terms.get(term)
+        if i is None:
+            i = terms[term] = len(table)
+            if isinstance(term, Literal):
+                table.append((_LITERAL, str(term), str(term.datatype) if term.datatype else None, term.language))
+            else:
+                table.append((_BNODE if isinstance(term, BNode) else _URI, str(term)))
+        return i
+
+    triples = [(term_id(s), term_id(p), term_id(o)) for s, p, o in graph]
+    return {
+        "format": _SNAPSHOT_FORMAT,
+        "terms": table,
+        "triples": triples,
+        "namespaces": [(prefix, str(uri)) for prefix, uri in graph.namespaces()],
+    }
+
+
+def _decode(snapshot: Dict) -> Graph:
+    terms = []
+    for entry in snapshot["terms"]:
+        if entry[0] == _URI:
+            terms.append(URIRef(entry[1]))
+        elif entry[0] == _BNODE:
+            terms.append(BNode(entry[1]))
+        else:
+            terms.append(Literal(entry[1], lang=entry[3], datatype=entry[2], normalize=False))
+    graph = Graph()
+    for prefix, uri in snapshot["namespaces"]:
+        graph.bind(prefix, uri, override=True)
+    graph.addN((terms[s], terms[p], terms[o], graph) for s, p, o in snapshot["triples"])
+    return graph
+
+
+class OntologyStore:
+    def __init__(self, directory: str = ONTOLOGY_CACHE_DIR):
+        self.directory = directory
+        self._graphs: Dict[str, Graph] = {}  # "<sha256>.<format>" -> graph
+        self._lock = threading.RLock()
+        self.parses = 0  # files actually parsed, for monitoring
+
+    def _snapshot_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def _read_snapshot(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._snapshot_path(key), "rb") as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if snapshot.get("format") != _SNAPSHOT_FORMAT:
+            return None
+        return snapshot
+
+    def _write_snapshot(self, key: str, graph: Graph, source: Optional[str] = None):
+        path = self._snapshot_path(key)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({**_encode(graph), "source": source}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def source_key(self, source: Union[str, bytes, "os.PathLike"], format: Optional[str] = None) -> str:
+        """``<sha256>.<format>`` of a source's content: the key ``load`` caches it under."""
+        raw, name = _read_source(source)
+        return f"{hashlib.sha256(raw).hexdigest()}.{format or _guess_format(name, raw)}"
+
+    def load(self, source: Union[str, bytes, "os.PathLike"], format: Optional[str] = None) -> Graph:
+        """The graph of ``source``, parsed at most once per content (see module docstring)."""
+        raw, name = _read_source(source)
+        fmt = format or _guess_format(name, raw)
+        key = f"{hashlib.sha256(raw).hexdigest()}.{fmt}"
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is None:
+                snapshot = self._read_snapshot(key)
+                graph = _decode(snapshot) if snapshot else None
+                if graph is None:
+                    graph = Graph()
+                    if isinstance(source, (str, os.PathLike)):
+                        graph.parse(source, format=fmt)  # keeps the file as base for relative IRIs
+                    else:
+                        graph.parse(data=raw, format=fmt)
+                    self.parses += 1
+                    try:
+                        self._write_snapshot(key, graph)
+                    except OSError:
+                        pass  # read-only checkout: keep the in-process copy only
+                self._graphs[key] = graph
+            return graph
+
+    def read_graph(self, name: str, source_key: Optional[str]) -> Optional[Graph]:
+        """A private copy of the graph saved as ``name``, if it was built from ``source_key``.
+
+        ``source_key`` is ``source_key(...)`` of the file the graph was derived
+        from, or None for a graph without one.
+        """
+        with self._lock:
+            snapshot = self._read_snapshot(name)
+        if snapshot is None or snapshot.get("source") != source_key:
+            return None
+        return _decode(snapshot)
+
+    def write_graph(self, name: str, source_key: Optional[str], graph: Graph):
+        """Save a modified graph as ``name``, valid while its source keeps ``source_key``."""
+        with self._lock:
+            self._write_snapshot(name, graph, source_key)
+
+    def loaded(self) -> List[Tuple[str, int]]:
+        """(key, triple count) of the graphs held in memory."""
+        with self._lock:
+            return [(key, len(graph)) for key, graph in self._graphs.items()]
+
+
+_DEFAULT: Optional[OntologyStore] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_ontology_store() -> OntologyStore:
+    """The process-wide store, shared by every app and Streamlit session."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = OntologyStore()
+        return _DEFAULT
@@ -1,15 +1,80 @@
-
 import yaml
-from typing import Dict, List, Any, Union, IO
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, List, Any, Optional, Union, IO
 import urllib.parse
 
+# libyaml is ~10x faster on the 400-500 KB SentinelHub specs; fall back to pure Python
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+SPEC_CACHE_DIR = os.getenv("SPEC_CACHE_DIR", ".spec_cache")
+_COMPILED_FORMAT = 3
+_COMPILED: Dict[str, Dict[str, Any]] = {}  # content hash -> compiled spec, shared by all reruns/sessions
+
+
+def _parse_spec(raw: bytes) -> Dict[str, Any]:
+    text = raw.decode("utf-8-sig")
+    if text.lstrip().startswith("{"):
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass  # JSON-looking YAML flow mapping
+    return yaml.load(text, Loader=_YAML_LOADER)
+
+
+def _read_cached(path: str):
+    try:
+        with open(path, "rb") as f:
+            compiled = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    return compiled if compiled.get("_index", {}).get("format") == _COMPILED_FORMAT else None
+
+
+def _write_cached(path: str, compiled: Dict[str, Any]):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # read-only checkout: keep the in-process copy only
+
+
 def load_swagger(file: Union[str, IO]) -> Dict[str, Any]:
+    """Parse an OpenAPI/Swagger file once and return the compiled spec.
+
+    Compiled specs are cached by content hash in memory and on disk
+    (``$SPEC_CACHE_DIR``, default ``.spec_cache``), so Streamlit reruns and
+    re-uploads of the same file skip YAML parsing entirely.  The returned dict
+    is shared: treat it as read-only.
+    """
     if isinstance(file, str):
-        with open(file, 'r', encoding='utf-8') as f:
-            swagger = yaml.safe_load(f)
+        with open(file, 'rb') as f:
+            raw = f.read()
     else:
-        swagger = yaml.safe_load(file)
+        raw = file.read()
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+
+    digest = hashlib.sha256(raw).hexdigest()
+    compiled = _COMPILED.get(digest)
+    if compiled is None:
+        path = os.path.join(SPEC_CACHE_DIR, f"{digest}.pickle")
+        compiled = _read_cached(path)
+        if compiled is None:
+            compiled = compile_spec(_parse_spec(raw))
+            compiled["_index"]["hash"] = digest
+            _write_cached(path, compiled)
+        _COMPILED[digest] = compiled
+    return compiled
 
+
+def compile_spec(swagger: Dict[str, Any]) -> Dict[str, Any]:
+    """Add ``_base_url`` and a precomputed ``_index`` (endpoints, resolved parameters, enums)."""
     base_url = ""
     if "servers" in swagger:
         base_url = swagger["servers"][0]["url"].rstrip("/")
@@ -19,12 +84,39 @@ def load_swagger(file: Union[str, IO]) -> Dict[str, Any]:
         base_path = swagger.get("basePath", "")
         base_url = f"{scheme}://{host}{base_path}".rstrip("/")
     swagger["_base_url"] = base_url
+    swagger["_index"] = _build_index(swagger)
     return swagger
 
+
+def _endpoint_key(method: str, path: str) -> str:
+    return f"{method.upper()} {path}"
+
+
+def _build_index(swagger: Dict[str, Any]) -> Dict[str, Any]:
+    endpoints = _collect_endpoints(swagger)
+    params = {}
+    for ep in endpoints:
+        path_item = swagger["paths"][ep["path"]]
+        resolved = _resolve_parameters(swagger, path_item[ep["method"].lower()], path_item.get("parameters"))
+        for p in resolved:
+            p["_enum"] = _compute_enum(p, swagger)
+        params[_endpoint_key(ep["method"], ep["path"])] = resolved
+    return {"format": _COMPILED_FORMAT, "hash": None, "endpoints": endpoints, "parameters": params}
+
+
 def list_api_endpoints(swagger: Dict[str, Any]) -> List[Dict[str, Any]]:
+    index = swagger.get("_index")
+    if index:
+        return index["endpoints"]
+    return _collect_endpoints(swagger)
+
+
+def _collect_endpoints(swagger: Dict[str, Any]) -> List[Dict[str, Any]]:
     endpoints = []
     for path, methods in swagger.get("paths", {}).items():
         for method, meta in methods.items():
+            if method.lower() not in HTTP_METHODS:
+                continue  # path-level "parameters", "summary", "$ref", x-extensions
             endpoints.append({
                 "path": path,
                 "method": method.upper(),
@@ -35,38 +127,80 @@ def list_api_endpoints(swagger: Dict[str, Any]) -> List[Dict[str, Any]]:
     return endpoints
 
 def get_parameters_for_endpoint(swagger: Dict[str, Any], endpoint: Dict[str, Any]) -> List[Dict[str, Any]]:
-    param_defs = swagger.get("parameters", {})
-    resolved = []
-
+    index = swagger.get("_index")
+    if index and endpoint.get("method") and endpoint.get("path"):
+        cached = index["parameters"].get(_endpoint_key(endpoint["method"], endpoint["path"]))
+        if cached is not None:
+            return cached
     raw_endpoint = endpoint.get("raw", {})  # ✅ FIX: drill into 'raw' Swagger info
+    return _resolve_parameters(swagger, raw_endpoint)
+
 
-    for param in raw_endpoint.get("parameters", []):
-        if "$ref" in param:
-            ref_path = param["$ref"].split("/")
-            if len(ref_path) >= 3 and ref_path[1] == "parameters":
-                ref_key = ref_path[2]
-                resolved_param = param_defs.get(ref_key, {}).copy()
-                if resolved_param:
-                    resolved.append(resolved_param)
-        else:
-            resolved.append(param)
+def _resolve_parameters(swagger: Dict[str, Any], raw_endpoint: Dict[str, Any],
+                        path_params: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Operation parameters with every $ref followed (Swagger 2 and OpenAPI 3).
+
+    Path-level parameters are included unless the operation overrides them
+    (same ``name`` and ``in``).  Each entry is a copy, with its ``schema``
+    resolved at the top level, so callers may annotate it freely.
+    """
+    resolver = get_resolver(swagger)
+    resolved = []
+    seen = set()
+
+    for param in list(raw_endpoint.get("parameters", [])) + list(path_params or []):
+        param = resolver.resolve(param)
+        if not param:
+            continue
+        key = (param.get("name"), param.get("in"))
+        if key in seen:
+            continue
+        seen.add(key)
+        param = dict(param)
+        if isinstance(param.get("schema"), dict):
+            param["schema"] = resolver.resolve(param["schema"])
+        resolved.append(param)
 
     return resolved
 
 def get_enum_options(param, swagger=None):
     """Extract enum values from a parameter, resolving $ref if needed."""
+    if "_enum" in param:
+        return param["_enum"]  # precomputed by load_swagger
+    return _compute_enum(param, swagger)
+
+
+def _compute_enum(param, swagger=None):
     schema = param.get("schema")
 
     if schema is None:
         # Check for top-level enum (older Swagger 2.0)
         if "enum" in param:
             return param["enum"]
+        if param.get("type") == "array" and isinstance(param.get("items"), dict):
+            return param["items"].get("enum", [])  # collectionFormat=multi
         return []
 
-    if "$ref" in schema and swagger:
-        schema = resolve_ref(swagger, schema["$ref"])
+    if swagger is None:
+        return schema.get("enum", [])
+    return _schema_enum(get_resolver(swagger), schema)
+
 
-    return schema.get("enum", [])
+def _schema_enum(resolver: "RefResolver", schema: Any, depth: int = 0) -> List[Any]:
+    """First enum found on the schema, its array items or its allOf/oneOf/anyOf branches."""
+    schema = resolver.resolve(schema)
+    if not isinstance(schema, dict) or depth > 8:
+        return []
+    if "enum" in schema:
+        return schema["enum"]
+    if schema.get("type") == "array" and "items" in schema:
+        return _schema_enum(resolver, schema["items"], depth + 1)
+    for combinator in ("allOf", "oneOf", "anyOf"):
+        for branch in schema.get(combinator, []):
+            found = _schema_enum(resolver, branch, depth + 1)
+            if found:
+                return found
+    return []
 
 
 def describe_param(param: Dict[str, Any]) -> str:
@@ -100,17 +234,133 @@ def build_full_url(swagger, path_template, path_vals=None, query_params=None):
 
 def resolve_ref(swagger, ref_path):
     """
-    Resolves $ref like '#/definitions/post-params' into the actual object.
+    Resolves $ref like '#/definitions/post-params' or '#/components/schemas/Foo'
+    into the actual object, following chained refs.  Returns {} if it can't.
     """
-    if not ref_path.startswith("#/"):
+    try:
+        return get_resolver(swagger).lookup(ref_path)
+    except RefResolutionError:
         return {}
 
-    parts = ref_path[2:].split("/")  # Remove '#/' and split by '/'
-    ref = swagger
-    for part in parts:
-        ref = ref.get(part)
-        if ref is None:
-            return {}
-    return ref
+
+class RefResolutionError(ValueError):
+    pass
+
+
+class RefResolver:
+    """Memoized resolver for local JSON-pointer ``$ref``s (``#/definitions/...``,
+    ``#/components/schemas/...``, ``#/parameters/...`` etc.).
+
+    * ``lookup(ref)`` follows ref chains to a concrete node; results are cached
+      by pointer and a chain that loops back on itself raises ``RefResolutionError``
+    * ``resolve(node)`` is ``lookup`` for a node that may or may not be a ``$ref``
+    * ``dereference(node)`` / ``dereferenced()`` build a fully dereferenced view
+      lazily.  Every pointer maps to one shared output node, so recursive schemas
+      become cyclic Python objects instead of infinite expansions: don't
+      ``json.dumps`` them.
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self._targets: Dict[str, Any] = {}
+        self._views: Dict[int, Any] = {}
+        self._keep: List[Any] = []  # inputs whose id() is a _views key must stay alive
+        self._top: Optional[Dict[str, Any]] = None  # dereferenced(), built once
+
+    def __getstate__(self):
+        return {"spec": self.spec}  # memo tables are cheap to rebuild and may be cyclic
+
+    def __setstate__(self, state):
+        self.__init__(state["spec"])
+
+    @staticmethod
+    def _pointer_parts(ref: str) -> List[str]:
+        if not ref.startswith("#"):
+            raise RefResolutionError(f"external $ref not supported: {ref}")
+        pointer = urllib.parse.unquote(ref[1:])
+        if not pointer:
+            return []
+        if not pointer.startswith("/"):
+            raise RefResolutionError(f"malformed $ref: {ref}")
+        return [p.replace("~1", "/").replace("~0", "~") for p in pointer[1:].split("/")]
+
+    def _walk(self, ref: str) -> Any:
+        node = self.spec
+        for part in self._pointer_parts(ref):
+            if isinstance(node, list):
+                try:
+                    node = node[int(part)]
+                except (ValueError, IndexError):
+                    raise RefResolutionError(f"unresolvable $ref: {ref}") from None
+            elif isinstance(node, dict) and part in node:
+                node = node[part]
+            else:
+                raise RefResolutionError(f"unresolvable $ref: {ref}")
+        return node
+
+    def lookup(self, ref: str) -> Any:
+        if ref in self._targets:
+            return self._targets[ref]
+        chain = [ref]
+        node = self._walk(ref)
+        while isinstance(node, dict) and isinstance(node.get("$ref"), str):
+            nxt = node["$ref"]
+            if nxt in self._targets:
+                node = self._targets[nxt]
+                break
+            if nxt in chain:
+                raise RefResolutionError("circular $ref: " + " -> ".join(chain + [nxt]))
+            chain.append(nxt)
+            node = self._walk(nxt)
+        for r in chain:
+            self._targets[r] = node
+        return node
+
+    def resolve(self, node: Any) -> Any:
+        """The node itself, or the target of its ``$ref`` ({} if unresolvable)."""
+        if isinstance(node, dict) and isinstance(node.get("$ref"), str):
+            try:
+                return self.lookup(node["$ref"])
+            except RefResolutionError:
+                return {}
+        return node
+
+    def dereference(self, node: Any) -> Any:
+        if isinstance(node, dict):
+            if isinstance(node.get("$ref"), str):
+                try:
+                    target = self.lookup(node["$ref"])
+                except RefResolutionError:
+                    return node  # leave external / broken refs in place
+                return self.dereference(target)
+            view = self._views.get(id(node))
+            if view is None:
+                view = self._views[id(node)] = {}
+                self._keep.append(node)
+                for k, v in node.items():
+                    view[k] = self.dereference(v)
+            return view
+        if isinstance(node, list):
+            view = self._views.get(id(node))
+            if view is None:
+                view = self._views[id(node)] = []
+                self._keep.append(node)
+                view.extend(self.dereference(v) for v in node)
+            return view
+        return node
+
+    def dereferenced(self) -> Dict[str, Any]:
+        """The whole spec with every local $ref replaced by its (shared) target; built once per resolver."""
+        if self._top is None:
+            self._top = self.dereference({k: v for k, v in self.spec.items() if not k.startswith("_")})
+        return self._top
+
+
+def get_resolver(swagger: Dict[str, Any]) -> RefResolver:
+    """The resolver attached to ``swagger`` (created on first use)."""
+    resolver = swagger.get("_resolver")
+    if resolver is None or resolver.spec is not swagger:
+        resolver = swagger["_resolver"] = RefResolver(swagger)
+    return resolver
 
 
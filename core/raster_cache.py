@@ -0,0 +1,224 @@
+"""
+Content-addressed cache for SentinelHub Process API rasters.
+
+Processing units cost money, and dataset builds often send the same
+``/process`` request (bbox, time range, evalscript) again -- in a later run or
+from another user's session.  ``execute_sentinel_query`` looks rasters up here
+before going upstream:
+
+* the key is a SHA-256 over the URL, the canonical JSON of the request body
+  without the evalscript, and the evalscript itself (line endings and
+  trailing whitespace normalised); the access token is not part of it, so
+  users share entries
+* rasters are streamed straight into ``<dir>/<k[:2]>/<k>.<ext>``; an SQLite
+  index (WAL, shared between processes) keeps content type, header metadata,
+  size, hits and access times
+* identical requests in flight at the same time are coalesced (single flight):
+  one upstream call, the other callers wait for and share its result
+* least recently used rasters are evicted once ``max_bytes`` is exceeded
+
+The cache lives in ``$RASTER_CACHE_DIR`` (default ``.raster_cache``; an empty
+string disables it) with a budget of ``$RASTER_CACHE_MAX_BYTES``.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+EXTENSIONS = {"image/tiff": ".tiff", "image/png": ".png", "image/jpeg": ".jpg"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rasters (
+    key          TEXT PRIMARY KEY,
+    file         TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    raster       TEXT,
+    size         INTEGER NOT NULL,
+    hits         INTEGER NOT NULL DEFAULT 0,
+    stored_at    REAL NOT NULL,
+    accessed_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rasters_accessed_at ON rasters(accessed_at);
+"""
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _normalize_script(script: Optional[str]) -> str:
+    return "\n".join(line.rstrip() for line in (script or "").strip().splitlines())
+
+
+def process_key(url: str, post_body: Dict[str, Any]) -> str:
+    """Cache key of a Process API request: URL + cleaned body + evalscript."""
+    body = post_body or {}
+    parts = {
+        "url": url,
+        "request": {k: v for k, v in body.items() if k not in ("evalscript", "evalscriptType")},
+        "evalscript": hashlib.sha256(_normalize_script(body.get("evalscript")).encode("utf-8")).hexdigest(),
+        "evalscriptType": body.get("evalscriptType"),
+    }
+    return hashlib.sha256(_canonical(parts).encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Runs a function once per key for concurrent callers; the others wait and share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns ``(result, leader)``; ``leader`` is False for callers that shared another's call."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), False
+        try:
+            value = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value, True
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class RasterCache:
+    def __init__(self, directory: str = ".raster_cache", max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.flights = SingleFlight()
+        self.coalesced = 0  # callers served by another caller's in-flight request
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.directory / "index.sqlite"), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def path_for(self, key: str, content_type: str) -> str:
+        """Where a raster should be streamed to before ``put``."""
+        ext = EXTENSIONS.get(content_type.split(";")[0].strip(), ".bin")
+        return str(self.directory / key[:2] / f"{key}{ext}")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Executor-style result for a cached raster (``download_url``, ``content_type``, ``raster``), or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT file, content_type, raster FROM rasters WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        file, content_type, raster = row
+        if not os.path.exists(file):
+            conn.execute("DELETE FROM rasters WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE rasters SET hits = hits + 1, accessed_at = ? WHERE key = ?", (time.time(), key))
+        result = {"download_url": file, "content_type": content_type, "cache": "HIT"}
+        if raster:
+            result["raster"] = json.loads(raster)
+        return result
+
+    def put(self, key: str, file: str, content_type: str, raster: Optional[Dict[str, Any]] = None):
+        """Index a raster already written to ``path_for(key, content_type)``."""
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO rasters(key, file, content_type, raster, size, hits, stored_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+            (key, file, content_type, json.dumps(raster) if raster else None, os.path.getsize(file), now, now),
+        )
+        self.evict(keep=key)
+
+    def coalesce(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        value, leader = self.flights.do(key, fn)
+        if not leader:
+            self.coalesced += 1
+        return value, leader
+
+    def total_bytes(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM rasters").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        entries, size, hits = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM rasters").fetchone()
+        return {"entries": entries, "bytes": size, "hits": hits, "coalesced": self.coalesced}
+
+    def evict(self, keep: Optional[str] = None):
+        """Drop least recently used rasters until the cache fits in ``max_bytes``."""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        conn = self._conn()
+        for key, file, size in conn.execute("SELECT key, file, size FROM rasters ORDER BY accessed_at").fetchall():
+            if excess <= 0:
+                break
+            if key == keep:
+                continue
+            conn.execute("DELETE FROM rasters WHERE key = ?", (key,))
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+            excess -= size
+
+    def clear(self):
+        conn = self._conn()
+        for (file,) in conn.execute("SELECT file FROM rasters").fetchall():
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+        conn.execute("DELETE FROM rasters")
+
+
+def export_file(src: str, dst: str) -> str:
+    """Place a copy of a cached raster at ``dst``, atomically.
+
+    Never a hard link: writing to the exported file would then change the
+    cache entry every other caller is served.
+    """
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    tmp = os.path.join(os.path.dirname(dst) or ".", f".{os.path.basename(dst)}.{os.getpid()}.{threading.get_ident()}.part")
+    try:
+        shutil.copyfile(src, tmp)  # copy_file_range / sendfile where the OS has them
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return dst
+
+
+_DEFAULT: Optional[RasterCache] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_raster_cache() -> Optional[RasterCache]:
+    """The process-wide raster cache, or None when ``$RASTER_CACHE_DIR`` is set to an empty string."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            directory = os.getenv("RASTER_CACHE_DIR", ".raster_cache")
+            if not directory:
+                return None
+            _DEFAULT = RasterCache(directory, max_bytes=int(os.getenv("RASTER_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
+        return _DEFAULT
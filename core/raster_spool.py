@@ -0,0 +1,204 @@
+"""
+Streaming storage for raster (GeoTIFF / PNG / JPEG) responses.
+
+Image responses used to be read whole into memory (``response.content``),
+copied into a ``NamedTemporaryFile`` that was never deleted, and read back
+again for the download button.  Here:
+
+* ``RasterSpool.stream_to(response)`` writes the body to disk chunk by chunk
+  (``iter_content``) -- into a spool file, or straight into a target path --
+  so the raster is never held in memory; files appear atomically (written
+  as dot-``.part`` files, then renamed)
+* the spool directory is bounded: after every write the oldest files are
+  deleted until the directory fits ``max_bytes`` (``$SENTINELHUB_SPOOL_MAX_BYTES``)
+* ``tiff_info(path)`` reads width, height, bands, dtype, compression, CRS and
+  geotransform from the TIFF header through a memory map, without decoding
+  any pixels (and without rasterio/GDAL)
+* ``map_file(path)`` gives a read-only ``mmap`` for zero-copy consumers
+
+    path = get_spool().stream_to(response)
+    tiff_info(path)   # RasterInfo(width=2500, height=2500, bands=4, dtype='float32', crs='EPSG:32633', ...)
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import uuid
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+SPOOL_DIR = os.getenv("SENTINELHUB_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "sentinelhub_spool"))
+SPOOL_MAX_BYTES = int(os.getenv("SENTINELHUB_SPOOL_MAX_BYTES", str(2 * 1024 ** 3)))
+CHUNK_SIZE = 1024 * 1024
+SUFFIXES = {"image/tiff": ".tiff", "image/png": ".png", "image/jpeg": ".jpg"}
+
+
+class RasterInfo(NamedTuple):
+    width: int
+    height: int
+    bands: int
+    dtype: str
+    compression: Optional[int]  # TIFF compression code (1 none, 5 LZW, 8 deflate ...)
+    crs: Optional[str]  # "EPSG:<code>" from the GeoKey directory
+    transform: Optional[Tuple[float, ...]]  # GDAL order: x0, pixel width, 0, y0, 0, -pixel height
+    bytes: int
+
+
+class RasterSpool:
+    def __init__(self, directory: str = SPOOL_DIR, max_bytes: int = SPOOL_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def stream_to(self, response, path: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> str:
+        """Write a (``stream=True``) response body to ``path``, or to a new spool file; returns the path.
+
+        Only spool files count against (and are evicted by) the size bound.
+        """
+        if path is None:
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, uuid.uuid4().hex + SUFFIXES.get(content_type, ".bin"))
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # unique per writer: concurrent writers of the same path never share a temp file
+        tmp = os.path.join(os.path.dirname(path) or ".",
+                           f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.part")
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            response.close()
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.directory):
+            self.evict(keep=path)
+        return path
+
+    def files(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of the finished spool files, oldest first."""
+        out = []
+        if not os.path.isdir(self.directory):
+            return out
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                out.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(out)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete the oldest spool files until the directory fits ``max_bytes``; returns bytes freed."""
+        with self._lock:
+            files = self.files()
+            total = sum(size for _, size, _ in files)
+            freed = 0
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                if keep and os.path.abspath(path) == os.path.abspath(keep):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue  # already gone (another process) or still open on Windows
+                total -= size
+                freed += size
+            return freed
+
+
+_DEFAULT: Optional[RasterSpool] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_spool() -> RasterSpool:
+    """The process-wide spool in ``$SENTINELHUB_SPOOL_DIR``."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = RasterSpool()
+        return _DEFAULT
+
+
+def map_file(path: str) -> mmap.mmap:
+    """Read-only memory map of a whole file (closing it doesn't affect the file)."""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# ---- TIFF header --------------------------------------------------------
+_TYPES = {1: "B", 2: "c", 3: "H", 4: "I", 5: "II", 6: "b", 7: "B", 8: "h", 9: "i", 10: "ii", 11: "f", 12: "d",
+          16: "Q", 17: "q"}
+_SAMPLE_FORMATS = {1: "uint", 2: "int", 3: "float"}
+
+
+def _read_ifd(buf, offset: int, order: str, big: bool) -> Dict[int, Tuple]:
+    count_fmt, entry_size, inline = ("Q", 20, 8) if big else ("H", 12, 4)
+    (count,) = struct.unpack_from(order + count_fmt, buf, offset)
+    offset += struct.calcsize(count_fmt)
+    tags: Dict[int, Tuple] = {}
+    for i in range(count):
+        entry = offset + i * entry_size
+        tag, kind = struct.unpack_from(order + "HH", buf, entry)
+        (n,) = struct.unpack_from(order + ("Q" if big else "I"), buf, entry + 4)
+        fmt = _TYPES.get(kind)
+        if fmt is None:
+            continue
+        size = struct.calcsize(fmt) * n
+        value_at = entry + (12 if big else 8)
+        if size > inline:
+            (value_at,) = struct.unpack_from(order + ("Q" if big else "I"), buf, value_at)
+        if kind == 2:
+            tags[tag] = (bytes(buf[value_at:value_at + n]).rstrip(b"\0").decode("latin-1"),)
+        else:
+            tags[tag] = struct.unpack_from(order + fmt * n, buf, value_at)
+    return tags
+
+
+def _epsg(geokeys: Tuple) -> Optional[str]:
+    # GeoKeyDirectory: header (version, revision, minor, count) then 4 shorts per key
+    for i in range(4, 4 + 4 * geokeys[3], 4):
+        key, location, _, value = geokeys[i:i + 4]
+        if key in (3072, 2048) and location == 0 and value not in (0, 32767):  # Projected / Geographic CRS
+            return f"EPSG:{value}"
+    return None
+
+
+def tiff_info(path: str) -> RasterInfo:
+    """Shape, dtype, CRS and geotransform of a (Geo)TIFF, from its first IFD only."""
+    size = os.path.getsize(path)
+    buf = map_file(path)
+    try:
+        order = {b"II": "<", b"MM": ">"}.get(bytes(buf[:2]))
+        if order is None:
+            raise ValueError(f"{path} is not a TIFF file")
+        (magic,) = struct.unpack_from(order + "H", buf, 2)
+        big = magic == 43
+        if magic not in (42, 43):
+            raise ValueError(f"{path} is not a TIFF file")
+        (ifd,) = struct.unpack_from(order + ("Q" if big else "I"), buf, 8 if big else 4)
+        tags = _read_ifd(buf, ifd, order, big)
+    finally:
+        buf.close()
+
+    bands = tags.get(277, (1,))[0]
+    bits = tags.get(258, (8,))[0]
+    kind = _SAMPLE_FORMATS.get(tags.get(339, (1,))[0], "uint")
+    transform = None
+    if 33550 in tags and 33922 in tags:  # ModelPixelScale + ModelTiepoint
+        sx, sy = tags[33550][:2]
+        i, j, _, x, y = tags[33922][:5]
+        transform = (x - i * sx, sx, 0.0, y + j * sy, 0.0, -sy)
+    return RasterInfo(
+        width=tags[256][0],
+        height=tags[257][0],
+        bands=bands,
+        dtype=f"{kind}{bits}",
+        compression=tags.get(259, (None,))[0],
+        crs=_epsg(tags[34735]) if 34735 in tags else None,
+        transform=transform,
+        bytes=size,
+    )
@@ -0,0 +1,429 @@
+"""
+Batch harvesting of ReliefWeb API queries.
+
+A batch is a list of query specs, e.g.::
+
+    [
+      {"name": "floods-2024", "endpoint": "reports",
+       "query": {"value": "flood"}, "filter": {"field": "date.created", "value": {"from": "2024-01-01T00:00:00+00:00"}},
+       "fields": {"include": ["title", "date.created", "country.name"]}},
+      {"name": "disasters", "endpoint": "disasters", "method": "GET", "params": {"query[value]": "earthquake"}}
+    ]
+
+``name``, ``endpoint``, ``method`` (default POST) and ``params`` (extra query
+string) are reserved; every other key goes into the POST body (or, for GET,
+into the query string).
+
+* every query is paged with ``offset`` / ``limit`` until ``totalCount``; once the
+  first page has told us the total, the remaining pages are fetched in parallel
+* all pages of all queries share one pool of ``concurrency`` workers on top of
+  the pooled, retrying ``core.http_client`` (which also caps requests per host)
+* raw items are written to an SQLite table as each page arrives, in the same
+  transaction as the page checkpoint, so an interrupted batch resumes with only
+  the missing pages; they are flattened column-wise (``core.flattening``) with
+  one schema per endpoint when read back, ``EXPORT_CHUNK`` items at a time
+  from the store cursor
+* queries without an explicit ``sort`` are sorted by ``id:asc`` to keep page
+  boundaries stable while a harvest is running
+
+CLI::
+
+    python -m core.reliefweb_batch run queries.json --db harvest.sqlite --concurrency 4
+    python -m core.reliefweb_batch status --db harvest.sqlite
+    python -m core.reliefweb_batch export --db harvest.sqlite --name floods-2024 --output floods.parquet
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from core.http_client import get_client
+from core.dataset_export import dataframe_to_bytes
+from core.flattening import join_list_cells, records_to_frame, schema_for
+
+BASE_URL = os.getenv("RELIEFWEB_BASE_URL", "https://api.reliefweb.int/v1")
+APPNAME = os.getenv("RELIEFWEB_APPNAME", "rwint-user-2891143")
+MAX_LIMIT = 1000  # ReliefWeb rejects larger pages
+RESERVED_KEYS = ("name", "endpoint", "method", "params")
+EXPORT_CHUNK = 5000  # items decoded and flattened at a time when reading a query back
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    name       TEXT PRIMARY KEY,
+    spec_hash  TEXT NOT NULL,
+    spec       TEXT NOT NULL,
+    total      INTEGER,
+    page_size  INTEGER NOT NULL,
+    error      TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    name       TEXT NOT NULL,
+    "offset"   INTEGER NOT NULL,
+    count      INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (name, "offset")
+);
+CREATE TABLE IF NOT EXISTS items (
+    name      TEXT NOT NULL,
+    "offset"  INTEGER NOT NULL,
+    pos       INTEGER NOT NULL,
+    id        TEXT NOT NULL,
+    item      TEXT NOT NULL,
+    PRIMARY KEY (name, id)
+);
+CREATE INDEX IF NOT EXISTS items_order ON items(name, "offset", pos);
+"""
+
+ProgressCallback = Callable[[str, int, Optional[int]], None]  # (query name, rows stored, total)
+
+
+class BatchError(RuntimeError):
+    pass
+
+
+def _spec_hash(spec: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def normalize_query(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in defaults (name, method, sort) and validate a query spec."""
+    if not spec.get("endpoint"):
+        raise BatchError(f"query spec without 'endpoint': {spec}")
+    spec = dict(spec)
+    spec["endpoint"] = spec["endpoint"].strip("/")
+    spec["method"] = spec.get("method", "POST").upper()
+    if spec["method"] not in ("GET", "POST"):
+        raise BatchError(f"unsupported method {spec['method']} for query {spec.get('name')}")
+    if spec["method"] == "POST":
+        spec.setdefault("sort", ["id:asc"])
+    else:
+        spec.setdefault("params", {})
+        spec["params"] = dict(spec["params"])
+        spec["params"].setdefault("sort[]", "id:asc")
+    spec.setdefault("name", f"{spec['endpoint']}-{_spec_hash(spec)[:8]}")
+    return spec
+
+
+class BatchStore:
+    """SQLite table of harvested items plus per-page checkpoints."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def prepare(self, spec: Dict[str, Any], page_size: int, restart: bool = False) -> Tuple[Optional[int], set]:
+        """Register a query; returns (known total, offsets already stored).
+
+        A query whose spec or page size changed since the last run starts over.
+        """
+        name, digest = spec["name"], _spec_hash(spec)
+        row = self.conn.execute("SELECT spec_hash, total, page_size FROM queries WHERE name = ?", (name,)).fetchone()
+        if restart or row is None or row[0] != digest or row[2] != page_size:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute("DELETE FROM items WHERE name = ?", (name,))
+            self.conn.execute("DELETE FROM pages WHERE name = ?", (name,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO queries(name, spec_hash, spec, total, page_size, error, updated_at) VALUES (?, ?, ?, NULL, ?, NULL, ?)",
+                (name, digest, json.dumps(spec, default=str), page_size, time.time()),
+            )
+            self.conn.execute("COMMIT")
+            return None, set()
+        self.conn.execute("UPDATE queries SET error = NULL WHERE name = ?", (name,))
+        return row[1], self.done_offsets(name)
+
+    def write_page(self, name: str, offset: int, total: Optional[int], items: List[Dict[str, Any]]):
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO items(name, "offset", pos, id, item) VALUES (?, ?, ?, ?, ?)',
+                [(name, offset, i, str(item.get("id", f"{offset}:{i}")), json.dumps(item, default=str))
+                 for i, item in enumerate(items)],
+            )
+            self.conn.execute('INSERT OR REPLACE INTO pages(name, "offset", count, fetched_at) VALUES (?, ?, ?, ?)',
+                              (name, offset, len(items), now))
+            self.conn.execute("UPDATE queries SET total = COALESCE(?, total), updated_at = ? WHERE name = ?",
+                              (total, now, name))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def done_offsets(self, name: str) -> set:
+        return {o for (o,) in self.conn.execute('SELECT "offset" FROM pages WHERE name = ?', (name,))}
+
+    def set_error(self, name: str, error: str):
+        self.conn.execute("UPDATE queries SET error = ?, updated_at = ? WHERE name = ?", (error, time.time(), name))
+
+    def count(self, name: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM items WHERE name = ?", (name,)).fetchone()[0]
+
+    def status(self) -> List[Dict[str, Any]]:
+        out = []
+        for name, total, page_size, error, updated_at in self.conn.execute(
+                "SELECT name, total, page_size, error, updated_at FROM queries ORDER BY name").fetchall():
+            pages = self.conn.execute("SELECT COUNT(*) FROM pages WHERE name = ?", (name,)).fetchone()[0]
+            expected = None if total is None else max(1, -(-total // page_size))
+            out.append({
+                "name": name,
+                "total": total,
+                "rows": self.count(name),
+                "pages": pages,
+                "complete": expected is not None and pages >= expected,
+                "error": error,
+                "updated_at": updated_at,
+            })
+        return out
+
+    def _queries(self, name: Optional[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        sql = "SELECT name, spec FROM queries {} ORDER BY name".format("WHERE name = ?" if name else "")
+        return [(n, json.loads(spec)) for n, spec in self.conn.execute(sql, (name,) if name else ())]
+
+    def items(self, name: str) -> List[Dict[str, Any]]:
+        return [item for chunk in self.iter_items(name) for item in chunk]
+
+    def iter_items(self, name: str, chunk_size: int = EXPORT_CHUNK) -> Iterator[List[Dict[str, Any]]]:
+        """Stored items of one query in page order, ``chunk_size`` at a time."""
+        cursor = self.conn.execute('SELECT item FROM items WHERE name = ? ORDER BY "offset", pos', (name,))
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield [json.loads(item) for (item,) in rows]
+        finally:
+            cursor.close()
+
+    def _schema(self, name: str, spec: Dict[str, Any]):
+        """The query's columns: its ``fields.include``, or the endpoint schema extended by every stored item."""
+        fields = (spec.get("fields") or {}).get("include") if isinstance(spec.get("fields"), dict) else None
+        schema = schema_for("/" + spec["endpoint"], fields=fields)
+        if not fields:
+            for chunk in self.iter_items(name):  # a first pass, so every chunk gets the same columns
+                schema.extend(chunk)
+        return schema
+
+    def iter_frames(self, name: Optional[str] = None, chunk_size: int = EXPORT_CHUNK) -> Iterator[pd.DataFrame]:
+        """Flattened rows of one query, or of all queries with a ``_query`` column, in chunks.
+
+        Columns follow the endpoint's schema (or the query's ``fields.include``),
+        with list values kept as lists; every chunk has the same columns.
+        """
+        queries = [(query_name, self._schema(query_name, spec)) for query_name, spec in self._queries(name)]
+        columns = [] if name else ["_query"]
+        for _, schema in queries:
+            columns += [c.name for c in schema.columns if c.name not in columns]
+        for query_name, schema in queries:
+            for items in self.iter_items(query_name, chunk_size):
+                frame = records_to_frame(items, schema)
+                if name is None:
+                    frame.insert(0, "_query", query_name)
+                yield frame if list(frame.columns) == columns else frame.reindex(columns=columns)
+
+    def to_dataframe(self, name: Optional[str] = None) -> pd.DataFrame:
+        """All of ``iter_frames`` in one DataFrame (built chunk by chunk, never from every raw item at once)."""
+        frames = list(self.iter_frames(name))
+        if not frames:
+            return pd.DataFrame()
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True, sort=False)
+
+    def iter_rows(self, name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        for frame in self.iter_frames(name):
+            frame = frame.astype(object).where(frame.notna(), None)  # NaN isn't valid JSON
+            yield from frame.to_dict("records")
+
+
+def _bracket_params(value: Any, prefix: str) -> List[Tuple[str, Any]]:
+    """ReliefWeb GET syntax: {"query": {"value": "x"}} -> query[value]=x, lists -> key[]=a&key[]=b."""
+    if isinstance(value, dict):
+        out = []
+        for k, v in value.items():
+            out.extend(_bracket_params(v, f"{prefix}[{k}]"))
+        return out
+    if isinstance(value, list):
+        return [(f"{prefix}[]", v) for v in value]
+    return [(prefix, value)]
+
+
+def fetch_page(spec: Dict[str, Any], offset: int, limit: int, base_url: str = BASE_URL,
+               appname: str = APPNAME) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+    """One page of a query: (totalCount, data items).
+
+    Pages bypass the response cache: a resumed or restarted batch must see the
+    current pages and ``totalCount``, not an hour-old copy.
+    """
+    url = f"{base_url.rstrip('/')}/{spec['endpoint']}"
+    params = {"appname": appname, **spec.get("params", {})}
+    body = {k: v for k, v in spec.items() if k not in RESERVED_KEYS}
+    if spec["method"] == "GET":
+        query = list(params.items())
+        for k, v in body.items():
+            query.extend(_bracket_params(v, k))
+        query += [("offset", offset), ("limit", limit)]
+        response = get_client().get(url, params=query, cache=False)
+    else:
+        # read-only search, so retried
+        response = get_client().post(url, params=params, json={**body, "offset": offset, "limit": limit},
+                                     retry=True, cache=False)
+    try:
+        response.raise_for_status()
+        payload = response.json()
+    except Exception as e:
+        raise BatchError(f"{spec['name']} offset {offset} → {e}") from e
+    return payload.get("totalCount"), payload.get("data", []) or []
+
+
+def run_batch(queries: List[Dict[str, Any]], db_path: str, *, concurrency: int = 4, limit: int = MAX_LIMIT,
+              base_url: str = BASE_URL, appname: str = APPNAME, restart: bool = False,
+              on_progress: Optional[ProgressCallback] = None) -> List[Dict[str, Any]]:
+    """Harvest every page of every query into ``db_path``; returns the per-query status.
+
+    Pages already in the store are skipped, so re-running an interrupted batch
+    only fetches what is missing.  A failing query is recorded (``error``) and
+    does not stop the others.
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    specs = [normalize_query(q) for q in queries]
+    names = [s["name"] for s in specs]
+    if len(set(names)) != len(names):
+        raise BatchError("query names must be unique")
+
+    store = BatchStore(db_path)
+    try:
+        pending: Dict[Any, Tuple[Dict[str, Any], int]] = {}
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="reliefweb") as pool:
+            def submit(spec, offset):
+                fut = pool.submit(fetch_page, spec, offset, limit, base_url, appname)
+                pending[fut] = (spec, offset)
+
+            def submit_missing(spec, total, done):
+                for offset in range(0, total, limit):
+                    if offset not in done:
+                        submit(spec, offset)
+
+            for spec in specs:
+                total, done = store.prepare(spec, limit, restart=restart)
+                if total is None:
+                    submit(spec, 0)  # discover totalCount first
+                else:
+                    submit_missing(spec, total, done)
+                    if on_progress:
+                        on_progress(spec["name"], store.count(spec["name"]), total)
+
+            while pending:
+                finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    spec, offset = pending.pop(fut)
+                    name = spec["name"]
+                    try:
+                        total, items = fut.result()
+                    except Exception as e:
+                        store.set_error(name, str(e))
+                        continue
+                    store.write_page(name, offset, total, items)  # still a valid checkpoint if a sibling page failed
+                    if offset == 0 and total:
+                        # the total may have grown since a previous run
+                        in_flight = {o for s, o in pending.values() if s is spec}
+                        submit_missing(spec, total, store.done_offsets(name) | in_flight)
+                    if on_progress:
+                        on_progress(name, store.count(name), total)
+        return [s for s in store.status() if s["name"] in names]
+    finally:
+        store.close()
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _build_parser():
+    p = argparse.ArgumentParser("reliefweb_batch", description="Harvest ReliefWeb API queries with pagination and checkpoints")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="harvest (or resume) the queries in a JSON file")
+    r.add_argument("queries", help="JSON file with a list of query specs")
+    r.add_argument("--concurrency", type=int, default=4)
+    r.add_argument("--limit", type=int, default=MAX_LIMIT, help="page size (max 1000)")
+    r.add_argument("--restart", action="store_true", help="discard stored pages and start over")
+    r.add_argument("--appname", default=APPNAME)
+    r.add_argument("--base-url", default=BASE_URL)
+
+    sub.add_parser("status", help="per-query totals, stored rows and errors")
+
+    e = sub.add_parser("export", help="write stored rows as CSV, ndjson, Parquet or Feather")
+    e.add_argument("--name", help="only this query (default: all, with a _query column)")
+    e.add_argument("--output", required=True, help="*.csv, *.ndjson, *.parquet or *.feather (the last two need pyarrow)")
+
+    p.add_argument("--db", default="reliefweb_batch.sqlite")
+    p.add_argument("--json", action="store_true")
+    return p
+
+
+def run_cli(argv: Optional[List[str]] = None):
+    args = _build_parser().parse_args(argv)
+    if args.cmd == "run":
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = json.load(f)
+
+        def progress(name, rows, total):
+            print(f"{name}: {rows}/{total if total is not None else '?'}", file=sys.stderr, flush=True)
+
+        try:
+            status = run_batch(queries, args.db, concurrency=args.concurrency, limit=args.limit, base_url=args.base_url,
+                               appname=args.appname, restart=args.restart, on_progress=progress)
+        except BatchError as e:
+            sys.exit(f"ReliefWeb batch error: {e}")
+    elif args.cmd == "status":
+        store = BatchStore(args.db)
+        status = store.status()
+        store.close()
+    else:
+        store = BatchStore(args.db)
+        try:
+            if args.output.endswith(".ndjson"):
+                with open(args.output, "w", encoding="utf-8") as f:
+                    for row in store.iter_rows(args.name):
+                        f.write(json.dumps(row, default=str) + "\n")
+            elif args.output.lower().endswith(".csv"):
+                with open(args.output, "w", encoding="utf-8", newline="") as f:
+                    for n, frame in enumerate(store.iter_frames(args.name)):
+                        join_list_cells(frame).to_csv(f, index=False, header=n == 0)
+            else:
+                fmt = {".parquet": "parquet", ".feather": "feather", ".arrow": "feather"}.get(
+                    os.path.splitext(args.output)[1].lower(), "csv")
+                try:
+                    data = dataframe_to_bytes(store.to_dataframe(args.name), fmt)
+                except RuntimeError as e:
+                    sys.exit(str(e))
+                with open(args.output, "wb") as f:
+                    f.write(data)
+        finally:
+            store.close()
+        return
+
+    if args.json:
+        print(json.dumps(status, indent=2))
+    else:
+        for s in status:
+            state = "error: " + s["error"] if s["error"] else ("complete" if s["complete"] else "incomplete")
+            print(f"{s['name']}: {s['rows']} of {s['total']} rows, {s['pages']} page(s), {state}")
+    if any(s["error"] for s in status):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run_cli()
@@ -1,7 +1,4 @@
 
-import os
-from datetime import datetime
-import pandas as pd
 from typing import Dict, Any
 
 def build_request_url(swagger: Dict[str, Any], path: str) -> str:
@@ -13,11 +10,3 @@ def build_request_url(swagger: Dict[str, Any], path: str) -> str:
     if not path.startswith("/"):
         path = "/" + path
     return f"{base_url.rstrip('/')}{path}"
-
-def save_dataframe_to_csv(df: pd.DataFrame, label: str = "results", output_dir: str = "output") -> str:
-    os.makedirs(output_dir, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{label}_{timestamp}.csv"
-    filepath = os.path.join(output_dir, filename)
-    df.to_csv(filepath, index=False)
-    return filepath
@@ -1,6 +1,8 @@
 from rdflib import Graph, Namespace, RDF, RDFS, URIRef, Literal
 from typing import Dict, List, Optional
 
+from core.ontology_store import get_ontology_store
+
 # Namespaces for two semantic modules
 DISASTER_NS = Namespace("http://example.org/disaster#")
 API_NS = Namespace("http://example.org/api#")
@@ -10,9 +12,8 @@ API_NS = Namespace("http://example.org/api#")
 # ------------------------
 
 def load_ontology(path: str) -> Graph:
-    g = Graph()
-    g.parse(path)
-    return g
+    """Parsed once per file content for the whole process (``core.ontology_store``); treat as read-only."""
+    return get_ontology_store().load(path)
 
 def extract_endpoint_fields(g: Graph) -> Dict[str, List[str]]:
     """
@@ -1,22 +1,103 @@
-from oauthlib.oauth2 import BackendApplicationClient
-from requests_oauthlib import OAuth2Session
+"""
+OAuth2 client-credentials tokens for SentinelHub.
+
+``SentinelHubTokenManager`` (a ``core.token_refresh.RefreshingToken``) keeps
+the whole token response (not just ``access_token``) and its expiry, refreshes
+it ``refresh_margin`` seconds before ``expires_in`` runs out (in a daemon
+thread, and lazily in ``get()``), and is thread-safe.  ``get_token_manager()``
+returns one manager per (token URL, client id) for the whole process, so
+Streamlit reruns, sessions and worker threads share a single token instead of
+exchanging credentials on every rerun.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+import requests
+
+from core.http_client import get_client
+from core.token_refresh import RefreshingToken
+
+TOKEN_URL = os.getenv(
+    "SENTINELHUB_TOKEN_URL",
+    "https://services.sentinel-hub.com/auth/realms/main/protocol/openid-connect/token",
+)
+CLIENT_ID = os.getenv("SENTINELHUB_CLIENT_ID", "<your_client_id>")
+CLIENT_SECRET = os.getenv("SENTINELHUB_CLIENT_SECRET", "<your_client_secret>")
+
+
+class SentinelHubAuthError(RuntimeError):
+    pass
+
+
+class SentinelHubTokenManager(RefreshingToken):
+    error = SentinelHubAuthError
+    thread_name = "sentinelhub-token-refresh"
+
+    def __init__(self, client_id: str, client_secret: str, *, token_url: str = TOKEN_URL,
+                 refresh_margin: float = 60.0, background: bool = True):
+        super().__init__(refresh_margin=refresh_margin, background=background)
+        self.client_id = client_id
+        self._client_secret = client_secret
+        self.token_url = token_url
+
+    @property
+    def token(self) -> Optional[Dict[str, Any]]:
+        """The full token response (access_token, expires_in, token_type, ...) plus ``expires_at``."""
+        return {**self._response, "expires_at": self._expires_at} if self._token else None
+
+    def _request(self) -> Tuple[str, float, Dict[str, Any]]:
+        payload = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self._client_secret,
+        }
+        try:
+            r = get_client().post(self.token_url, data=payload, cache=False, retry=True, timeout=30)
+            r.raise_for_status()
+            data = r.json()
+        except (requests.RequestException, ValueError) as e:
+            raise SentinelHubAuthError(f"SentinelHub token request failed → {e}") from None
+        if "access_token" not in data:
+            raise SentinelHubAuthError(f"SentinelHub token error → {data.get('error_description') or data}")
+        return data["access_token"], time.time() + float(data.get("expires_in") or 3600), data
+
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.get()}"}
+
+
+TokenSource = Union[str, SentinelHubTokenManager, None]
+
+_MANAGERS: Dict[Tuple[str, str], SentinelHubTokenManager] = {}
+_MANAGERS_LOCK = threading.Lock()
+
+
+def get_token_manager(client_id: Optional[str] = None, client_secret: Optional[str] = None,
+                      token_url: str = TOKEN_URL) -> SentinelHubTokenManager:
+    """The process-wide manager for these credentials (defaults: SENTINELHUB_CLIENT_ID / _SECRET)."""
+    client_id = client_id or CLIENT_ID
+    client_secret = client_secret or CLIENT_SECRET
+    key = (token_url, client_id)
+    with _MANAGERS_LOCK:
+        manager = _MANAGERS.get(key)
+        if manager is None or manager._client_secret != client_secret:
+            if manager is not None:
+                manager.close()
+            manager = _MANAGERS[key] = SentinelHubTokenManager(client_id, client_secret, token_url=token_url)
+        return manager
+
+
+def resolve_token(token: TokenSource) -> str:
+    """An access token string from a string, a manager, or (None) the default manager."""
+    if isinstance(token, str):
+        return token
+    return (token or get_token_manager()).get()
 
-CLIENT_ID = "<your_client_id>"
-CLIENT_SECRET = "<your_client_secret>"
 
 def get_sentinelhub_token(client_id=CLIENT_ID, client_secret=CLIENT_SECRET):
     try:
-        client = BackendApplicationClient(client_id=client_id)
-        oauth = OAuth2Session(client=client)
-        token = oauth.fetch_token(
-            token_url='https://services.sentinel-hub.com/auth/realms/main/protocol/openid-connect/token',
-            client_id=client_id,
-            client_secret=client_secret,
-            include_client_id=True
-        )
-        return token.get("access_token")
-    except Exception as e:
-        import traceback
+        return get_token_manager(client_id, client_secret).get()
+    except SentinelHubAuthError as e:
         print("OAuth2 Error:", e)
-        traceback.print_exc()
         return None
@@ -0,0 +1,337 @@
+"""
+SentinelHub Batch Processing API client with a local job tracker.
+
+The synchronous ``/process`` endpoint caps output size; batch jobs process a
+whole AOI on SentinelHub's side, tile by tile, into a bucket.  This module
+drives the ``/api/v1/batch/process`` endpoints of the bundled OpenAPI spec:
+
+* ``BatchClient.create / analyse / start / cancel / refresh`` -- one call per
+  endpoint, through ``send_request`` (shared client, token refresh on 401)
+* ``BatchTracker`` -- SQLite (WAL) record of every job and its tiles, so
+  polling picks up where it left off after a restart
+* ``BatchPoller`` -- polls every active job on one shared asyncio event loop
+  (a daemon thread); HTTP calls run in the loop's default executor.  API,
+  network and token errors are recorded in ``errors`` and retried with
+  backoff.  ``resume()`` re-attaches to the jobs the tracker still lists as
+  active, and to finished jobs whose tile manifest was never fetched.
+* ``tile_manifest(job_id)`` -- the job's tiles (id, status, cost, origin,
+  geometry) as a DataFrame, fetched once the job reaches a final state
+
+    client = get_batch_client(swagger)            # tracker in $SENTINELHUB_BATCH_DB
+    job = client.create(batch_request)
+    client.start(job["id"])
+    get_poller(client).watch(job["id"]).result()   # blocks until DONE / PARTIAL / FAILED / CANCELED
+    client.tracker.tile_manifest(job["id"])
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+import requests
+
+from core.openapi_parser import build_full_url
+from core.sentinelhub_auth import SentinelHubAuthError
+from core.sentinelhub_executor import send_request
+
+BATCH_PATH = "/api/v1/batch/process"
+TRACKER_PATH = os.getenv("SENTINELHUB_BATCH_DB", os.path.join("output", "sentinelhub_batch.sqlite"))
+POLL_INTERVAL = float(os.getenv("SENTINELHUB_BATCH_POLL", "30"))  # seconds between status checks
+POLL_BACKOFF_MAX = 600.0  # longest wait between attempts while polling keeps failing
+FINAL_STATUSES = frozenset({"DONE", "PARTIAL", "FAILED", "CANCELED"})
+TILE_PAGE = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id             TEXT PRIMARY KEY,
+    status         TEXT,
+    user_action    TEXT,
+    description    TEXT,
+    tile_count     INTEGER,
+    value_estimate REAL,
+    error          TEXT,
+    created        TEXT,
+    request        TEXT NOT NULL,
+    polls          INTEGER NOT NULL DEFAULT 0,
+    updated_at     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tiles (
+    job_id   TEXT NOT NULL,
+    tile_id  INTEGER NOT NULL,
+    status   TEXT,
+    cost     REAL,
+    origin   TEXT,
+    geometry TEXT,
+    PRIMARY KEY (job_id, tile_id)
+);
+CREATE TABLE IF NOT EXISTS manifests (
+    job_id     TEXT PRIMARY KEY,
+    tiles      INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+class BatchProcessError(RuntimeError):
+    pass
+
+
+# worth another attempt: API errors, dropped connections / timeouts, token refresh failures
+TRANSIENT_ERRORS = (BatchProcessError, requests.RequestException, SentinelHubAuthError)
+
+
+class BatchTracker:
+    """SQLite record of batch jobs (last known state) and their tiles."""
+
+    def __init__(self, path: str = TRACKER_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()  # one connection shared by the UI and the poller thread
+
+    def close(self):
+        self.conn.close()
+
+    def record(self, job: Dict[str, Any], poll: bool = False):
+        """Store the latest state of a job, as returned by the API."""
+        with self._lock:
+            self.conn.execute(
+                """INSERT INTO jobs(id, status, user_action, description, tile_count, value_estimate, error,
+                                    created, request, polls, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET
+                       status = excluded.status, user_action = excluded.user_action,
+                       description = excluded.description, tile_count = excluded.tile_count,
+                       value_estimate = excluded.value_estimate, error = excluded.error,
+                       request = excluded.request, polls = jobs.polls + excluded.polls,
+                       updated_at = excluded.updated_at""",
+                (job["id"], job.get("status"), job.get("userAction"), job.get("description"), job.get("tileCount"),
+                 job.get("valueEstimate"), job.get("error"), job.get("created"), json.dumps(job, default=str),
+                 int(poll), time.time()),
+            )
+
+    def write_tiles(self, job_id: str, tiles: List[Dict[str, Any]]):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM tiles WHERE job_id = ?", (job_id,))
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO tiles(job_id, tile_id, status, cost, origin, geometry) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(job_id, t.get("id"), t.get("status"), t.get("cost"),
+                      json.dumps(t.get("origin")) if t.get("origin") is not None else None,
+                      json.dumps(t.get("geometry")) if t.get("geometry") is not None else None)
+                     for t in tiles],
+                )
+                self.conn.execute("INSERT OR REPLACE INTO manifests(job_id, tiles, fetched_at) VALUES (?, ?, ?)",
+                                  (job_id, len(tiles), time.time()))
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute("SELECT request FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """One summary row per job, newest first."""
+        with self._lock:
+            rows = self.conn.execute(
+                """SELECT j.id, j.status, j.description, j.tile_count, j.value_estimate, j.error, j.created,
+                          j.polls, j.updated_at, COUNT(t.tile_id)
+                   FROM jobs j LEFT JOIN tiles t ON t.job_id = j.id
+                   GROUP BY j.id ORDER BY j.created DESC, j.updated_at DESC""").fetchall()
+        keys = ("id", "status", "description", "tile_count", "value_estimate", "error", "created",
+                "polls", "updated_at", "tiles_listed")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def active_ids(self) -> List[str]:
+        """Jobs that haven't reached a final state (what a restarted poller has to resume)."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id FROM jobs WHERE status IS NULL OR status NOT IN ({})".format(
+                    ", ".join("?" * len(FINAL_STATUSES))), tuple(FINAL_STATUSES)).fetchall()
+        return [job_id for (job_id,) in rows]
+
+    def missing_manifests(self) -> List[str]:
+        """Finished jobs whose tile list was never stored (e.g. the fetch failed)."""
+        with self._lock:
+            rows = self.conn.execute(
+                """SELECT j.id FROM jobs j LEFT JOIN manifests m ON m.job_id = j.id
+                   WHERE m.job_id IS NULL AND j.status IN ({})""".format(
+                    ", ".join("?" * len(FINAL_STATUSES))), tuple(FINAL_STATUSES)).fetchall()
+        return [job_id for (job_id,) in rows]
+
+    def tile_manifest(self, job_id: str) -> pd.DataFrame:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT tile_id, status, cost, origin, geometry FROM tiles WHERE job_id = ? ORDER BY tile_id",
+                (job_id,)).fetchall()
+        return pd.DataFrame(rows, columns=["tile_id", "status", "cost", "origin", "geometry"])
+
+
+class BatchClient:
+    def __init__(self, swagger: Dict[str, Any], tracker: BatchTracker, token=None, path: str = BATCH_PATH):
+        self.swagger = swagger
+        self.tracker = tracker
+        self.token = token  # string, SentinelHubTokenManager or None (default manager)
+        self.path = path
+
+    def _call(self, method: str, suffix: str = "", body=None, query: Optional[Dict[str, Any]] = None):
+        template = self.path + suffix
+        url = build_full_url(self.swagger, template, query_params=query)
+        response = send_request(url, method, template, body, self.token, cache=False)
+        if response is None or response.status_code >= 400:
+            detail = response.text[:300] if response is not None else "unsupported method"
+            status = response.status_code if response is not None else "-"
+            raise BatchProcessError(f"{method} {template} failed → HTTP {status}: {detail}")
+        if not response.content:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            raise BatchProcessError(f"{method} {template} returned non-JSON content") from None
+
+    def create(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a batch job from a full batch request body (processRequest, tilingGrid, output...)."""
+        job = self._call("POST", body=request)
+        self.tracker.record(job)
+        return job
+
+    def refresh(self, job_id: str, poll: bool = False) -> Dict[str, Any]:
+        job = self._call("GET", f"/{job_id}")
+        self.tracker.record(job, poll=poll)
+        return job
+
+    def _action(self, job_id: str, action: str) -> Dict[str, Any]:
+        self._call("POST", f"/{job_id}/{action}")
+        return self.refresh(job_id)
+
+    def analyse(self, job_id: str) -> Dict[str, Any]:
+        return self._action(job_id, "analyse")
+
+    def start(self, job_id: str) -> Dict[str, Any]:
+        return self._action(job_id, "start")
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        return self._action(job_id, "cancel")
+
+    def fetch_tiles(self, job_id: str) -> List[Dict[str, Any]]:
+        """All tiles of a job (following ``links.nextToken``), stored as its manifest."""
+        tiles: List[Dict[str, Any]] = []
+        query: Dict[str, Any] = {"count": TILE_PAGE}
+        while True:
+            page = self._call("GET", f"/{job_id}/tiles", query=query) or {}
+            tiles.extend(page.get("data") or [])
+            next_token = (page.get("links") or {}).get("nextToken")
+            if not next_token:
+                break
+            query = {"count": TILE_PAGE, "viewtoken": next_token}
+        self.tracker.write_tiles(job_id, tiles)
+        return tiles
+
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """The asyncio loop all batch polling runs on, started in a daemon thread on first use."""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="sentinelhub-batch-poller", daemon=True).start()
+        return _LOOP
+
+
+class BatchPoller:
+    """Polls batch jobs until they reach a final state; one coroutine per job on the shared loop."""
+
+    def __init__(self, client: BatchClient, interval: float = POLL_INTERVAL,
+                 on_update: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.client = client
+        self.interval = interval
+        self.on_update = on_update
+        self.errors: Dict[str, str] = {}  # job id -> last polling error (cleared by the next success)
+        self._watching: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    async def _poll(self, job_id: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        failures = 0
+        while True:
+            try:
+                job = await loop.run_in_executor(None, self.client.refresh, job_id, True)
+                if self.on_update:
+                    self.on_update(job)
+                if job.get("status") in FINAL_STATUSES:
+                    await loop.run_in_executor(None, self.client.fetch_tiles, job_id)
+                    self.errors.pop(job_id, None)
+                    return job
+            except TRANSIENT_ERRORS as e:
+                # keep polling (and retrying the tile fetch), backing off while it keeps failing
+                self.errors[job_id] = f"{type(e).__name__}: {e}"
+                failures += 1
+            except Exception as e:
+                self.errors[job_id] = f"{type(e).__name__}: {e}"
+                raise
+            else:
+                self.errors.pop(job_id, None)
+                failures = 0
+            await asyncio.sleep(min(self.interval * 2 ** failures, max(self.interval, POLL_BACKOFF_MAX)))
+
+    def watch(self, job_id: str) -> Future:
+        """Start polling ``job_id`` (once); the future resolves to its final state."""
+        with self._lock:
+            future = self._watching.get(job_id)
+            if future is None or (future.done() and (future.cancelled() or future.exception() is not None)):
+                future = asyncio.run_coroutine_threadsafe(self._poll(job_id), get_event_loop())
+                self._watching[job_id] = future
+            return future
+
+    def resume(self) -> List[str]:
+        """Watch every job the tracker still lists as active, or lacks the tiles of (e.g. after a restart)."""
+        ids = self.client.tracker.active_ids() + self.client.tracker.missing_manifests()
+        for job_id in ids:
+            self.watch(job_id)
+        return ids
+
+    def watching(self) -> List[str]:
+        with self._lock:
+            return [job_id for job_id, future in self._watching.items() if not future.done()]
+
+
+_CLIENTS: Dict[str, BatchClient] = {}
+_POLLERS: Dict[str, BatchPoller] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def get_batch_client(swagger: Dict[str, Any], token=None, path: str = TRACKER_PATH) -> BatchClient:
+    """One client (and tracker connection) per tracker database for the whole process."""
+    with _SHARED_LOCK:
+        client = _CLIENTS.get(path)
+        if client is None:
+            client = _CLIENTS[path] = BatchClient(swagger, BatchTracker(path), token)
+        else:
+            client.swagger, client.token = swagger, token
+        return client
+
+
+def get_poller(client: BatchClient, interval: float = POLL_INTERVAL) -> BatchPoller:
+    """One poller per tracker database for the whole process; resumes its active jobs when created."""
+    with _SHARED_LOCK:
+        poller = _POLLERS.get(client.tracker.path)
+        if poller is None:
+            poller = _POLLERS[client.tracker.path] = BatchPoller(client, interval)
+            poller.resume()
+        return poller
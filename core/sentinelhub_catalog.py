@@ -0,0 +1,252 @@
+"""
+SentinelHub Catalog (STAC) search harvester.
+
+``execute_sentinel_query`` returns a single page of a ``/catalog/1.0.0/search``
+response.  ``harvest_catalog`` builds full scene lists instead:
+
+* follows ``context.next`` until the search is exhausted
+* splits a long ``datetime`` interval into windows (``split_interval``) that
+  are paginated concurrently; pages within a window stay sequential, as
+  ``next`` tokens are
+* streams every page into a sink as it arrives -- newline-delimited JSON
+  (``.ndjson`` / ``.jsonl``) or Parquet (row groups through
+  ``pyarrow.parquet.ParquetWriter``) -- so only in-flight pages are in memory
+* drops features whose id was already written (windows share their boundary
+  instant, and scenes can be listed twice)
+
+    result = harvest_catalog(swagger, {"collections": ["sentinel-2-l2a"], "bbox": [...],
+                                       "datetime": "2023-01-01T00:00:00Z/2023-12-31T23:59:59Z"},
+                             "output/s2_2023.parquet", window_days=30)
+"""
+import json
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from core.openapi_parser import build_full_url
+from core.sentinelhub_executor import send_request
+
+SEARCH_PATH = "/api/v1/catalog/1.0.0/search"
+PAGE_LIMIT = 100  # largest page the Catalog API returns
+DEFAULT_CONCURRENCY = 4
+ROW_GROUP = 5000  # features buffered per Parquet row group
+
+
+class CatalogError(RuntimeError):
+    pass
+
+
+class CatalogHarvest(NamedTuple):
+    path: str
+    features: int  # written to the sink
+    duplicates: int  # skipped, id already written
+    pages: int
+    failed: Dict[str, str]  # window -> error
+
+
+def _parse_time(value: str) -> datetime:
+    moment = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _format_time(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def split_interval(interval: Optional[str], window_days: Optional[float]) -> List[Optional[str]]:
+    """Cut a closed ``start/end`` interval into consecutive windows of ``window_days``.
+
+    Single instants, open intervals (``..``) and a missing interval are
+    returned unchanged, as one window.
+    """
+    if not interval or not window_days or "/" not in interval:
+        return [interval]
+    start_text, end_text = interval.split("/", 1)
+    if start_text in ("", "..") or end_text in ("", ".."):
+        return [interval]
+    start, end = _parse_time(start_text), _parse_time(end_text)
+    step = timedelta(days=window_days)
+    windows = []
+    while start < end:
+        stop = min(start + step, end)
+        windows.append(f"{_format_time(start)}/{_format_time(stop)}")
+        start = stop
+    return windows or [interval]
+
+
+def search_pages(url: str, body: Dict[str, Any], token=None,
+                 path_template: str = SEARCH_PATH) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the ``features`` of every page of one search, following ``context.next``."""
+    body = {**body, "limit": min(int(body.get("limit") or PAGE_LIMIT), PAGE_LIMIT)}
+    body.pop("next", None)
+    while True:
+        response = send_request(url, "POST", path_template, body, token, retry=True)  # read-only search
+        if response.status_code != 200:
+            raise CatalogError(f"Catalog search failed → HTTP {response.status_code}: {response.text[:200]}")
+        try:
+            page = response.json()
+        except ValueError:
+            raise CatalogError("Catalog search failed → non-JSON response") from None
+        yield page.get("features") or []
+        next_token = (page.get("context") or {}).get("next")
+        if next_token is None:
+            return
+        body["next"] = next_token
+
+
+class NdjsonSink:
+    """One GeoJSON feature per line, written as it arrives."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, features: List[Dict[str, Any]]):
+        self._file.writelines(json.dumps(f, ensure_ascii=False) + "\n" for f in features)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """A fixed-schema Parquet file: id, collection, datetime, cloud cover, bbox and the rest as JSON.
+
+    Feature properties differ between collections, so they are kept as a JSON
+    string column rather than letting the first page decide the schema.
+    """
+
+    def __init__(self, path: str, row_group: int = ROW_GROUP):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)") from None
+        self._pa = pa
+        self.path = path
+        self.row_group = row_group
+        self.schema = pa.schema([
+            ("id", pa.string()),
+            ("collection", pa.string()),
+            ("datetime", pa.string()),
+            ("cloud_cover", pa.float64()),
+            ("bbox", pa.list_(pa.float64())),
+            ("geometry", pa.string()),
+            ("properties", pa.string()),
+            ("assets", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self._rows: List[Dict[str, Any]] = []
+
+    def write(self, features: List[Dict[str, Any]]):
+        for f in features:
+            props = f.get("properties") or {}
+            cloud = props.get("eo:cloud_cover")
+            self._rows.append({
+                "id": f.get("id"),
+                "collection": f.get("collection"),
+                "datetime": props.get("datetime"),
+                "cloud_cover": float(cloud) if isinstance(cloud, (int, float)) else None,
+                "bbox": f.get("bbox"),
+                "geometry": json.dumps(f["geometry"]) if f.get("geometry") is not None else None,
+                "properties": json.dumps(props, ensure_ascii=False),
+                "assets": json.dumps(f["assets"], ensure_ascii=False) if f.get("assets") else None,
+            })
+        if len(self._rows) >= self.row_group:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self.schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_sink(path: str):
+    if path.lower().endswith(".parquet"):
+        return ParquetSink(path)
+    return NdjsonSink(path)
+
+
+def harvest_catalog(
+    swagger: Dict[str, Any],
+    search: Dict[str, Any],
+    out_path: str,
+    *,
+    window_days: Optional[float] = 30,
+    token=None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    path_template: str = SEARCH_PATH,
+    on_progress: Optional[Callable[[str, int], None]] = None,
+) -> CatalogHarvest:
+    """Run ``search`` (a Catalog search body) to exhaustion, streaming unique features to ``out_path``.
+
+    ``.parquet`` paths get a Parquet file, anything else ndjson.  A window
+    that fails is reported in ``failed``; the features it had already
+    delivered stay in the output.  ``on_progress(window, features)`` is
+    called after every page, always on the calling thread (Streamlit
+    elements can't be updated from the worker threads).
+    """
+    windows = split_interval(search.get("datetime"), window_days)
+    url = build_full_url(swagger, path_template)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    sink = open_sink(out_path)
+
+    lock = threading.Lock()  # guards the sink and the counters
+    seen = set()
+    totals = {"features": 0, "duplicates": 0, "pages": 0}
+    progress: "queue.Queue" = queue.Queue()  # (window, features so far) from the workers
+
+    def run_window(window: Optional[str]):
+        body = dict(search)
+        if window is not None:
+            body["datetime"] = window
+        count = 0
+        for features in search_pages(url, body, token, path_template):
+            with lock:
+                fresh = []
+                for f in features:
+                    fid = f.get("id")
+                    if fid is not None:
+                        if fid in seen:
+                            continue
+                        seen.add(fid)
+                    fresh.append(f)
+                sink.write(fresh)
+                totals["features"] += len(fresh)
+                totals["duplicates"] += len(features) - len(fresh)
+                totals["pages"] += 1
+            count += len(features)
+            progress.put((window or "all", count))
+
+    def report():
+        while True:
+            try:
+                update = progress.get_nowait()
+            except queue.Empty:
+                return
+            if on_progress:
+                on_progress(*update)
+
+    failed: Dict[str, str] = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(windows)))) as pool:
+            futures = {pool.submit(run_window, w): w for w in windows}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                report()
+                for future in done:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failed[futures[future] or "all"] = str(e)
+            report()
+    finally:
+        sink.close()
+    return CatalogHarvest(out_path, totals["features"], totals["duplicates"], totals["pages"], failed)
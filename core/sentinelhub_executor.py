@@ -1,61 +1,147 @@
-import requests
 import json
+import struct
 import pandas as pd
+from core.http_client import get_client
 from core.openapi_parser import build_full_url
-import tempfile
-
-
-def execute_sentinel_query(swagger, method, path_template, query_params=None, post_body=None, path_vals=None, token=None):
+from core.sentinelhub_auth import SentinelHubTokenManager, get_token_manager, resolve_token
+from core.raster_cache import export_file, get_raster_cache, process_key
+from core.raster_spool import get_spool, tiff_info
+
+
+def _is_process(path_template):
+    """The synchronous Process API (multipart evalscript), not the batch / async ones."""
+    path = path_template.rstrip("/")
+    return path.endswith("/process") and "/batch/" not in path and "/async/" not in path
+
+
+def _send(url, method, path_template, post_body, token, cache=None, stream=False, retry=None):
+    if method.upper() == "GET":
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/json"
+        }
+        return get_client().get(url, headers=headers, cache=cache, stream=stream)
+
+    elif method.upper() == "POST" and _is_process(path_template):
+        evalscript = post_body.get("evalscript")
+        evalscript_type = post_body.get("evalscriptType")
+
+        # Remove evalscript from JSON and send separately
+        cleaned_body = {k: v for k, v in post_body.items() if k not in ("evalscript", "evalscriptType")}
+        files = {
+            "request": (None, json.dumps(cleaned_body), "application/json"),
+            "evalscript": (None, evalscript, "application/javascript")
+        }
+        if evalscript_type:
+            files["evalscriptType"] = (None, evalscript_type, "text/plain")
+
+        headers = {
+            "Authorization": f"Bearer {token}"
+        }
+        return get_client().post(url, headers=headers, files=files, stream=stream)
+
+    elif method.upper() == "POST":
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+        return get_client().post(url, headers=headers, data=json.dumps(post_body) if post_body is not None else None,
+                                 stream=stream, retry=retry)
+
+    return None
+
+
+def send_request(url, method, path_template, post_body=None, token=None, cache=None, stream=False, retry=None):
+    """Send one request with a bearer token; returns the response (None for unsupported methods).
+
+    ``token`` may be an access token string, a ``SentinelHubTokenManager`` or None
+    (the process-wide manager for SENTINELHUB_CLIENT_ID / _SECRET).  With a
+    manager, a 401 is retried once with a refreshed token.  ``cache=False``
+    bypasses the shared client's response cache for a GET (e.g. status polls);
+    ``stream=True`` leaves the body unread (for ``iter_content``); ``retry=True``
+    opts a read-only JSON POST (e.g. a Catalog search) into the shared
+    client's full retry policy.
+    """
+    manager = token if isinstance(token, SentinelHubTokenManager) else None
+    if manager is None and token is None:
+        manager = get_token_manager()
+    access_token = resolve_token(manager or token)
+    response = _send(url, method, path_template, post_body, access_token, cache, stream, retry)
+    if response is not None and response.status_code == 401 and manager is not None:
+        # expired or revoked early: one forced refresh, shared with concurrent callers
+        response.close()
+        response = _send(url, method, path_template, post_body, manager.refresh(rejected=access_token), cache, stream,
+                         retry)
+    return response
+
+
+def execute_sentinel_query(swagger, method, path_template, query_params=None, post_body=None, path_vals=None, token=None,
+                           raster_path=None, use_cache=True):
+    """``token`` may be an access token string, a ``SentinelHubTokenManager`` or None
+    (the process-wide manager for SENTINELHUB_CLIENT_ID / _SECRET).
+
+    Image responses are streamed to ``raster_path`` (or a file in the bounded
+    spool directory, see ``core.raster_spool``) and returned as
+    ``{"download_url": path, "content_type": ..., "raster": {...header metadata}}``.
+
+    Process API rasters go through the content-addressed ``core.raster_cache``
+    (unless ``use_cache`` is False): a hit or a coalesced identical request in
+    flight costs no processing units; ``"cache"`` says which (HIT / COALESCED / MISS).
+    """
     url = build_full_url(swagger, path_template, path_vals, query_params)
-
+    cache = get_raster_cache() if use_cache and method.upper() == "POST" and _is_process(path_template) else None
+    if cache is None:
+        return _run_query(url, method, path_template, post_body, token, raster_path)
+
+    key = process_key(url, post_body)
+
+    def run():
+        hit = cache.get(key)  # again: an identical request may have finished meanwhile
+        if hit is not None:
+            return url, hit, None
+        return _run_query(url, method, path_template, post_body, token, None, cache, key)
+
+    hit = cache.get(key)
+    if hit is not None:
+        result, df = hit, None
+    else:
+        (url, result, df), leader = cache.coalesce(key, run)
+        if not leader and "download_url" in result:
+            result = {**result, "cache": "COALESCED"}
+    if "download_url" in result and raster_path:
+        result = {**result, "download_url": export_file(result["download_url"], raster_path)}
+    return url, result, df
+
+
+def _run_query(url, method, path_template, post_body, token, raster_path, cache=None, key=None):
     try:
         print("📤 RAW JSON sent to SentinelHub:", json.dumps(post_body, indent=2), flush=True)
 
-        if method.upper() == "GET":
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Accept": "application/json"
-            }
-            response = requests.get(url, headers=headers)
-
-        elif method.upper() == "POST" and "/process" in path_template:
-            evalscript = post_body.get("evalscript")
-            evalscript_type = post_body.get("evalscriptType")
-
-            # Remove evalscript from JSON and send separately
-            cleaned_body = {k: v for k, v in post_body.items() if k not in ("evalscript", "evalscriptType")}
-            files = {
-                "request": (None, json.dumps(cleaned_body), "application/json"),
-                "evalscript": (None, evalscript, "application/javascript")
-            }
-            if evalscript_type:
-                files["evalscriptType"] = (None, evalscript_type, "text/plain")
-
-            headers = {
-                "Authorization": f"Bearer {token}"
-            }
-            response = requests.post(url, headers=headers, files=files)
-
-        elif method.upper() == "POST":
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
-            response = requests.post(url, headers=headers, data=json.dumps(post_body))
-
-        else:
+        response = send_request(url, method, path_template, post_body, token, stream=True)
+
+        if response is None:
             return url, {"error": "Unsupported method"}, None
 
         # Detect content type
         content_type = response.headers.get("Content-Type", "")
 
-        # Handle binary image (e.g., TIFF)
+        # Handle binary image (e.g., TIFF): streamed to disk, never held in memory
         if "image" in content_type or "application/octet-stream" in content_type:
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".tiff")
-            temp_file.write(response.content)
-            temp_file.flush()
-            return url, {"download_url": temp_file.name}, None
+            cacheable = cache is not None and response.status_code == 200
+            if cacheable:
+                raster_path = cache.path_for(key, content_type)
+            path = get_spool().stream_to(response, raster_path)
+            result = {"download_url": path, "content_type": content_type}
+            if "tiff" in content_type or "octet-stream" in content_type:
+                try:
+                    result["raster"] = tiff_info(path)._asdict()
+                except (ValueError, KeyError, struct.error):
+                    pass  # not a TIFF after all
+            if cacheable:
+                cache.put(key, path, content_type, result.get("raster"))
+                result["cache"] = "MISS"
+            return url, result, None
 
         # Handle JSON
         try:
@@ -68,7 +154,7 @@ def execute_sentinel_query(swagger, method, path_template, query_params=None, po
             features = data["features"]
             flattened = []
             for feat in features:
-                props = feat.get("properties", {})
+                props = dict(feat.get("properties") or {})  # copy: don't alter the returned features
                 props["id"] = feat.get("id")
                 props["collection"] = feat.get("collection")
                 flattened.append(props)
@@ -0,0 +1,313 @@
+"""
+Tiled, parallel downloads from the SentinelHub Process API.
+
+One ``/process`` request returns at most 2500 × 2500 px, so large AOIs (or
+fine resolutions) are split into a grid of sub-requests and mosaicked:
+
+* ``plan_tiles(bbox, resolution=...)`` cuts the bbox on whole pixels, every
+  tile within ``max_pixels``, so tiles line up without seams or resampling
+* tiles are fetched by a thread pool under a requests-per-second limit
+  (``RateLimiter``), on top of the shared client's 429 back-off and the
+  token manager's 401 refresh
+* each tile is decoded and written into its window of the output as soon as
+  it arrives -- a tiled, compressed GeoTIFF (rasterio) or a Zarr array -- so
+  at most ``concurrency`` tiles are held in memory, never the whole mosaic
+* a failed tile doesn't abort the others; it is reported in ``failed``
+
+    result = download_tiled(swagger, post_body, "output/aoi.tif", resolution=10)
+
+Decoding tiles and GeoTIFF output need ``rasterio``; Zarr output also needs
+``zarr``.
+"""
+import copy
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from core.openapi_parser import build_full_url
+from core.sentinelhub_executor import send_request
+
+MAX_PIXELS = 2500  # Process API limit on output width and height
+PROCESS_PATH = "/api/v1/process"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE = float(os.getenv("SENTINELHUB_MAX_RPS", "5"))  # requests per second, 0 = unlimited
+BLOCK_SIZE = 512  # GeoTIFF block / Zarr chunk edge
+CRS84 = "http://www.opengis.net/def/crs/OGC/1.3/CRS84"
+
+
+class Tile(NamedTuple):
+    row: int
+    col: int
+    bbox: Tuple[float, float, float, float]  # minx, miny, maxx, maxy
+    x_off: int  # pixel window of the tile in the mosaic
+    y_off: int
+    width: int
+    height: int
+
+
+class TilePlan(NamedTuple):
+    bbox: Tuple[float, float, float, float]
+    width: int
+    height: int
+    res_x: float
+    res_y: float
+    tiles: List[Tile]
+
+
+class TiledDownload(NamedTuple):
+    path: Optional[str]  # None when no tile could be fetched
+    plan: TilePlan
+    failed: Dict[Tuple[int, int], str]  # (row, col) -> error
+
+
+def _splits(total: int, parts: int) -> List[int]:
+    base, extra = divmod(total, parts)
+    return [base + (i < extra) for i in range(parts)]
+
+
+def plan_tiles(bbox: Sequence[float], resolution: Union[float, Tuple[float, float], None] = None,
+               width: Optional[int] = None, height: Optional[int] = None,
+               max_pixels: int = MAX_PIXELS) -> TilePlan:
+    """Split ``bbox`` into a row-major grid of tiles of at most ``max_pixels`` per side.
+
+    Give either ``resolution`` (CRS units per pixel, or an ``(x, y)`` pair) or
+    the full output ``width`` and ``height``.  The resolution is nudged so the
+    bbox spans a whole number of pixels.
+    """
+    minx, miny, maxx, maxy = map(float, bbox)
+    if maxx <= minx or maxy <= miny:
+        raise ValueError(f"Invalid bbox {list(bbox)} (expected minx, miny, maxx, maxy)")
+    if resolution is not None:
+        res_x, res_y = resolution if isinstance(resolution, (tuple, list)) else (resolution, resolution)
+        width = max(1, round((maxx - minx) / float(res_x)))
+        height = max(1, round((maxy - miny) / float(res_y)))
+    elif not width or not height:
+        raise ValueError("Give either a resolution or the output width and height")
+    res_x, res_y = (maxx - minx) / width, (maxy - miny) / height
+
+    cols = _splits(width, -(-width // max_pixels))
+    rows = _splits(height, -(-height // max_pixels))
+    tiles = []
+    y_off = 0
+    for r, h in enumerate(rows):
+        x_off = 0
+        for c, w in enumerate(cols):
+            tiles.append(Tile(
+                r, c,
+                (minx + x_off * res_x, maxy - (y_off + h) * res_y, minx + (x_off + w) * res_x, maxy - y_off * res_y),
+                x_off, y_off, w, h,
+            ))
+            x_off += w
+        y_off += h
+    return TilePlan((minx, miny, maxx, maxy), width, height, res_x, res_y, tiles)
+
+
+def plan_for_body(post_body: Dict[str, Any], resolution=None, width=None, height=None,
+                  max_pixels: int = MAX_PIXELS) -> TilePlan:
+    """``plan_tiles`` for a Process API body; size defaults to its ``output`` (resx/resy or width/height)."""
+    bbox = ((post_body.get("input") or {}).get("bounds") or {}).get("bbox")
+    if not bbox:
+        raise ValueError("Tiled downloads need input.bounds.bbox in the request body")
+    output = post_body.get("output") or {}
+    if resolution is None and not (width and height):
+        if output.get("resx") and output.get("resy"):
+            resolution = (output["resx"], output["resy"])
+        else:
+            width, height = output.get("width"), output.get("height")
+    return plan_tiles(bbox, resolution, width, height, max_pixels)
+
+
+def tile_body(post_body: Dict[str, Any], tile: Tile) -> Dict[str, Any]:
+    """The request body of one tile: same data and evalscript, the tile's bbox and pixel size."""
+    body = copy.deepcopy(post_body)
+    body.setdefault("input", {}).setdefault("bounds", {})["bbox"] = list(tile.bbox)
+    output = body.setdefault("output", {})
+    output.pop("resx", None)
+    output.pop("resy", None)
+    output["width"], output["height"] = tile.width, tile.height
+    return body
+
+
+def crs_of(post_body: Dict[str, Any]) -> str:
+    """``EPSG:<code>`` of the body's bounds CRS (CRS84 -> EPSG:4326)."""
+    uri = (((post_body.get("input") or {}).get("bounds") or {}).get("properties") or {}).get("crs") or CRS84
+    match = re.search(r"EPSG/\d+/(\d+)$", uri) or re.match(r"EPSG:(\d+)$", uri)
+    return f"EPSG:{match.group(1)}" if match else "EPSG:4326"
+
+
+class RateLimiter:
+    """Spaces calls at least ``1 / rate`` seconds apart, across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+def _rasterio():
+    try:
+        import rasterio
+        import rasterio.io
+        import rasterio.transform
+        import rasterio.windows
+    except ImportError:
+        raise RuntimeError("Tiled SentinelHub downloads need rasterio (pip install rasterio)") from None
+    return rasterio
+
+
+def read_tile(content: bytes):
+    """Pixels of an image response as a ``(bands, height, width)`` numpy array."""
+    rasterio = _rasterio()
+    with rasterio.io.MemoryFile(content) as mem, mem.open() as src:
+        return src.read()
+
+
+class GeoTiffMosaic:
+    """Tiled, deflate-compressed GeoTIFF written window by window; renamed into place on ``close``."""
+
+    def __init__(self, path: str, plan: TilePlan, crs: str):
+        self.path = path
+        self.plan = plan
+        self.crs = crs
+        self._tmp = os.path.join(os.path.dirname(path) or ".", f".{os.path.basename(path)}.tmp")
+        self._dst = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._dst is not None
+
+    def open(self, bands: int, dtype):
+        rasterio = _rasterio()
+        plan = self.plan
+        self._dst = rasterio.open(
+            self._tmp, "w", driver="GTiff",
+            width=plan.width, height=plan.height, count=bands, dtype=str(dtype), crs=self.crs,
+            transform=rasterio.transform.from_origin(plan.bbox[0], plan.bbox[3], plan.res_x, plan.res_y),
+            tiled=True, blockxsize=BLOCK_SIZE, blockysize=BLOCK_SIZE, compress="deflate", BIGTIFF="IF_SAFER",
+        )
+
+    def write(self, tile: Tile, data):
+        window = _rasterio().windows.Window(tile.x_off, tile.y_off, tile.width, tile.height)
+        self._dst.write(data, window=window)
+
+    def close(self):
+        if self._dst is not None:
+            self._dst.close()
+            os.replace(self._tmp, self.path)
+
+
+class ZarrMosaic:
+    """``(bands, height, width)`` Zarr array; CRS and geotransform are stored in its attributes."""
+
+    def __init__(self, path: str, plan: TilePlan, crs: str):
+        self.path = path
+        self.plan = plan
+        self.crs = crs
+        self._array = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._array is not None
+
+    def open(self, bands: int, dtype):
+        try:
+            import zarr
+        except ImportError:
+            raise RuntimeError("Zarr output needs zarr (pip install zarr)") from None
+        plan = self.plan
+        self._array = zarr.open_array(
+            self.path, mode="w", shape=(bands, plan.height, plan.width),
+            chunks=(1, BLOCK_SIZE, BLOCK_SIZE), dtype=str(dtype), fill_value=0,
+        )
+        self._array.attrs.update({
+            "crs": self.crs,
+            "bbox": list(plan.bbox),
+            # GDAL order: origin x, pixel width, 0, origin y, 0, -pixel height
+            "geotransform": [plan.bbox[0], plan.res_x, 0.0, plan.bbox[3], 0.0, -plan.res_y],
+        })
+
+    def write(self, tile: Tile, data):
+        self._array[:, tile.y_off:tile.y_off + tile.height, tile.x_off:tile.x_off + tile.width] = data
+
+    def close(self):
+        pass
+
+
+def download_tiled(
+    swagger: Dict[str, Any],
+    post_body: Dict[str, Any],
+    out_path: str,
+    *,
+    resolution: Union[float, Tuple[float, float], None] = None,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    token=None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    max_pixels: int = MAX_PIXELS,
+    path_template: str = PROCESS_PATH,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> TiledDownload:
+    """Fetch ``post_body``'s bbox tile by tile and mosaic it into ``out_path``.
+
+    ``out_path`` ending in ``.zarr`` gives a Zarr array, anything else a
+    GeoTIFF.  ``token`` is passed to ``send_request`` (string, token manager
+    or None for the default manager).  ``on_progress(done, total)`` is called
+    after every tile.
+    """
+    if len((post_body.get("output") or {}).get("responses") or []) > 1:
+        raise ValueError("Tiled downloads support a single output response")
+    plan = plan_for_body(post_body, resolution, width, height, max_pixels)
+    crs = crs_of(post_body)
+    _rasterio()  # fail before sending anything
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    mosaic_cls = ZarrMosaic if out_path.rstrip("/").lower().endswith(".zarr") else GeoTiffMosaic
+    mosaic = mosaic_cls(out_path, plan, crs)
+
+    url = build_full_url(swagger, path_template)
+    limiter = RateLimiter(rate)
+    write_lock = threading.Lock()  # GDAL handles and overlapping Zarr chunks aren't thread-safe
+
+    def fetch(tile: Tile):
+        limiter.wait()
+        response = send_request(url, "POST", path_template, tile_body(post_body, tile), token)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+        data = read_tile(response.content)
+        if data.shape[1:] != (tile.height, tile.width):
+            raise ValueError(f"tile is {data.shape[2]}×{data.shape[1]} px, expected {tile.width}×{tile.height}")
+        with write_lock:
+            if not mosaic.is_open:
+                mosaic.open(data.shape[0], data.dtype)
+            mosaic.write(tile, data)
+
+    failed: Dict[Tuple[int, int], str] = {}
+    done = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {pool.submit(fetch, tile): tile for tile in plan.tiles}
+            for future in as_completed(futures):
+                tile = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failed[(tile.row, tile.col)] = f"Tile {tile.row},{tile.col} failed → {e}"
+                done += 1
+                if on_progress:
+                    on_progress(done, len(plan.tiles))
+    finally:
+        mosaic.close()
+    return TiledDownload(out_path if mosaic.is_open else None, plan, failed)
@@ -3,19 +3,19 @@ from rdflib import Graph, Namespace
 from rdflib.namespace import RDF, RDFS
 import pandas as pd
 
+from core.ontology_store import get_ontology_store
+
 API = Namespace("http://example.org/api#")
 SKOS = Namespace("http://www.w3.org/2004/02/skos/core#")
 GN = Namespace("http://sws.geonames.org/")
 
 
 def load_graph(path) -> Graph:
-    g = Graph()
     if hasattr(path, "name"):  # UploadedFile
         format = "turtle" if path.name.endswith(".ttl") else "xml"
     else:  # str or Path
         format = "turtle" if str(path).endswith(".ttl") else "xml"
-    g.parse(path, format=format)
-    return g
+    return get_ontology_store().load(path, format=format)
 
 
 
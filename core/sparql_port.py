@@ -1,6 +1,6 @@
 import streamlit as st
-from rdflib import Graph
 from core.sparql_engine import run_query
+from core.ontology_store import get_ontology_store
 import sys
 import os
 
@@ -22,11 +22,8 @@ if semantic_file is not None:
         else:
             file_format = "turtle"  # default fallback
 
-        uploaded_graph = Graph()
-        # Read the file as raw bytes and decode assuming UTF-8.
-        raw_data = semantic_file.read()
-        raw_str = raw_data.decode("utf-8")
-        uploaded_graph.parse(data=raw_str, format=file_format)
+        # Parsed once per file content, shared across sessions and reruns
+        uploaded_graph = get_ontology_store().load(semantic_file, format=file_format)
         st.session_state["semantic_graph"] = uploaded_graph
         st.sidebar.success(f"✅ Uploaded semantic graph with {len(uploaded_graph)} triples. (format: {file_format})")
     except Exception as e:
@@ -38,11 +35,9 @@ if semantic_file is not None:
 graph = st.session_state.get("semantic_graph")
 if graph is None:
     st.info("No semantic graph found in session. Using local TTL file as fallback...")
-    local_graph = Graph()
     try:
         # Adjust this fallback file path if needed. Assuming TTL format for fallback.
-        local_graph.parse("file:///<your_home_directory>/data/api_semantics_full_merged.ttl", format="turtle")
-        graph = local_graph
+        graph = get_ontology_store().load("<your_home_directory>/data/api_semantics_full_merged.ttl", format="turtle")
         st.session_state["semantic_graph"] = graph
         st.write(f"✅ Fallback loaded graph with {len(graph)} triples.")
     except Exception as e:
@@ -0,0 +1,219 @@
+"""
+Registry of the API description files shipped in ``data/API_Definition_Files``.
+
+Every spec is parsed once (through ``load_swagger``'s compiled-spec cache) and
+gets a stable id derived from its file name (``sentinelhub_openapi_v1``,
+``reliefweb_openapi_31_enhanced_current``, ...), its base URL and an API
+family (``reliefweb``, ``sentinelhub``, ``cems``).  Requests are routed to the
+family's executor by id, so the apps no longer have to guess which spec is
+active from ``st.session_state``.
+"""
+import importlib
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from core.openapi_parser import load_swagger
+
+SPEC_DIR = os.getenv("API_SPEC_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                  "data", "API_Definition_Files"))
+SPEC_SUFFIXES = (".yaml", ".yml", ".json")
+
+# API family by host (suffix match), then by file name prefix.
+FAMILY_HOSTS = {
+    "reliefweb.int": "reliefweb",
+    "sentinel-hub.com": "sentinelhub",
+    "dataspace.copernicus.eu": "sentinelhub",
+}
+FAMILY_PREFIXES = {
+    "reliefweb": "reliefweb",
+    "sentinelhub": "sentinelhub",
+    "cems": "cems",
+}
+# Spec used when an app asks for a family rather than a specific file.
+DEFAULT_SPECS = {
+    "reliefweb": "reliefweb_openapi_31_enhanced_current",
+    "sentinelhub": "sentinelhub_openapi_v1",
+}
+# family -> "module:function"; imported on first use so core doesn't pull in the UI.
+EXECUTORS = {
+    "reliefweb": "ui.request_executor:execute_request",
+    "sentinelhub": "core.sentinelhub_executor:execute_sentinel_query",
+}
+
+
+class SpecEntry(NamedTuple):
+    id: str
+    family: str
+    title: str
+    base_url: str
+    path: Optional[str]  # None for uploaded specs
+    swagger: Dict[str, Any]
+
+
+def spec_id(filename: str) -> str:
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r"[^a-z0-9]+", "_", stem.lower()).strip("_")
+
+
+def api_family(swagger: Dict[str, Any], filename: str = "") -> str:
+    host = urlsplit(swagger.get("_base_url") or "").hostname or ""
+    for suffix, family in FAMILY_HOSTS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return family
+    name = spec_id(filename) if filename else ""
+    for prefix, family in FAMILY_PREFIXES.items():
+        if name.startswith(prefix):
+            return family
+    return "generic"
+
+
+class SpecRegistry:
+    def __init__(self, directory: str = SPEC_DIR):
+        self.directory = directory
+        self._entries: Dict[str, SpecEntry] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._executors: Dict[str, Callable] = {}
+        self.errors: Dict[str, str] = {}  # file name -> reason it couldn't be loaded
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def load(self) -> "SpecRegistry":
+        """Parse every spec file in the directory (once; later calls are no-ops)."""
+        with self._lock:
+            if self._loaded:
+                return self
+            if os.path.isdir(self.directory):
+                for name in sorted(os.listdir(self.directory)):
+                    path = os.path.join(self.directory, name)
+                    if not name.lower().endswith(SPEC_SUFFIXES) or not os.path.isfile(path):
+                        continue
+                    try:
+                        swagger = load_swagger(path)
+                    except Exception as e:
+                        self.errors[name] = str(e)
+                        continue
+                    self._add(spec_id(name), swagger, path)
+            self._loaded = True
+            return self
+
+    def _add(self, api_id: str, swagger: Dict[str, Any], path: Optional[str]) -> SpecEntry:
+        entry = SpecEntry(
+            id=api_id,
+            family=api_family(swagger, path or api_id),
+            title=swagger.get("info", {}).get("title", api_id),
+            base_url=swagger.get("_base_url", ""),
+            path=path,
+            swagger=swagger,
+        )
+        self._entries[api_id] = entry
+        spec_hash = (swagger.get("_index") or {}).get("hash")
+        if spec_hash:
+            self._by_hash[spec_hash] = api_id
+        return entry
+
+    def register(self, swagger: Dict[str, Any], name: str = "upload", family: Optional[str] = None) -> SpecEntry:
+        """Add a spec that didn't come from the directory (e.g. a Streamlit upload).
+
+        Re-registering the same content returns the existing entry.
+        """
+        self.load()
+        with self._lock:
+            existing = self.entry_for(swagger)
+            if existing is not None:
+                return existing
+            spec_hash = (swagger.get("_index") or {}).get("hash") or format(id(swagger), "x")
+            entry = self._add(f"{spec_id(name)}_{spec_hash[:8]}", swagger, None)
+            if family:
+                entry = self._entries[entry.id] = entry._replace(family=family)
+            return entry
+
+    # ---- lookups -------------------------------------------------------
+    def ids(self, family: Optional[str] = None) -> List[str]:
+        self.load()
+        return [i for i, e in self._entries.items() if family is None or e.family == family]
+
+    def get(self, api_id: str) -> SpecEntry:
+        self.load()
+        try:
+            return self._entries[api_id]
+        except KeyError:
+            raise KeyError(f"Unknown API spec '{api_id}' (known: {', '.join(self._entries)})") from None
+
+    def spec(self, api_id: str) -> Dict[str, Any]:
+        return self.get(api_id).swagger
+
+    def default(self, family: str) -> Optional[SpecEntry]:
+        """The preferred spec of a family, or its first one."""
+        self.load()
+        preferred = DEFAULT_SPECS.get(family)
+        if preferred in self._entries:
+            return self._entries[preferred]
+        ids = self.ids(family)
+        return self._entries[ids[0]] if ids else None
+
+    def entry_for(self, swagger: Optional[Dict[str, Any]]) -> Optional[SpecEntry]:
+        """Registry entry of an already-loaded spec, by content hash (O(1))."""
+        if not swagger:
+            return None
+        self.load()
+        spec_hash = (swagger.get("_index") or {}).get("hash")
+        if spec_hash in self._by_hash:
+            return self._entries[self._by_hash[spec_hash]]
+        for entry in self._entries.values():
+            if entry.swagger is swagger:
+                return entry
+        return None
+
+    def family_of(self, swagger: Optional[Dict[str, Any]]) -> Optional[str]:
+        if not swagger:
+            return None
+        entry = self.entry_for(swagger)
+        return entry.family if entry else api_family(swagger)
+
+    # ---- routing -------------------------------------------------------
+    def set_executor(self, family: str, executor: Callable):
+        self._executors[family] = executor
+
+    def executor(self, api_id: str) -> Callable:
+        family = self.get(api_id).family
+        with self._lock:
+            if family not in self._executors:
+                target = EXECUTORS.get(family)
+                if target is None:
+                    raise ValueError(f"No executor registered for API family '{family}' (spec '{api_id}')")
+                module, func = target.split(":")
+                self._executors[family] = getattr(importlib.import_module(module), func)
+            return self._executors[family]
+
+    def execute(self, api_id: str, method: str, path_template: str, query_params=None, post_body=None,
+                path_vals=None, **kwargs: Any):
+        """Run a request against spec ``api_id`` with its family's executor.
+
+        Returns whatever the executor returns, i.e. ``(url, raw_json, df)``;
+        extra keyword arguments (e.g. ``token`` for SentinelHub) are passed through.
+        """
+        return self.executor(api_id)(
+            swagger=self.spec(api_id),
+            method=method,
+            path_template=path_template,
+            query_params=query_params if query_params is not None else {},
+            post_body=post_body,
+            path_vals=path_vals or {},
+            **kwargs,
+        )
+
+
+_DEFAULT: Optional[SpecRegistry] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_registry() -> SpecRegistry:
+    """The process-wide registry, shared by every app and Streamlit session."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = SpecRegistry().load()
+        return _DEFAULT
@@ -0,0 +1,91 @@
+"""
+Cached access tokens that refresh themselves before they expire.
+
+``RefreshingToken`` is the shared lifecycle behind the connectors' token
+providers (ArcGIS ``generateToken`` in ``CEMS.py``, SentinelHub OAuth2 in
+``core.sentinelhub_auth``); a subclass only implements ``_request``:
+
+* the token is fetched on first use and cached with its expiry
+* it is renewed ``refresh_margin`` seconds before it expires -- lazily in
+  ``get()`` and by a daemon thread, so long harvests never see it lapse
+* ``refresh(rejected)`` forces a renewal after the server refused a token;
+  concurrent callers rejected with the same token share one renewal
+* all of it is thread-safe, so one instance can serve every worker thread
+  and Streamlit session of a process
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Type
+
+
+class RefreshingToken:
+    error: Type[Exception] = RuntimeError  # what ``_request`` raises on failure
+    thread_name = "token-refresh"
+
+    def __init__(self, *, refresh_margin: float = 60.0, background: bool = True):
+        self.refresh_margin = refresh_margin
+        self.background = background
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._response: Dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.fetches = 0  # token requests made, for monitoring
+
+    def _request(self) -> Tuple[str, float, Dict[str, Any]]:
+        """Fetch a new token: (token, expiry as epoch seconds, full response)."""
+        raise NotImplementedError
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    def _renew(self):
+        try:
+            token, expires_at, response = self._request()
+        finally:
+            self.fetches += 1
+        now = time.time()
+        # never refresh earlier than halfway through a short-lived token
+        margin = min(self.refresh_margin, max(expires_at - now, 0.0) / 2)
+        self._token, self._response = token, response
+        self._expires_at = expires_at
+        self._refresh_at = expires_at - margin
+
+    def _due(self) -> bool:
+        return self._token is None or time.time() >= self._refresh_at
+
+    def get(self) -> str:
+        """A valid token (fetched or renewed only when needed)."""
+        with self._lock:
+            if self._due():
+                self._renew()
+            if self.background and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._thread.start()
+            return self._token
+
+    def refresh(self, rejected: Optional[str] = None) -> str:
+        """Force a new token; if *rejected* is given and another thread already replaced it, reuse theirs."""
+        with self._lock:
+            if rejected is None or self._token is None or self._token == rejected:
+                self._renew()
+            return self._token
+
+    def _run(self):
+        while True:
+            with self._lock:
+                wait = self._refresh_at - time.time()
+            if self._stop.wait(max(wait, 5.0)):
+                return
+            with self._lock:
+                if self._due():
+                    try:
+                        self._renew()
+                    except self.error:
+                        pass  # get() retries in the foreground; try again shortly
+
+    def close(self):
+        self._stop.set()
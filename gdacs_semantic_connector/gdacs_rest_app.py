@@ -1,5 +1,6 @@
 # Import necessary libraries
 import os  # Provides a way to interact with the operating system, including file and directory operations
+import sys  # Used to make the repository root importable for the shared core modules
 import json  # Used for encoding and decoding JSON data
 import urllib.parse  # Provides utilities for parsing URLs
 from io import BytesIO  # Used for managing data in bytes, particularly useful for handling binary data in memory
@@ -8,12 +9,17 @@ import streamlit as st  # A library for creating web apps with Python, used here
 import pandas as pd  # Provides data structures and functions needed to manipulate structured data
 import requests  # Allows sending HTTP requests easily, used here to fetch data from web APIs
 import folium  # A library for visualizing geospatial data, used to create interactive maps
-from rdflib import Graph, Namespace  # Used for working with RDF (Resource Description Framework) data
+from rdflib import Namespace  # Used for working with RDF (Resource Description Framework) data
 from rdflib.namespace import RDF, RDFS  # Provides predefined RDF and RDFS namespaces
 from streamlit_folium import st_folium  # Integrates folium maps into Streamlit apps
 from pandas.errors import EmptyDataError  # Exception raised when a DataFrame operation encounters empty data
 from gdacs.api import EVENT_TYPES  # Imports event types from the GDACS API, used for hazard data
 
+# `streamlit run gdacs_semantic_connector/gdacs_rest_app.py` only puts this folder on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.http_client import get_client  # Shared pooled, retrying HTTP transport
+from core.ontology_store import get_ontology_store  # Parse-once, process-wide ontology cache
+
 # Define namespaces and directories for data storage
 DIS = Namespace("http://example.org/disaster#")
 SUMMARY_DIR = os.path.join(os.getcwd(), "summary")
@@ -23,8 +29,7 @@ GEOM_DIR = "gdacs_event_geometry"
 # Helper function to load hazard ontology from an OWL file
 @st.cache_data(show_spinner=False)
 def load_hazard_ontology(file_obj):
-    g = Graph()
-    g.parse(file_obj)
+    g = get_ontology_store().load(file_obj)
     out = []
     for subj in g.subjects(RDF.type, DIS.GDACSHazardType):
         lbl = g.value(subj, RDFS.label)
@@ -144,7 +149,7 @@ if st.sidebar.button("🔍 Fetch GDACS Events", key="fetch_sum"):
         st.info(f"🌐 Debug: falling back to raw GET {raw_url}")
         feats = []
         try:
-            resp = requests.get(raw_url, timeout=15)
+            resp = get_client().get(raw_url, timeout=15)
             st.info(f"   → HTTP {resp.status_code}; Content-Type: {resp.headers.get('content-type')}")
             resp.raise_for_status()
             data = resp.json()  # may raise ValueError
@@ -239,7 +244,7 @@ if "summary_df" in st.session_state:
             os.makedirs(evd, exist_ok=True)
 
             try:
-                r = requests.get(row["detail_url"])
+                r = get_client().get(row["detail_url"])
                 r.raise_for_status()
                 props = r.json().get("properties", {}) or {}
             except Exception as e:
@@ -256,7 +261,7 @@ if "summary_df" in st.session_state:
                 fname = os.path.join(evd, f"episode_{epid}.xlsx")
                 if not os.path.exists(fname):
                     try:
-                        r2 = requests.get(det_url)
+                        r2 = get_client().get(det_url)
                         r2.raise_for_status()
                         js = r2.json()
                         df_det = pd.json_normalize(js)
@@ -296,7 +301,7 @@ if "summary_df" in st.session_state:
             os.makedirs(evg, exist_ok=True)
 
             try:
-                r = requests.get(row["detail_url"])
+                r = get_client().get(row["detail_url"])
                 r.raise_for_status()
                 eps = r.json().get("properties", {}).get("episodes", [])
             except:
@@ -315,7 +320,7 @@ if "summary_df" in st.session_state:
                     f"?eventtype={et}&eventid={eid}&episodeid={epid}"
                 )
                 try:
-                    r2 = requests.get(geom_url)
+                    r2 = get_client().get(geom_url)
                     r2.raise_for_status()
                     gj = r2.json()
                 except:
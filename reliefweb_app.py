@@ -1,3 +1,7 @@
+import json
+import os
+
+import pandas as pd
 import streamlit as st
 
 # ---- Page setup
@@ -8,8 +12,9 @@ st.title("🌍 API ReliefWeb Semantic Connector")
 from ui.sidebar import render_sidebar
 from ui.endpoint_selector import select_endpoint
 from ui.parameter_ui import render_parameter_input
-from ui.request_executor import execute_request
 from ui.response_display import show_results
+from core.spec_registry import get_registry
+from core.reliefweb_batch import BatchError, BatchStore, run_batch
 
 # ---- Sidebar UI: Load API
 render_sidebar()
@@ -21,6 +26,7 @@ if not swagger_spec:
     st.stop()
 
 st.session_state["swagger_spec"] = swagger_spec
+api_id = st.session_state.get("api_id") or get_registry().register(swagger_spec, family="reliefweb").id
 
 # ---- Always show the endpoint dropdown
 method, path_template, chosen_endpoint = select_endpoint(swagger_spec)
@@ -31,19 +37,62 @@ st.session_state["path_template"] = path_template
 st.write("🔎 Selected endpoint:", f"{method} {path_template}")
 
 # ---- Render parameter input widgets based on endpoint + method
-params = render_parameter_input(chosen_endpoint, method)
+params = render_parameter_input(chosen_endpoint, method, swagger_spec)
 query_params = params.get("query_params", {})
 post_body = params.get("post_body", {})
 path_vals = params.get("path_vals", {})
 
 # ---- Execute request on button press
 if st.button("🚀 Execute Request"):
-    url, raw_json, df = execute_request(
-        swagger=swagger_spec,
+    url, raw_json, df = get_registry().execute(
+        api_id,
         method=method,
         path_template=path_template,
         query_params=query_params,
         post_body=post_body,
         path_vals=path_vals
     )
-    show_results(df, raw_json)
\ No newline at end of file
+    show_results(df, raw_json, endpoint=path_template)
+else:
+    show_results()  # paging / export reruns render the stored result set
+
+# ---- Batch harvest: several queries, every page, resumable
+with st.expander("📚 Batch harvest (all pages, several queries)"):
+    batch_json = st.text_area(
+        "Query specs (JSON list)",
+        value='[\n  {"name": "floods", "endpoint": "reports", "query": {"value": "flood"}}\n]',
+        height=160,
+        key="batch_queries"
+    )
+    col_db, col_conc = st.columns([3, 1])
+    batch_db = col_db.text_input("Harvest database", value="output/reliefweb_batch.sqlite", key="batch_db")
+    concurrency = col_conc.number_input("Concurrency", min_value=1, max_value=16, value=4, key="batch_concurrency")
+
+    if st.button("📥 Run / resume batch"):
+        try:
+            queries = json.loads(batch_json)
+        except json.JSONDecodeError as e:
+            st.error(f"❌ Invalid JSON: {e}")
+            queries = None
+        if queries is not None:
+            os.makedirs(os.path.dirname(batch_db) or ".", exist_ok=True)
+            bars = {}
+
+            def on_progress(name, rows, total):
+                if name not in bars:
+                    bars[name] = st.progress(0.0, text=name)
+                bars[name].progress(min(rows / total, 1.0) if total else 1.0, text=f"{name}: {rows}/{total}")
+
+            try:
+                status = run_batch(queries, batch_db, concurrency=int(concurrency), on_progress=on_progress)
+            except BatchError as e:
+                st.error(f"❌ {e}")
+            else:
+                st.dataframe(pd.DataFrame(status), use_container_width=True)
+                store = BatchStore(batch_db)
+                try:
+                    show_results(store.to_dataframe(), {"batch": status}, endpoint="batch", key="batch_results")
+                finally:
+                    store.close()
+    elif "batch_results" in st.session_state:
+        show_results(key="batch_results")
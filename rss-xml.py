@@ -1,7 +1,8 @@
-import requests
 import pandas as pd
 import xml.etree.ElementTree as ET
 
+from core.http_client import get_client
+
 GDACS_RSS_URL = "https://www.gdacs.org/xml/rss.xml"
 
 namespaces = {
@@ -15,7 +16,7 @@ namespaces = {
 
 def parse_gdacs_rss(rss_url: str) -> pd.DataFrame:
     print(f"Fetching XML from {rss_url}...")
-    response = requests.get(rss_url)
+    response = get_client().get(rss_url)
     response.raise_for_status()  # Stop if status != 200
 
     root = ET.fromstring(response.content)
@@ -1,10 +1,15 @@
 import streamlit as st
 import os
+import time
 from core.openapi_parser import load_swagger
-from core.sentinelhub_auth import get_sentinelhub_token
+from core.sentinelhub_auth import SentinelHubAuthError, get_token_manager
 from ui.endpoint_selector import select_endpoint
 from ui.parameter_ui import render_parameter_input
-from core.sentinelhub_executor import execute_sentinel_query
+from core.spec_registry import get_registry
+from core.sentinelhub_tiling import PROCESS_PATH, download_tiled
+from core.sentinelhub_catalog import SEARCH_PATH, harvest_catalog
+from core.sentinelhub_batch import BATCH_PATH, BatchProcessError, get_batch_client, get_poller
+from ui.response_display import json_sample, show_results
 
 # ---- Page setup
 st.set_page_config(page_title="API SentinelHub Semantic Connector", layout="wide")
@@ -19,27 +24,35 @@ if not client_id or not client_secret:
     st.error("❌ SentinelHub credentials not set. Please define them in code or via environment.")
     st.stop()
 
-token = get_sentinelhub_token(client_id, client_secret)
-print("🔑 Retrieved token:", token is not None, flush=True)
-
-if token:
-    st.session_state["copernicus_token"] = token
-    st.success("✅ Token retrieved successfully")
-    st.code(f"Token starts with: {token[:10]}...", language='text')
-else:
-    st.error("❌ Failed to retrieve token")
+# One manager per process: reruns and sessions reuse the cached token until it is due for refresh
+token_manager = get_token_manager(client_id, client_secret)
+try:
+    token = token_manager.get()
+except SentinelHubAuthError as e:
+    st.error(f"❌ Failed to retrieve token: {e}")
     st.stop()
 
-# ---- Swagger file uploader
+st.session_state["copernicus_token"] = token
+st.success("✅ Token retrieved successfully")
+st.code(f"Token starts with: {token[:10]}... (valid until {time.strftime('%H:%M:%S', time.localtime(token_manager.expires_at))})",
+        language='text')
+
+# ---- Swagger spec: bundled SentinelHub specs, or an uploaded one
+registry = get_registry()
 swagger_file = st.file_uploader("SentinelHub OpenAPI (YAML or JSON)", type=["yaml", "json"])
 if swagger_file:
-    st.session_state.sentinel_swagger = load_swagger(swagger_file)
+    uploaded = load_swagger(swagger_file)
+    st.session_state.sentinel_api_id = registry.register(uploaded, swagger_file.name, family="sentinelhub").id
     st.success("✅ SentinelHub API spec loaded")
 
-swagger = st.session_state.get("sentinel_swagger")
-if not swagger:
+api_ids = registry.ids("sentinelhub")
+if not api_ids:
     st.warning("Please upload the SentinelHub OpenAPI file.")
     st.stop()
+default_id = st.session_state.get("sentinel_api_id") or registry.default("sentinelhub").id
+api_id = st.selectbox("API description", api_ids, index=api_ids.index(default_id) if default_id in api_ids else 0,
+                      key="sentinel_api_select")
+swagger = registry.spec(api_id)
 
 # ---- Endpoint selector
 method, path_template, chosen_endpoint = select_endpoint(swagger)
@@ -47,30 +60,148 @@ if not chosen_endpoint:
     st.stop()
 
 # ---- Parameter input rendering
-params = render_parameter_input(chosen_endpoint, method)
+params = render_parameter_input(chosen_endpoint, method, swagger)
 query_params = params.get("query_params", {})
 post_body = params.get("post_body", {})
 path_vals = params.get("path_vals", {})
 
+# ---- Image responses are streamed to disk: a chosen path, or the bounded spool directory
+raster_path = None
+if method.upper() == "POST" and path_template == PROCESS_PATH:
+    raster_path = st.text_input("Save image to (optional, default: temporary spool file)", key="raster_path") or None
+
 # ---- Execute button
 if st.button("🔍 Execute SentinelHub Request"):
-    url, raw_json, df = execute_sentinel_query(
-        swagger=swagger,
+    url, raw_json, df = registry.execute(
+        api_id,
         method=method,
         path_template=path_template,
         query_params=query_params,
         post_body=post_body,
         path_vals=path_vals,
-        token=token
+        token=token_manager,
+        raster_path=raster_path
     )
     if "download_url" in raw_json:
+        if raw_json.get("cache") in ("HIT", "COALESCED"):
+            st.info("♻️ Served from the raster cache — no processing units used.")
+        if raw_json.get("raster"):
+            info = raw_json["raster"]
+            st.caption(f"{info['width']} × {info['height']} px, {info['bands']} band(s), {info['dtype']}, "
+                       f"{info['crs'] or 'no CRS'}, {info['bytes'] / 1e6:.1f} MB — `{raw_json['download_url']}`")
         with open(raw_json["download_url"], "rb") as f:
-            st.download_button("📥 Download Image", f, file_name="sentinel_image.tiff")
+            st.download_button("📥 Download Image", f, file_name=os.path.basename(raw_json["download_url"]),
+                               mime=raw_json.get("content_type"))
     elif df is not None:
-        st.success(f"✅ Query returned {len(df)} results")
-        st.dataframe(df)
+        show_results(df, raw_json, source="sentinelhub", endpoint=path_template, key="sentinel_results")
     elif raw_json:
-        st.json(raw_json)
+        st.json(json_sample(raw_json))
+else:
+    show_results(key="sentinel_results")
+
+# ---- Tiled download for areas beyond the Process API's 2500 px limit
+if method.upper() == "POST" and path_template == PROCESS_PATH:
+    with st.expander("🧩 Tiled download (large areas)"):
+        col_res, col_fmt, col_conc = st.columns([2, 1, 1])
+        # 0 keeps the request's output width/height; CRS84 bboxes are in degrees, not metres
+        resolution = col_res.number_input("Resolution (bbox CRS units per pixel, 0 = request size)",
+                                          min_value=0.0, value=0.0, format="%.6g", key="tiled_resolution")
+        out_format = col_fmt.selectbox("Output", ["GeoTIFF", "Zarr"], key="tiled_format")
+        tile_concurrency = col_conc.number_input("Concurrency", min_value=1, max_value=16, value=4,
+                                                 key="tiled_concurrency")
+        if st.button("🧩 Download tiled mosaic"):
+            out_path = os.path.join("output", "sentinelhub",
+                                    f"mosaic-{time.strftime('%Y%m%d-%H%M%S')}.{'zarr' if out_format == 'Zarr' else 'tif'}")
+            bar = st.progress(0.0, text="Tiles")
+            try:
+                result = download_tiled(
+                    swagger, post_body, out_path,
+                    resolution=resolution or None,
+                    token=token_manager,
+                    concurrency=int(tile_concurrency),
+                    path_template=path_template,
+                    on_progress=lambda done, total: bar.progress(done / total, text=f"Tiles: {done}/{total}"),
+                )
+            except (ValueError, RuntimeError) as e:
+                st.error(f"❌ {e}")
+            else:
+                plan = result.plan
+                st.caption(f"{len(plan.tiles)} tiles, {plan.width} × {plan.height} px")
+                for error in result.failed.values():
+                    st.warning(error)
+                if result.path:
+                    st.success(f"✅ Mosaic written to `{result.path}`")
+
+# ---- Full catalog harvest: every page of every time window
+if method.upper() == "POST" and path_template == SEARCH_PATH:
+    with st.expander("🗂️ Harvest all results (all pages, time windows)"):
+        col_win, col_fmt, col_conc = st.columns([2, 1, 1])
+        window_days = col_win.number_input("Window (days, 0 = one window)", min_value=0, value=30,
+                                           key="catalog_window_days")
+        catalog_format = col_fmt.selectbox("Output", ["parquet", "ndjson"], key="catalog_format")
+        catalog_concurrency = col_conc.number_input("Concurrency", min_value=1, max_value=16, value=4,
+                                                    key="catalog_concurrency")
+        if st.button("🗂️ Harvest catalog"):
+            out_path = os.path.join("output", "sentinelhub",
+                                    f"catalog-{time.strftime('%Y%m%d-%H%M%S')}.{catalog_format}")
+            status = st.empty()
+            try:
+                harvest = harvest_catalog(
+                    swagger, post_body, out_path,
+                    window_days=window_days or None,
+                    token=token_manager,
+                    concurrency=int(catalog_concurrency),
+                    path_template=path_template,
+                    on_progress=lambda window, count: status.caption(f"{window}: {count} features"),
+                )
+            except RuntimeError as e:
+                st.error(f"❌ {e}")
+            else:
+                for window, error in harvest.failed.items():
+                    st.warning(f"{window}: {error}")
+                st.success(f"✅ {harvest.features} features ({harvest.duplicates} duplicates skipped, "
+                           f"{harvest.pages} pages) written to `{harvest.path}`")
+
+# ---- Batch Processing: jobs are tracked in SQLite and polled in the background
+if path_template.startswith(BATCH_PATH):
+    with st.expander("🏭 Batch Processing jobs", expanded=path_template == BATCH_PATH):
+        batch_client = get_batch_client(swagger, token=token_manager)
+        poller = get_poller(batch_client)  # resumes polling of unfinished jobs
+        if method.upper() == "POST" and path_template == BATCH_PATH and st.button("🏭 Create batch job from payload"):
+            try:
+                created = batch_client.create(post_body)
+            except BatchProcessError as e:
+                st.error(f"❌ {e}")
+            else:
+                st.success(f"✅ Batch job `{created['id']}` created ({created.get('status')})")
+
+        jobs = batch_client.tracker.jobs()
+        if jobs:
+            st.dataframe(jobs, use_container_width=True, hide_index=True)
+            job_id = st.selectbox("Job", [j["id"] for j in jobs], key="batch_job_id")
+            col_analyse, col_start, col_cancel, col_refresh = st.columns(4)
+            try:
+                if col_analyse.button("Analyse"):
+                    batch_client.analyse(job_id)
+                    poller.watch(job_id)
+                if col_start.button("▶️ Start"):
+                    batch_client.start(job_id)
+                    poller.watch(job_id)
+                if col_cancel.button("⏹️ Cancel"):
+                    batch_client.cancel(job_id)
+                if col_refresh.button("🔄 Refresh"):
+                    batch_client.refresh(job_id)
+            except BatchProcessError as e:
+                st.error(f"❌ {e}")
+            if job_id in poller.errors:
+                st.warning(poller.errors[job_id])
+            st.caption("Polling: " + (", ".join(poller.watching()) or "no active jobs"))
+            manifest = batch_client.tracker.tile_manifest(job_id)
+            if not manifest.empty:
+                st.markdown("**Tile manifest**")
+                st.dataframe(manifest, use_container_width=True, hide_index=True)
+        else:
+            st.caption("No batch jobs tracked yet.")
 
 # ---- Debug (optional)
 if "url" in locals():
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the connectors are top-level scripts and namespace packages, not an installed distribution
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,72 @@
+"""ActivationIndex answers the same queries as the linear scans it replaced."""
+import random
+
+import pytest
+
+from CEMS import ActivationIndex
+
+DAY_MS = 86_400_000
+
+
+@pytest.fixture(scope="module")
+def features():
+    rng = random.Random(3)
+    feats = [
+        {"attributes": {
+            "code": f"EMSR{rng.randrange(2000):04d}",  # duplicates on purpose: first occurrence wins
+            "category": rng.choice(["Flood", "Fire", "Storm", None]),
+            "activationTime": rng.choice([rng.randrange(1000) * DAY_MS, None]),
+        }}
+        for _ in range(5000)
+    ]
+    feats.append({"attributes": {"category": "Flood"}})  # no code at all
+    return feats
+
+
+def _scan(features, code_prefix=None, category=None, since=None, until=None):
+    out = []
+    for f in features:
+        a = f["attributes"]
+        if code_prefix and not (a.get("code") or "").startswith(code_prefix):
+            continue
+        if category is not None and a.get("category") != category:
+            continue
+        if since is not None or until is not None:
+            t = a.get("activationTime")
+            if t is None or (since is not None and t < since) or (until is not None and t > until):
+                continue
+        out.append(a)
+    return out
+
+
+def test_get_returns_the_first_feature_with_that_code(features):
+    idx = ActivationIndex(features)
+    for code in ("EMSR0001", "EMSR1234", "EMSR9999"):
+        expected = next((f["attributes"] for f in features if f["attributes"].get("code") == code), None)
+        assert idx.get(code) is expected
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"code_prefix": "EMSR"},
+    {"code_prefix": "EMSR1"},
+    {"code_prefix": "EMSR", "category": "Fire"},
+    {"since": 0},
+    {"code_prefix": "EMSR12", "category": "Fire"},
+    {"category": "Flood"},
+    {"since": 100 * DAY_MS, "until": 200 * DAY_MS},
+    {"code_prefix": "EMSR0", "category": "Storm", "since": 500 * DAY_MS},
+    {"until": 0},
+    {"code_prefix": "XYZ"},
+])
+def test_query_matches_linear_scan(features, filters):
+    idx = ActivationIndex(features)
+    expected = _scan(features, **filters)
+    assert idx.query(limit=0, **filters) == expected
+    assert idx.query(limit=7, offset=3, **filters) == expected[3:10]
+
+
+def test_time_bounds_accept_iso_strings(features):
+    idx = ActivationIndex(features)
+    assert idx.query(limit=0, since="1970-04-11", until="1970-07-20") == \
+        _scan(features, since=100 * DAY_MS, until=200 * DAY_MS)
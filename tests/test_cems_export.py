@@ -0,0 +1,33 @@
+"""Streaming ``list --format parquet`` output of CEMS.py."""
+import pytest
+
+import CEMS
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _rows(n, **late):
+    for i in range(n):
+        row = {"code": f"EMSR{i:04d}", "category": "Flood", "activationTime": 1_600_000_000_000 + i,
+               "closed": None, "comment": None}
+        if i >= CEMS.STREAM_BATCH:
+            row.update(late)
+        yield row
+
+
+def test_column_null_in_first_batch_is_filled_later(tmp_path):
+    out = tmp_path / "activations.parquet"
+    n = CEMS.write_activations(_rows(2500, closed=1_700_000_000_000, comment=42), "parquet", out)
+    table = pq.read_table(out)
+    assert n == table.num_rows == 2500
+    assert table.schema.field("closed").type == pa.int64()
+    assert table.column("closed").null_count == CEMS.STREAM_BATCH
+    assert table.column("comment").to_pylist()[-1] == "42"
+
+
+def test_failed_export_leaves_no_partial_file(tmp_path):
+    out = tmp_path / "activations.parquet"
+    with pytest.raises(CEMS.ActivationsFetchError, match="Parquet export failed"):
+        CEMS.write_activations(_rows(2500, activationTime="yesterday"), "parquet", out)
+    assert not out.exists()
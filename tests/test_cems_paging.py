@@ -0,0 +1,196 @@
+"""Serial and concurrent paging and delta syncs of CEMS.py against a local stub FeatureServer."""
+import json
+import re
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import CEMS
+from core.http_client import HttpClient
+
+LAYER_SIZE = 2 * CEMS.PAGE_SIZE + 345
+
+
+def _feature(i):
+    return {"attributes": {"objectid": i + 1, "code": f"EMSR{i:05d}", "category": ("Flood", "Fire")[i % 2]}}
+
+
+def _matches(where, attrs):
+    """The two ``where`` shapes CEMS sends: ``1=1`` and a watermark comparison."""
+    if where == "1=1":
+        return True
+    m = re.fullmatch(r"(\w+) >= TIMESTAMP '([\d-]+ [\d:]+)'", where)
+    if m:
+        ts = datetime.strptime(m.group(2), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        return attrs.get(m.group(1), -1) >= ts.timestamp() * 1000
+    field, value = re.fullmatch(r"(\w+) > (\d+)", where).groups()
+    return attrs.get(field, -1) > int(value)
+
+
+class _FeatureServer(BaseHTTPRequestHandler):
+    features = [_feature(i) for i in range(LAYER_SIZE)]
+    fail_once = set()  # offsets answered with one 503 before the real page
+    lock = threading.Lock()
+    requests = []
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        with self.lock:
+            self.requests.append(params)
+            offset = int(params.get("resultOffset", 0))
+            if "resultOffset" in params and offset in self.fail_once:
+                self.fail_once.discard(offset)
+                self.send_response(503)
+                self.end_headers()
+                return
+        where = params.get("where", "1=1")
+        features = [f for f in self.features if _matches(where, f["attributes"])]
+        if params.get("returnCountOnly") == "true":
+            body = {"count": len(features)}
+        else:
+            count = int(params.get("resultRecordCount", CEMS.PAGE_SIZE))
+            body = {"features": features[offset:offset + count]}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feature_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FeatureServer)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _FeatureServer.requests = []
+    client = HttpClient(backoff=0.01)  # no response cache: every page must hit the stub
+    monkeypatch.setattr(CEMS, "BASE_URL", f"http://127.0.0.1:{server.server_port}/query")
+    monkeypatch.setattr(CEMS, "get_client", lambda: client)
+    monkeypatch.setattr(CEMS, "_CACHE", None)
+    monkeypatch.setattr(_FeatureServer, "features", _FeatureServer.features)
+    yield _FeatureServer
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_paging_matches_serial(feature_server):
+    serial = CEMS._download_all_features(None, workers=1)
+    concurrent = CEMS._download_all_features(None, workers=4)
+    assert len(serial) == LAYER_SIZE
+    assert concurrent == serial
+
+
+def test_concurrent_paging_asks_for_the_count_first(feature_server):
+    CEMS._download_all_features(None, workers=4)
+    assert feature_server.requests[0].get("returnCountOnly") == "true"
+    offsets = sorted(int(r["resultOffset"]) for r in feature_server.requests[1:])
+    assert offsets == list(range(0, LAYER_SIZE, CEMS.PAGE_SIZE))
+
+
+def test_failed_page_is_retried_in_place(feature_server):
+    feature_server.fail_once = {CEMS.PAGE_SIZE}
+    feats = CEMS._download_all_features(None, workers=3)
+    assert [f["attributes"]["objectid"] for f in feats] == list(range(1, LAYER_SIZE + 1))
+    assert not feature_server.fail_once
+
+
+BASE_MS = 1_700_000_000_000  # whole seconds, as TIMESTAMP literals carry no milliseconds
+MINUTE_MS = 60_000
+
+
+def _dated(i, minutes, name="flood"):
+    return {"attributes": {"objectid": i + 1, "code": f"EMSR{i:05d}", "name": name,
+                           "lastUpdate": BASE_MS + minutes * MINUTE_MS}}
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_delta_sync_upserts_changes_since_the_watermark(feature_server, tmp_path, workers):
+    feature_server.features = [_dated(i, i) for i in range(40)]
+    cache = tmp_path / "cems.json"
+    assert CEMS.sync_activations(cache=cache, workers=workers) == 40
+    assert json.loads(cache.read_text())["sync"]["mark"] == {
+        "field": "lastUpdate", "value": BASE_MS + 39 * MINUTE_MS, "kind": "date"}
+
+    feature_server.features[5] = _dated(5, 100, name="flood (updated)")
+    feature_server.features.append(_dated(40, 101))
+    feature_server.requests = []
+    # the boundary feature 39 is read again (>=), plus the changed and the new one
+    assert CEMS.sync_activations(cache=cache, workers=workers) == 3
+
+    mark = datetime.fromtimestamp((BASE_MS + 39 * MINUTE_MS) / 1000, tz=timezone.utc)
+    assert {r["where"] for r in feature_server.requests} == {f"lastUpdate >= TIMESTAMP '{mark:%Y-%m-%d %H:%M:%S}'"}
+
+    data = json.loads(cache.read_text())
+    codes = [f["attributes"]["code"] for f in data["features"]]
+    assert codes == [f"EMSR{i:05d}" for i in range(41)]  # upserted in place, nothing duplicated
+    assert data["features"][5]["attributes"]["name"] == "flood (updated)"
+    assert data["sync"]["mark"]["value"] == BASE_MS + 101 * MINUTE_MS
+    assert data["sync"]["last_changed"] == 3
+
+
+def _page_requests(server):
+    return [r for r in server.requests if "resultOffset" in r]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_sqlite_fill_round_trip(feature_server, tmp_path, workers):
+    store = CEMS.SQLiteActivationStore(tmp_path / "cems.sqlite")
+    pages = list(store.fill_pages(None, workers))
+    assert sum(len(p) for p in pages) == LAYER_SIZE
+    assert store.query(limit=0) == [f["attributes"] for f in feature_server.features]
+    assert store.query(category="Fire", limit=2, offset=1) == [_feature(3)["attributes"], _feature(5)["attributes"]]
+    assert store.sync_info()["mark"] == {"field": "objectid", "value": LAYER_SIZE, "kind": "oid"}
+
+    reopened = CEMS.SQLiteActivationStore(tmp_path / "cems.sqlite")
+    assert len(reopened) == LAYER_SIZE and reopened.get("EMSR00042") == _feature(42)["attributes"]
+
+
+def test_interrupted_fill_keeps_the_previous_layer(feature_server, tmp_path, monkeypatch):
+    path = tmp_path / "cems.sqlite"
+    store = CEMS.SQLiteActivationStore(path)
+    list(store.fill_pages(None))
+    synced = store.sync_info()
+
+    feature_server.features = [_feature(i) for i in range(10)]  # the layer shrank upstream
+    fill = store.fill_pages(None)
+    assert len(next(fill)) == 10
+
+    monkeypatch.setattr(CEMS, "SQLITE_BUSY_TIMEOUT", 1.0)
+    other = CEMS.SQLiteActivationStore(path)  # another process, mid-fill
+    assert len(other) == LAYER_SIZE and other.sync_info() == synced
+    with other._transaction():  # no write lock is held between pages
+        pass
+
+    fill.close()
+    conn = other._conn()
+    assert conn.execute("SELECT COUNT(*) FROM features_fill").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM meta WHERE key = 'fill'").fetchone()[0] == 0
+    assert len(other) == LAYER_SIZE and other.sync_info() == synced
+
+    list(store.fill_pages(None))
+    assert len(other) == 10 and other.sync_info() != synced
+
+
+def test_second_filler_waits_and_reuses_the_first_download(feature_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(CEMS, "FILL_POLL", 0.01)
+    path = tmp_path / "cems.sqlite"
+    first = CEMS.SQLiteActivationStore(path)
+    fill = first.fill_pages(None)
+    next(fill)
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.extend(CEMS.SQLiteActivationStore(path).fill_pages(None)))
+    waiter.start()
+    for _ in fill:
+        pass
+    waiter.join(timeout=10)
+
+    assert sum(len(p) for p in result) == LAYER_SIZE
+    assert len(_page_requests(feature_server)) == len(range(0, LAYER_SIZE, CEMS.PAGE_SIZE))
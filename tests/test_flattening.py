@@ -0,0 +1,48 @@
+"""Column-wise flattening of ReliefWeb items against a shared per-endpoint schema."""
+from core.flattening import RecordSchema, records_to_frame, schema_for
+
+
+def _report(i, **fields):
+    return {"id": str(i), "score": 1, "href": f"https://api.reliefweb.int/v1/reports/{i}", "fields": fields}
+
+
+def test_nested_field_first_seen_on_a_later_page_gets_a_column():
+    page1 = [_report(1, title="a", date={"created": "2024-01-01"})]
+    page2 = [_report(2, title="b", date={"created": "2024-02-01", "closing": "2024-03-01"})]
+    schema = RecordSchema().extend(page1)
+    assert "date.closing" not in schema.names
+    schema.extend(page2)
+    assert schema.names == ["id", "score", "href", "title", "date.created", "date.closing"]
+    frame = records_to_frame(page1 + page2, schema)
+    assert frame["date.closing"].isna().tolist() == [True, False]
+    assert frame.loc[1, "date.closing"] == "2024-03-01"
+
+
+def test_new_child_of_a_list_of_objects_is_added():
+    schema = RecordSchema().extend([_report(1, country=[{"name": "A"}])])
+    schema.extend([_report(2, country=[{"name": "B", "iso3": "bbb"}, {"name": "C", "iso3": "ccc"}])])
+    assert "country.iso3" in schema.names
+    frame = records_to_frame([_report(2, country=[{"name": "B", "iso3": "bbb"}, {"name": "C"}])], schema)
+    assert frame.loc[0, "country.name"] == ["B", "C"]
+    assert frame.loc[0, "country.iso3"] == ["bbb", None]
+
+
+def test_shared_schema_picks_up_later_fields_for_every_caller():
+    endpoint = "/test-shared-schema"
+    schema_for(endpoint, [_report(1, source=[{"name": "S"}])])
+    schema = schema_for(endpoint, [_report(2, source=[{"name": "T", "type": {"name": "NGO"}}])])
+    assert schema_for(endpoint) is schema
+    assert "source.type.name" in schema.names
+
+
+def test_points_and_scalar_lists():
+    items = [_report(1, location={"lat": 1.5, "lon": 2.5}, tags=["x", "y"])]
+    frame = records_to_frame(items, RecordSchema().extend(items))
+    assert frame.loc[0, "location"] == "POINT(2.5 1.5)"
+    assert frame.loc[0, "tags"] == ["x", "y"]
+
+
+def test_field_selection_schema_is_not_inferred():
+    items = [_report(1, title="a", body="long", date={"created": "2024-01-01"})]
+    schema = schema_for("/test-selection", items, fields=["title", "date", "date.created"])
+    assert schema.names == ["id", "score", "href", "date.created", "title"]
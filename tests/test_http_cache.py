@@ -0,0 +1,101 @@
+"""Keys of the on-disk response cache and caching of read-only POSTs."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from core.http_cache import ResponseCache, cache_key
+from core.http_client import HttpClient
+
+URL = "https://api.reliefweb.int/v1/reports"
+
+
+def test_repeated_params_keep_their_order():
+    a = cache_key("GET", URL, params=[("sort[]", "date:desc"), ("sort[]", "score:desc")])
+    b = cache_key("GET", URL, params=[("sort[]", "score:desc"), ("sort[]", "date:desc")])
+    assert a != b
+
+
+def test_distinct_params_are_order_insensitive():
+    a = cache_key("GET", URL, params=[("limit", 10), ("appname", "x"), ("sort[]", "date")])
+    b = cache_key("GET", URL, params={"sort[]": "date", "appname": "x", "limit": 10})
+    assert a == b
+
+
+def test_post_key_depends_on_the_body():
+    a = cache_key("POST", URL, json={"query": {"value": "flood"}, "limit": 10})
+    b = cache_key("POST", URL, json={"limit": 10, "query": {"value": "flood"}})
+    c = cache_key("POST", URL, json={"query": {"value": "fire"}, "limit": 10})
+    assert a == b != c
+
+
+class _Search(BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        type(self).calls += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "11")
+        self.end_headers()
+        self.wfile.write(b'{"data":[]}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def search_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Search)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _Search.calls = 0
+    yield f"http://127.0.0.1:{server.server_port}/v1/reports"
+    server.shutdown()
+    server.server_close()
+
+
+def test_post_is_cached_only_on_request(tmp_path, search_url):
+    client = HttpClient(cache=ResponseCache(str(tmp_path), ttls={"127.0.0.1": 60}))
+    body = {"query": {"value": "flood"}}
+    client.post(search_url, json=body)
+    client.post(search_url, json=body)
+    assert _Search.calls == 2  # POSTs are not cached by default
+
+    client.post(search_url, json=body, cache=True)
+    hit = client.post(search_url, json=body, cache=True)
+    assert _Search.calls == 3
+    assert hit.headers["X-Cache"] == "HIT"
+    assert hit.json() == {"data": []}
+
+
+def _response(url, **headers):
+    r = requests.Response()
+    r.status_code = 200
+    r.url = url
+    r.headers = CaseInsensitiveDict(headers)
+    r._content = b'{"features":[]}'
+    return r
+
+
+ARCGIS = "https://services.arcgis.com/x/arcgis/rest/services/CEMS/FeatureServer/0/query"
+
+
+def test_index_never_stores_query_strings(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttls={"arcgis.com": 60})
+    cache.store("k", _response(f"{ARCGIS}?where=1%3D1&token=s3cret&f=json"))
+    assert cache.lookup("k").url == ARCGIS
+    rows = cache._conn().execute("SELECT url, headers FROM entries").fetchall()
+    assert "s3cret" not in repr(rows)
+
+
+def test_unrevalidatable_responses_with_zero_ttl_are_not_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttls={"arcgis.com": 0})
+    cache.store("plain", _response(ARCGIS))
+    cache.store("etag", _response(ARCGIS, ETag='"v1"'))
+    cache.store("modified", _response(ARCGIS, **{"Last-Modified": "Tue, 01 Sep 2026 00:00:00 GMT"}))
+    assert cache.lookup("plain") is None
+    assert cache.lookup("etag").etag == '"v1"'
+    assert cache.lookup("modified") is not None
@@ -0,0 +1,81 @@
+"""Retry policy of the shared HttpClient against a local stub server."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.http_client import HttpClient
+
+
+class _Flaky(BaseHTTPRequestHandler):
+    """Answers ``status`` to the first ``failures`` requests, then 200."""
+    status = 502
+    failures = 1
+    calls = 0
+
+    def _reply(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        type(self).calls += 1
+        code = self.status if self.calls <= self.failures else 200
+        self.send_response(code)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def flaky():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Flaky)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _Flaky.calls = 0
+    yield _Flaky, f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client():
+    return HttpClient(backoff=0.001)
+
+
+@pytest.mark.parametrize("status", [500, 502, 503, 504, 429])
+def test_get_is_retried(flaky, client, status):
+    handler, url = flaky
+    handler.status = status
+    assert client.get(url).status_code == 200
+    assert handler.calls == 2
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_post_is_not_resent_after_the_server_may_have_acted(flaky, client, status):
+    handler, url = flaky
+    handler.status = status
+    assert client.post(url, json={}).status_code == status
+    assert handler.calls == 1
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_post_is_retried_when_the_server_did_not_process_it(flaky, client, status):
+    handler, url = flaky
+    handler.status = status
+    assert client.post(url, json={}).status_code == 200
+    assert handler.calls == 2
+
+
+def test_read_only_post_opts_into_full_retries(flaky, client):
+    handler, url = flaky
+    handler.status = 502
+    assert client.post(url, json={}, retry=True).status_code == 200
+    assert handler.calls == 2
+
+
+def test_retry_false_disables_retries(flaky, client):
+    handler, url = flaky
+    handler.status = 503
+    assert client.get(url, retry=False, cache=False).status_code == 503
+    assert handler.calls == 1
@@ -0,0 +1,50 @@
+"""OntologyClient graph snapshots kept in the shared ontology store."""
+import os
+
+import pytest
+
+pytest.importorskip("rdflib")
+from CEMS import CEMS_NS, OntologyClient  # noqa: E402
+from core.ontology_store import OntologyStore  # noqa: E402
+
+TTL = """@prefix cems: <http://example.org/cems#> .
+cems:Activation a <http://www.w3.org/2002/07/owl#Class> .
+"""
+COUNT = "SELECT (COUNT(?a) AS ?n) WHERE { ?a a cems:Activation }"
+
+
+def _count(client):
+    return int(client.run(COUNT)[0]["n"])
+
+
+def test_materialized_graph_is_reloaded_until_the_turtle_changes(tmp_path):
+    ttl = tmp_path / "cems.ttl"
+    ttl.write_text(TTL, encoding="utf-8")
+    cache = tmp_path / "cache"
+    store = OntologyStore(str(cache))
+
+    client = OntologyClient(ttl, store=store)
+    assert store.parses == 1
+    assert client.sync_activations([{"code": "EMSR1", "name": "Flood"}, {"code": "EMSR2", "name": "Fire"}]) == {
+        "added": 2, "updated": 0, "removed": 0}
+    client.save()
+    assert store.load(ttl, "turtle").value(CEMS_NS["EMSR1"], CEMS_NS.name) is None  # the shared parse is untouched
+
+    fresh = OntologyClient(ttl, store=OntologyStore(str(cache)))
+    assert fresh.store.parses == 0 and _count(fresh) == 2
+
+    ttl.write_text(TTL + "cems:Extra a cems:Thing .\n", encoding="utf-8")
+    changed = OntologyClient(ttl, store=OntologyStore(str(cache)))
+    assert changed.store.parses == 1 and _count(changed) == 0
+
+    assert sorted(os.listdir(tmp_path)) == ["cache", "cems.ttl"]  # nothing written next to the Turtle file
+
+
+def test_graph_without_a_turtle_file(tmp_path):
+    store = OntologyStore(str(tmp_path / "cache"))
+    with pytest.raises(FileNotFoundError):
+        OntologyClient(tmp_path / "missing.ttl", store=store)
+    client = OntologyClient(tmp_path / "missing.ttl", store=store, create=True)
+    client.sync_activations([{"code": "EMSR3"}])
+    client.save()
+    assert _count(OntologyClient(tmp_path / "missing.ttl", store=store)) == 1
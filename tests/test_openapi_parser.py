@@ -0,0 +1,60 @@
+"""Local $ref resolution, including recursive and looping refs."""
+import pytest
+
+from core.openapi_parser import RefResolutionError, RefResolver, resolve_ref
+
+
+def _spec():
+    return {
+        "swagger": "2.0",
+        "definitions": {
+            # self-reference: a tree of nodes
+            "Node": {"type": "object", "properties": {
+                "name": {"type": "string"},
+                "children": {"type": "array", "items": {"$ref": "#/definitions/Node"}},
+            }},
+            # mutual recursion through properties: A -> B -> A
+            "A": {"type": "object", "properties": {"b": {"$ref": "#/definitions/B"}}},
+            "B": {"type": "object", "properties": {"a": {"$ref": "#/definitions/A"}}},
+            # a ref chain that never reaches a schema
+            "Loop1": {"$ref": "#/definitions/Loop2"},
+            "Loop2": {"$ref": "#/definitions/Loop1"},
+            "Self": {"$ref": "#/definitions/Self"},
+            "UsesLoop": {"type": "object", "properties": {"x": {"$ref": "#/definitions/Loop1"}}},
+        },
+    }
+
+
+def test_self_reference_becomes_a_cycle():
+    view = RefResolver(_spec()).dereferenced()
+    node = view["definitions"]["Node"]
+    assert node["properties"]["children"]["items"] is node
+    assert node["properties"]["name"] == {"type": "string"}
+
+
+def test_mutual_references_share_one_node_each():
+    view = RefResolver(_spec()).dereferenced()
+    a, b = view["definitions"]["A"], view["definitions"]["B"]
+    assert a["properties"]["b"] is b
+    assert b["properties"]["a"] is a
+    assert a["properties"]["b"]["properties"]["a"] is a
+
+
+def test_ref_loops_are_reported_not_followed():
+    resolver = RefResolver(_spec())
+    with pytest.raises(RefResolutionError, match="circular"):
+        resolver.lookup("#/definitions/Loop1")
+    with pytest.raises(RefResolutionError, match="circular"):
+        resolver.lookup("#/definitions/Self")
+    assert resolve_ref(_spec(), "#/definitions/Loop2") == {}
+    view = resolver.dereferenced()
+    assert view["definitions"]["UsesLoop"]["properties"]["x"] == {"$ref": "#/definitions/Loop1"}  # left in place
+
+
+def test_dereferenced_view_is_built_once():
+    resolver = RefResolver(_spec())
+    first = resolver.dereferenced()
+    pinned = len(resolver._keep)
+    for _ in range(3):
+        assert resolver.dereferenced() is first
+    assert len(resolver._keep) == pinned
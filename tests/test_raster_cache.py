@@ -0,0 +1,94 @@
+"""Process API rasters through the content-addressed cache, against a local stub."""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import sentinelhub_executor
+from core.http_client import HttpClient
+from core.raster_cache import RasterCache
+from core.sentinelhub_executor import execute_sentinel_query
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+BODY = {"input": {"bounds": {"bbox": [13.0, 45.0, 13.1, 45.1]}}, "output": {"width": 64, "height": 64},
+        "evalscript": "//VERSION=3\nreturn [B04];"}
+
+
+class _Process(BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).calls += 1
+        time.sleep(0.3)  # long enough for every concurrent caller to arrive while it is in flight
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(PNG)))
+        self.end_headers()
+        self.wfile.write(PNG)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def swagger(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Process)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _Process.calls = 0
+    client = HttpClient()
+    cache = RasterCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(sentinelhub_executor, "get_client", lambda: client)
+    monkeypatch.setattr(sentinelhub_executor, "get_raster_cache", lambda: cache)
+    yield {"servers": [{"url": f"http://127.0.0.1:{server.server_port}"}]}
+    server.shutdown()
+    server.server_close()
+
+
+def _query(swagger, raster_path):
+    _, result, _ = execute_sentinel_query(swagger, "POST", "/api/v1/process", post_body=BODY, token="test-token",
+                                          raster_path=raster_path)
+    return result
+
+
+def test_concurrent_misses_share_one_upstream_fetch(swagger, tmp_path):
+    n = 6
+    start = threading.Barrier(n)
+    results = [None] * n
+
+    def worker(i):
+        start.wait()
+        results[i] = _query(swagger, str(tmp_path / "out" / f"{i}.png"))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert _Process.calls == 1
+    assert sorted(r["cache"] for r in results) == ["COALESCED"] * (n - 1) + ["MISS"]
+    for i, r in enumerate(results):
+        assert r["download_url"] == str(tmp_path / "out" / f"{i}.png")
+        with open(r["download_url"], "rb") as f:
+            assert f.read() == PNG
+    assert not [name for name in os.listdir(tmp_path / "out") if name.endswith(".part")]
+
+
+def test_hit_is_exported_as_an_independent_copy(swagger, tmp_path):
+    miss = _query(swagger, None)
+    assert miss["cache"] == "MISS" and _Process.calls == 1
+
+    out = tmp_path / "aoi.png"
+    hit = _query(swagger, str(out))
+    assert hit["cache"] == "HIT" and _Process.calls == 1
+    assert os.stat(out).st_nlink == 1 and not os.path.samefile(out, miss["download_url"])
+
+    with open(out, "wb") as f:
+        f.write(b"edited")  # the caller's file, not the cache entry
+    again = _query(swagger, None)
+    assert again["cache"] == "HIT"
+    with open(again["download_url"], "rb") as f:
+        assert f.read() == PNG
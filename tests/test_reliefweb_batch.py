@@ -0,0 +1,82 @@
+"""Batch harvests against a local stub ReliefWeb search endpoint."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import reliefweb_batch
+from core.http_cache import ResponseCache
+from core.http_client import HttpClient
+from core.reliefweb_batch import BatchStore, run_batch, run_cli
+
+
+class _Reports(BaseHTTPRequestHandler):
+    """``total`` reports; odd ids carry a nested ``country`` list, so columns appear late in the order."""
+
+    total = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        ids = range(body["offset"], min(body["offset"] + body["limit"], type(self).total))
+        data = [{"id": i, "fields": {"title": f"report {i}", **({"country": [{"name": f"c{i}"}]} if i % 2 else {})}}
+                for i in ids]
+        raw = json.dumps({"totalCount": type(self).total, "data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Reports)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # a cache that would serve every page for an hour if batch pages used it
+    client = HttpClient(cache=ResponseCache(str(tmp_path / "http"), ttls={"127.0.0.1": 3600}))
+    monkeypatch.setattr(reliefweb_batch, "get_client", lambda: client)
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+QUERY = {"name": "floods", "endpoint": "reports", "query": {"value": "flood"}}
+
+
+def test_restarted_batch_sees_current_pages(base_url, tmp_path):
+    db = str(tmp_path / "batch.sqlite")
+    _Reports.total = 25
+    [status] = run_batch([QUERY], db, limit=10, base_url=base_url)
+    assert (status["total"], status["rows"], status["complete"]) == (25, 25, True)
+
+    _Reports.total = 32
+    [status] = run_batch([QUERY], db, limit=10, base_url=base_url, restart=True)
+    assert (status["total"], status["rows"]) == (32, 32)
+
+
+def test_rows_are_read_back_in_chunks_with_stable_columns(base_url, tmp_path):
+    db = str(tmp_path / "batch.sqlite")
+    _Reports.total = 25
+    run_batch([QUERY], db, limit=10, base_url=base_url)
+    store = BatchStore(db)
+    try:
+        frames = list(store.iter_frames("floods", chunk_size=4))
+        assert [len(f) for f in frames] == [4] * 6 + [1]
+        assert all(list(f.columns) == list(frames[0].columns) for f in frames)
+        assert "country.name" in frames[0].columns  # first seen on id 1, but known to the first chunk
+
+        rows = list(store.iter_rows())
+        assert len(rows) == 25 and rows[0]["_query"] == "floods"
+        assert rows[0]["country.name"] is None and rows[1]["country.name"] == ["c1"]
+        assert store.to_dataframe("floods")["id"].tolist() == list(range(25))
+    finally:
+        store.close()
+
+    out = tmp_path / "floods.csv"
+    run_cli(["--db", db, "export", "--name", "floods", "--output", str(out)])
+    lines = out.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 26 and lines[0].count("country.name") == 1
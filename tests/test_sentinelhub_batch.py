@@ -0,0 +1,71 @@
+"""Batch job polling, tracking and resume with a scripted API."""
+import requests
+import pytest
+
+from core.sentinelhub_auth import SentinelHubAuthError
+from core.sentinelhub_batch import BatchClient, BatchPoller, BatchTracker
+
+
+class _ScriptedClient(BatchClient):
+    """Answers from a script: each entry is a status string or an exception to raise."""
+
+    def __init__(self, tracker, statuses, tile_failures=()):
+        super().__init__({}, tracker)
+        self.statuses = list(statuses)
+        self.tile_failures = list(tile_failures)
+        self.calls = []
+        self.errors_seen = []
+
+    def _call(self, method, suffix="", body=None, query=None):
+        self.calls.append(suffix)
+        script = self.tile_failures if suffix.endswith("/tiles") else self.statuses
+        step = script.pop(0) if script else None
+        if isinstance(step, Exception):
+            raise step
+        if suffix.endswith("/tiles"):
+            return {"data": [{"id": 1, "status": "PROCESSED", "cost": 2.5}, {"id": 2, "status": "PROCESSED"}]}
+        return {"id": suffix.strip("/"), "status": step or "DONE"}
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    tracker = BatchTracker(str(tmp_path / "batch.sqlite"))
+    yield tracker
+    tracker.close()
+
+
+def test_transient_errors_are_recorded_and_retried(tracker):
+    client = _ScriptedClient(tracker, [requests.ConnectionError("reset"), "PROCESSING",
+                                       SentinelHubAuthError("token endpoint down"), "DONE", "DONE"],
+                             tile_failures=[requests.Timeout("read timed out")])
+    seen = []
+    poller = BatchPoller(client, interval=0.01)
+    poller.on_update = lambda job: seen.append(dict(poller.errors))
+    job = poller.watch("job-1").result(timeout=10)
+    assert job["status"] == "DONE"
+    assert any("ConnectionError" in e.get("job-1", "") for e in seen)
+    assert any("Timeout" in e.get("job-1", "") for e in seen)  # tile fetch failed after DONE, retried
+    assert poller.errors == {}
+    assert list(tracker.tile_manifest("job-1")["tile_id"]) == [1, 2]
+    assert tracker.missing_manifests() == []
+
+
+def test_unexpected_error_is_recorded_before_polling_stops(tracker):
+    client = _ScriptedClient(tracker, [KeyError("boom")])
+    poller = BatchPoller(client, interval=0.01)
+    with pytest.raises(KeyError):
+        poller.watch("job-2").result(timeout=10)
+    assert "KeyError" in poller.errors["job-2"]
+
+
+def test_resume_includes_finished_jobs_without_a_manifest(tracker):
+    tracker.record({"id": "running", "status": "PROCESSING"})
+    tracker.record({"id": "done-no-tiles", "status": "DONE"})
+    tracker.record({"id": "done", "status": "DONE"})
+    tracker.write_tiles("done", [])
+    client = _ScriptedClient(tracker, [])
+    poller = BatchPoller(client, interval=0.01)
+    assert sorted(poller.resume()) == ["done-no-tiles", "running"]
+    for job_id in ("done-no-tiles", "running"):
+        assert poller.watch(job_id).result(timeout=10)["status"] == "DONE"
+    assert tracker.missing_manifests() == [] and tracker.active_ids() == []
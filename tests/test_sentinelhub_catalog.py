@@ -0,0 +1,71 @@
+"""Catalog harvests against a local stub search endpoint."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import sentinelhub_catalog, sentinelhub_executor
+from core.http_client import HttpClient
+from core.sentinelhub_catalog import harvest_catalog, split_interval
+
+DAYS = 90
+PER_DAY = 7
+
+
+class _Search(BaseHTTPRequestHandler):
+    """Scenes ``<day>-<n>``; windows share their boundary day, so it is listed twice."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        start, end = (int(t[8:10]) + 31 * (int(t[5:7]) - 1) for t in body["datetime"].split("/"))
+        scenes = [f"{day}-{n}" for day in range(start, min(end, DAYS) + 1) for n in range(PER_DAY)]
+        offset = int(body.get("next") or 0)
+        page = scenes[offset:offset + body["limit"]]
+        payload = {"features": [{"id": s, "properties": {"datetime": s}} for s in page], "context": {}}
+        if offset + body["limit"] < len(scenes):
+            payload["context"]["next"] = offset + body["limit"]
+        raw = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def swagger(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Search)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = HttpClient()
+    monkeypatch.setattr(sentinelhub_executor, "get_client", lambda: client)
+    yield {"servers": [{"url": f"http://127.0.0.1:{server.server_port}"}]}
+    server.shutdown()
+    server.server_close()
+
+
+def test_split_interval():
+    assert split_interval("2023-01-01T00:00:00Z/2023-01-21T00:00:00Z", 10) == [
+        "2023-01-01T00:00:00Z/2023-01-11T00:00:00Z",
+        "2023-01-11T00:00:00Z/2023-01-21T00:00:00Z",
+    ]
+    assert split_interval("2023-01-01T00:00:00Z/..", 10) == ["2023-01-01T00:00:00Z/.."]
+    assert split_interval(None, 10) == [None]
+
+
+def test_harvest_dedups_and_reports_progress_on_the_calling_thread(swagger, tmp_path):
+    calls = []
+    result = harvest_catalog(
+        swagger, {"collections": ["sentinel-2-l2a"], "datetime": "2023-01-01T00:00:00Z/2023-03-01T00:00:00Z"},
+        str(tmp_path / "scenes.ndjson"), window_days=10, token="t", concurrency=4,
+        on_progress=lambda window, n: calls.append((threading.current_thread(), window, n)),
+    )
+    ids = [json.loads(line)["id"] for line in open(result.path)]
+    assert len(ids) == len(set(ids)) == result.features
+    assert result.duplicates == 5 * PER_DAY  # six windows, five shared boundary days
+    assert not result.failed
+    assert calls and all(thread is threading.main_thread() for thread, _, _ in calls)
+    assert len(calls) == result.pages
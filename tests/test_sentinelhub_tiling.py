@@ -0,0 +1,136 @@
+"""Tile planning and tiled Process API downloads against a local stub."""
+import json
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+from rasterio.io import MemoryFile  # noqa: E402
+from rasterio.transform import from_origin  # noqa: E402
+
+from core import sentinelhub_executor  # noqa: E402
+from core.http_client import HttpClient  # noqa: E402
+from core.sentinelhub_tiling import download_tiled, plan_for_body, plan_tiles  # noqa: E402
+
+BBOX = (0.0, 0.0, 100.0, 50.0)
+FAILING_CORNER = [67.0, 0.0]  # minx, miny of the last tile of the bottom row
+
+
+def _tiles_cover_the_grid_once(plan):
+    covered = np.zeros((plan.height, plan.width), dtype=int)
+    for t in plan.tiles:
+        covered[t.y_off:t.y_off + t.height, t.x_off:t.x_off + t.width] += 1
+    return (covered == 1).all()
+
+
+def test_plan_cuts_on_whole_pixels():
+    plan = plan_tiles((0, 0, 10.5, 7), resolution=0.3, max_pixels=10)
+    assert (plan.width, plan.height) == (35, 23)
+    assert plan.res_x * plan.width == pytest.approx(10.5) and plan.res_y * plan.height == pytest.approx(7)
+    for t in plan.tiles:
+        assert all(isinstance(v, int) for v in (t.x_off, t.y_off, t.width, t.height))
+        assert 0 < t.width <= 10 and 0 < t.height <= 10
+        assert t.bbox[2] - t.bbox[0] == pytest.approx(t.width * plan.res_x)
+        assert t.bbox[3] - t.bbox[1] == pytest.approx(t.height * plan.res_y)
+    assert _tiles_cover_the_grid_once(plan)
+
+
+def test_tiles_meet_exactly_at_the_seams():
+    plan = plan_tiles((12.3, 45.6, 12.9, 46.1), width=5003, height=2600)
+    grid = {(t.row, t.col): t for t in plan.tiles}
+    assert len(grid) == 3 * 2
+    for (r, c), t in grid.items():
+        if (r, c + 1) in grid:
+            assert t.bbox[2] == grid[r, c + 1].bbox[0]
+            assert t.bbox[1] == grid[r, c + 1].bbox[1]
+        if (r + 1, c) in grid:
+            assert t.bbox[1] == grid[r + 1, c].bbox[3]
+            assert t.bbox[0] == grid[r + 1, c].bbox[0]
+    minx, miny, maxx, maxy = plan.bbox
+    assert grid[0, 0].bbox[0] == minx and grid[0, 0].bbox[3] == maxy
+    assert grid[1, 2].bbox[2] == pytest.approx(maxx) and grid[1, 2].bbox[1] == pytest.approx(miny)
+    assert _tiles_cover_the_grid_once(plan)
+
+
+def test_size_defaults_to_the_request_output():
+    body = {"input": {"bounds": {"bbox": list(BBOX)}}, "output": {"width": 300, "height": 200}}
+    plan = plan_for_body(body)
+    assert (plan.width, plan.height) == (300, 200)
+
+    body["output"] = {"resx": 2, "resy": 5}
+    plan = plan_for_body(body)
+    assert (plan.width, plan.height) == (50, 10)
+
+    assert (plan_for_body(body, resolution=0.5).width, plan_for_body(body, resolution=0.5).height) == (200, 100)
+    with pytest.raises(ValueError):
+        plan_for_body({"input": {"bounds": {"bbox": list(BBOX)}}})
+
+
+class _Process(BaseHTTPRequestHandler):
+    """Answers each tile with a single-band GeoTIFF filled with its bbox's minx + 1."""
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers["Content-Length"]))
+        message = BytesParser().parsebytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw)
+        parts = {p.get_param("name", header="content-disposition"): p.get_payload(decode=True)
+                 for p in message.get_payload()}
+        body = json.loads(parts["request"])
+        minx, miny = body["input"]["bounds"]["bbox"][:2]
+        width, height = body["output"]["width"], body["output"]["height"]
+        if [minx, miny] == FAILING_CORNER:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        with MemoryFile() as mem:
+            with mem.open(driver="GTiff", width=width, height=height, count=1, dtype="uint8", crs="EPSG:4326",
+                          transform=from_origin(minx, miny + height, 1, 1)) as dst:
+                dst.write(np.full((1, height, width), int(minx) + 1, dtype="uint8"))
+            payload = mem.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "image/tiff")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def swagger(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Process)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = HttpClient()
+    monkeypatch.setattr(sentinelhub_executor, "get_client", lambda: client)
+    yield {"servers": [{"url": f"http://127.0.0.1:{server.server_port}"}]}
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_mosaics_tiles_and_reports_the_failed_one(swagger, tmp_path):
+    body = {
+        "input": {"bounds": {"bbox": list(BBOX)}, "data": [{"type": "sentinel-2-l2a"}]},
+        "output": {"width": 100, "height": 50, "responses": [{"identifier": "default"}]},
+        "evalscript": "//VERSION=3",
+    }
+    progress = []
+    result = download_tiled(swagger, body, str(tmp_path / "aoi.tif"), token="test-token", max_pixels=40,
+                            rate=0, on_progress=lambda done, total: progress.append((done, total)))
+    plan = result.plan
+    assert [(t.x_off, t.width) for t in plan.tiles[:3]] == [(0, 34), (34, 33), (67, 33)]
+    assert list(result.failed) == [(1, 2)]
+    assert "HTTP 500" in result.failed[1, 2]
+    assert progress[-1] == (6, 6)
+
+    with rasterio.open(result.path) as src:
+        assert (src.count, src.height, src.width) == (1, 50, 100)
+        assert src.crs.to_string() == "EPSG:4326"
+        data = src.read(1)
+    for t in plan.tiles:
+        window = data[t.y_off:t.y_off + t.height, t.x_off:t.x_off + t.width]
+        expected = 0 if (t.row, t.col) == (1, 2) else t.x_off + 1
+        assert (window == expected).all(), (t.row, t.col)
@@ -0,0 +1,112 @@
+"""Token caching and refresh against local fake token endpoints."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+import CEMS
+from core import sentinelhub_auth
+from core.http_client import HttpClient
+
+
+class _TokenEndpoint(BaseHTTPRequestHandler):
+    """OAuth2 client-credentials (SentinelHub) and generateToken (ArcGIS) in one stub."""
+    lifetime = 3600
+    calls = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode())
+        with self.lock:
+            type(self).calls += 1
+            n = self.calls
+        time.sleep(0.05)  # slow enough for concurrent callers to pile up
+        if "grant_type" in form:
+            body = {"access_token": f"sh-{n}", "token_type": "Bearer", "expires_in": self.lifetime}
+        else:
+            body = {"token": f"arcgis-{n}", "expires": (time.time() + self.lifetime) * 1000}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def token_url(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TokenEndpoint)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _TokenEndpoint.calls, _TokenEndpoint.lifetime = 0, 3600
+    client = HttpClient()
+    monkeypatch.setattr(sentinelhub_auth, "get_client", lambda: client)
+    monkeypatch.setattr(CEMS, "get_client", lambda: client)
+    monkeypatch.setattr(sentinelhub_auth, "_MANAGERS", {})
+    yield f"http://127.0.0.1:{server.server_port}/token"
+    server.shutdown()
+    server.server_close()
+
+
+def test_100_reruns_make_one_token_request(token_url):
+    # every Streamlit rerun looks the manager up again and asks it for a token
+    tokens = set()
+    for _ in range(100):
+        manager = sentinelhub_auth.get_token_manager("client", "secret", token_url=token_url)
+        tokens.add(manager.get())
+    assert _TokenEndpoint.calls == 1
+    assert tokens == {"sh-1"}
+    assert manager.token["expires_in"] == 3600
+    manager.close()
+
+
+def test_concurrent_sessions_share_one_token_request(token_url):
+    results = []
+
+    def session():
+        results.append(sentinelhub_auth.get_token_manager("client", "secret", token_url=token_url).get())
+
+    threads = [threading.Thread(target=session) for _ in range(100)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert _TokenEndpoint.calls == 1
+    assert set(results) == {"sh-1"}
+    sentinelhub_auth.get_token_manager("client", "secret", token_url=token_url).close()
+
+
+def test_token_is_renewed_ahead_of_expiry(token_url):
+    _TokenEndpoint.lifetime = 2  # refresh margin is capped at half the lifetime: renewed after ~1 s
+    manager = sentinelhub_auth.SentinelHubTokenManager("client", "secret", token_url=token_url, background=False)
+    assert manager.get() == "sh-1"
+    assert manager.get() == "sh-1"
+    time.sleep(1.1)
+    assert manager.get() == "sh-2"
+    assert manager.fetches == 2
+
+
+def test_rejected_token_is_refreshed_once_for_all_callers(token_url):
+    manager = sentinelhub_auth.SentinelHubTokenManager("client", "secret", token_url=token_url, background=False)
+    rejected = manager.get()
+    threads = [threading.Thread(target=manager.refresh, kwargs={"rejected": rejected}) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert manager.get() == "sh-2"
+    assert _TokenEndpoint.calls == 2
+
+
+def test_arcgis_provider_shares_the_lifecycle(token_url):
+    provider = CEMS.ArcGISTokenProvider("user", "pw", url=token_url, background=False)
+    assert [provider.get() for _ in range(100)] == ["arcgis-1"] * 100
+    assert provider.refresh(rejected="arcgis-1") == "arcgis-2"
+    assert provider.refresh(rejected="arcgis-1") == "arcgis-2"  # already replaced by someone else
+    assert _TokenEndpoint.calls == 2
+    assert provider.expires_at > time.time() + 3000
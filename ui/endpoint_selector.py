@@ -1,38 +1,147 @@
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
 import streamlit as st
+from core.openapi_parser import list_api_endpoints
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_CATALOGUES = {}  # spec hash -> EndpointCatalogue, shared by every session
+_CATALOGUES_LOCK = threading.Lock()
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+class EndpointCatalogue:
+    """
+    Lightweight list of (method, path, summary, tags) for one spec plus a token
+    index over path, summary and tags.  Operation bodies are only looked up
+    for the endpoint the user actually picks.
+    """
+
+    def __init__(self, swagger_spec):
+        self.swagger = swagger_spec
+        self.entries = [
+            (e["method"], e["path"], e.get("summary") or "", tuple(e.get("tags") or ()))
+            for e in list_api_endpoints(swagger_spec)
+        ]
+        postings = {}
+        for i, (method, path, summary, tags) in enumerate(self.entries):
+            for tok in set(_tokens(method) + _tokens(path) + _tokens(summary) + _tokens(" ".join(tags))):
+                postings.setdefault(tok, []).append(i)
+        self._postings = postings
+        self._vocab = sorted(postings)
+        self._tags = sorted({t for e in self.entries for t in e[3]})
+        self._searches = OrderedDict()  # small LRU: reruns repeat the same query
+        self._searches_lock = threading.Lock()  # the catalogue is shared by every session
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def tags(self):
+        return self._tags
 
-def select_endpoint(swagger_spec):
+    def label(self, i):
+        method, path, summary, _ = self.entries[i]
+        return f"{method} {path} – {summary}"
+
+    def _prefix_ids(self, prefix):
+        lo = bisect_left(self._vocab, prefix)
+        hi = bisect_right(self._vocab, prefix + "\U0010ffff")
+        ids = set()
+        for tok in self._vocab[lo:hi]:
+            ids.update(self._postings[tok])
+        return ids
+
+    def search(self, query="", tag=None):
+        """Indices of endpoints whose tokens start with every word of ``query`` (AND), in spec order."""
+        key = (query.strip().lower(), tag)
+        with self._searches_lock:
+            if key in self._searches:
+                self._searches.move_to_end(key)
+                return self._searches[key]
+
+        ids = None
+        for word in _tokens(query):
+            matches = self._prefix_ids(word)
+            ids = matches if ids is None else ids & matches
+            if not ids:
+                break
+        result = list(range(len(self.entries))) if ids is None else sorted(ids)
+        if tag:
+            result = [i for i in result if tag in self.entries[i][3]]
+
+        with self._searches_lock:
+            self._searches[key] = result
+            if len(self._searches) > 64:
+                self._searches.popitem(last=False)
+        return result
+
+    def endpoint(self, i):
+        """The full endpoint dict (including the raw operation) for entry ``i``."""
+        method, path, summary, tags = self.entries[i]
+        return {
+            "method": method,
+            "path": path,
+            "summary": summary,
+            "tags": list(tags),
+            "raw": self.swagger.get("paths", {}).get(path, {}).get(method.lower(), {}),
+        }
+
+
+def get_catalogue(swagger_spec):
+    """The catalogue for ``swagger_spec``, built once per spec content hash."""
+    spec_hash = (swagger_spec.get("_index") or {}).get("hash")
+    if spec_hash is None:
+        return EndpointCatalogue(swagger_spec)  # spec not loaded through load_swagger
+    with _CATALOGUES_LOCK:
+        catalogue = _CATALOGUES.get(spec_hash)
+        if catalogue is None:
+            catalogue = _CATALOGUES[spec_hash] = EndpointCatalogue(swagger_spec)
+        return catalogue
+
+
+def select_endpoint(swagger_spec, key="endpoint_selectbox"):
     """
-    Renders a dropdown of all endpoints in the given swagger_spec,
+    Renders a searchable dropdown of the endpoints in the given swagger_spec,
     returning (method, path, endpoint_object) for the user selection.
     """
 
-    # 1. Gather all endpoints from swagger_spec
-    paths = swagger_spec.get("paths", {})
-    endpoint_list = []
-    for path, methods in paths.items():
-        for method, operation in methods.items():
-            endpoint_list.append({
-                "method": method.upper(),
-                "path": path,
-                "summary": operation.get("summary", ""),
-                "raw": operation
-            })
+    # 1. Cached catalogue of all endpoints in swagger_spec
+    catalogue = get_catalogue(swagger_spec)
 
     # 2. If no endpoints found, warn and return None
-    if not endpoint_list:
+    if not len(catalogue):
         st.warning("No endpoints found in the loaded Swagger/OpenAPI spec.")
         return None, None, None
 
-    # 3. Create a label for each endpoint in the selectbox
-    label_func = lambda e: f"{e['method']} {e['path']} – {e['summary']}"
+    # 3. Filter by free text (prefix match on path/summary/tag words) and tag
+    col_query, col_tag = st.columns([3, 1])
+    query = col_query.text_input("Filter endpoints:", key=f"{key}_filter",
+                                 placeholder="e.g. process, catalog search, batch")
+    tag = None
+    if catalogue.tags:
+        tag = col_tag.selectbox("Tag:", options=[None] + catalogue.tags,
+                                format_func=lambda t: "All" if t is None else t, key=f"{key}_tag")
+    matches = catalogue.search(query, tag)
+    if not matches:
+        st.info("No endpoint matches the filter.")
+        return None, None, None
+    if len(matches) < len(catalogue):
+        st.caption(f"{len(matches)} of {len(catalogue)} endpoints")
+
     # 4. Render the dropdown
     selected_index = st.selectbox(
         "Choose an endpoint:",
-        options=range(len(endpoint_list)),
-        format_func=lambda i: label_func(endpoint_list[i]),
-        key="endpoint_selectbox"
+        options=matches,
+        format_func=catalogue.label,
+        key=key
     )
 
     # 5. Retrieve the user's selected endpoint
-    selected = endpoint_list[selected_index]
+    selected = catalogue.endpoint(selected_index)
     return selected["method"], selected["path"], selected
@@ -1,12 +1,13 @@
 import streamlit as st
 from core.openapi_parser import get_parameters_for_endpoint, get_enum_options
+from core.spec_registry import get_registry
 from core.semantic_model import extract_disaster_types
 from core.user_defined_concepts import store_tentative_concept
 from core.field_selector import render_field_selector
 import json
 import textwrap
 
-def render_parameter_input(chosen_endpoint, method):
+def render_parameter_input(chosen_endpoint, method, swagger=None):
     if not chosen_endpoint:
         return {
             "query_params": {},
@@ -77,7 +78,7 @@ def render_parameter_input(chosen_endpoint, method):
             }
 
     # Standard fallback for ReliefWeb and other endpoints
-    query_params, post_body, path_vals = collect_parameters(chosen_endpoint, method)
+    query_params, post_body, path_vals = collect_parameters(chosen_endpoint, method, swagger)
     return {
         "query_params": query_params,
         "post_body": post_body,
@@ -90,12 +91,13 @@ def render_parameter_input(chosen_endpoint, method):
 # [collect_parameters remains unchanged below this point] ...
 
 
-def collect_parameters(chosen_endpoint, method):
+def collect_parameters(chosen_endpoint, method, swagger=None):
     synergy_is_get = method.upper() == "GET"
 
-    # Detect which swagger is in use
-    swagger = st.session_state.get("swagger") or st.session_state.get("sentinel_swagger")
-    is_reliefweb = "rwint-user" in str(swagger) if swagger else False
+    # The caller passes its spec; older pages still keep it in session_state
+    if swagger is None:
+        swagger = st.session_state.get("swagger") or st.session_state.get("sentinel_swagger")
+    is_reliefweb = get_registry().family_of(swagger) == "reliefweb"
 
     query_params = {"appname": "rwint-user-2891143"} if is_reliefweb and synergy_is_get else {}
     post_body = {"appname": "rwint-user-2891143"} if is_reliefweb and not synergy_is_get else {} if not synergy_is_get else None
@@ -114,7 +116,7 @@ def collect_parameters(chosen_endpoint, method):
 
         st.write(f"🔍 Checking parameter: {name}")
         st.write("🔍 Param Schema:", p.get("schema"))
-        enum = get_enum_options(p, st.session_state.swagger)
+        enum = get_enum_options(p, swagger)
         st.write("🔍 Resolved Enum:", enum)
 
         if name == "query[value]":
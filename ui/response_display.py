@@ -1,28 +1,127 @@
+import uuid
 
+import pandas as pd
 import streamlit as st
-import os
-from core.request_builder import save_dataframe_to_csv
+from core.dataset_export import FORMATS, available_formats, dataframe_to_bytes, save_dataset
 
-def show_results(df, raw_json):
+PAGE_SIZES = [25, 50, 100, 250, 1000]
+SAMPLE_ITEMS = 3  # list elements kept per list in the raw JSON sample
+SAMPLE_DEPTH = 6
+
+
+def json_sample(value, max_items=SAMPLE_ITEMS, depth=SAMPLE_DEPTH):
+    """A bounded copy of a JSON document: long lists are cut, deep nesting is elided."""
+    if depth <= 0:
+        return "…" if isinstance(value, (dict, list)) else value
+    if isinstance(value, dict):
+        return {k: json_sample(v, max_items, depth - 1) for k, v in value.items()}
+    if isinstance(value, list):
+        head = [json_sample(v, max_items, depth - 1) for v in value[:max_items]]
+        if len(value) > max_items:
+            head.append(f"… {len(value) - max_items} more")
+        return head
+    if isinstance(value, str) and len(value) > 500:
+        return value[:500] + "…"
+    return value
+
+
+def _schema(df):
+    rows = []
+    for name in df.columns:
+        col = df[name]
+        non_null = col.dropna()
+        kind = str(col.dtype)
+        if kind == "object" and len(non_null):
+            first = non_null.iloc[0]
+            if isinstance(first, list):
+                kind = f"list<{type(first[0]).__name__ if first else 'any'}>"
+            else:
+                kind = type(first).__name__
+        rows.append({"column": name, "type": kind, "non-null": int(len(non_null))})
+    return pd.DataFrame(rows)
+
+
+def store_results(df, raw_json, source="reliefweb", endpoint=None, key="results"):
+    """Keep one copy of a result set in the session for paging across reruns.
+
+    Only the frame (columnar) and a bounded sample of the raw JSON are kept;
+    the full raw response is not.
+    """
+    st.session_state[key] = {
+        "token": uuid.uuid4().hex,
+        "df": df,
+        "raw_sample": json_sample(raw_json),
+        "raw_keys": list(raw_json) if isinstance(raw_json, dict) else None,
+        "source": source,
+        "endpoint": endpoint or st.session_state.get("path_template") or "results",
+        "exports": {},
+        "saved": {},
+    }
+    return st.session_state[key]
+
+
+def show_results(df=None, raw_json=None, source="reliefweb", endpoint=None, key="results"):
+    """Render a result set: summary (row count, schema, raw JSON sample) or a paged table.
+
+    Call with a frame to store a new result set, or without arguments on later
+    reruns to render the stored one.  Only the visible page is sent to the browser.
+    """
+    if df is not None:
+        store_results(df, raw_json, source, endpoint, key)
+    result = st.session_state.get(key)
+    if result is None:
+        return
+    df = result["df"]
     if df.empty:
         st.warning("No results returned.")
         return
 
-    st.session_state.results_df = df.copy()
-    st.session_state.csv_path = save_dataframe_to_csv(df)
-
     st.success(f"✅ Returned {len(df)} results.")
+    view = st.radio("View", ["Summary", "Table"], horizontal=True, key=f"{key}_view")
+
+    if view == "Summary":
+        col_rows, col_cols = st.columns(2)
+        col_rows.metric("Rows", len(df))
+        col_cols.metric("Columns", len(df.columns))
+        if "schema" not in result:
+            result["schema"] = _schema(df)
+        st.dataframe(result["schema"], use_container_width=True, hide_index=True)
+        with st.expander("📄 Raw JSON sample"):
+            if result["raw_keys"]:
+                st.caption("Top-level keys: " + ", ".join(map(str, result["raw_keys"])))
+            st.json(result["raw_sample"])
+    else:
+        st.subheader("📊 Retrieved Results")
+        col_size, col_page = st.columns([1, 3])
+        page_size = col_size.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+        pages = max(1, -(-len(df) // page_size))
+        page = col_page.number_input(f"Page (1–{pages})", min_value=1, max_value=pages, value=1,
+                                      key=f"{key}_page_{result['token'][:8]}")  # back to page 1 for new results
+        start = (int(page) - 1) * page_size
+        window = df.iloc[start:start + page_size]
+        st.dataframe(window, use_container_width=True)
+        st.caption(f"Rows {start + 1}–{start + len(window)} of {len(df)}")
+
+    _export(result, key)
 
-    with st.expander("📄 Full Raw JSON (complete response)"):
-        st.json(raw_json)
 
-    st.subheader("📊 Retrieved Results")
-    st.dataframe(df, use_container_width=True)
+def _export(result, key):
+    formats = available_formats()
+    fmt = st.radio("Export format", formats, index=formats.index("parquet") if "parquet" in formats else 0,
+                   horizontal=True, key=f"{key}_export_format")
+    # Serialized (and saved into the partitioned dataset) once per result set and format
+    if fmt not in result["exports"]:
+        result["exports"] = {fmt: dataframe_to_bytes(result["df"], fmt)}  # keep only the latest buffer
+    if fmt not in result["saved"]:
+        result["saved"][fmt] = save_dataset(result["df"], fmt, source=result["source"],
+                                            endpoint=result["endpoint"], data=result["exports"][fmt])
+    st.caption(f"Saved to `{result['saved'][fmt]}`")
 
-    with open(st.session_state.csv_path, "rb") as f:
-        st.download_button(
-            "Download CSV",
-            data=f,
-            file_name=os.path.basename(st.session_state.csv_path),
-            mime="text/csv"
-        )
+    endpoint = result["endpoint"].strip("/").replace("/", "_") or "results"
+    st.download_button(
+        f"Download {fmt.upper()}",
+        data=result["exports"][fmt],
+        file_name=f"{result['source']}_{endpoint}.{FORMATS[fmt]['ext']}",
+        mime=FORMATS[fmt]["mime"],
+        key=f"{key}_download"
+    )
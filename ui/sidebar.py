@@ -1,20 +1,24 @@
 import streamlit as st
 from core.openapi_parser import load_swagger
 from core.semantic_model import load_ontology
+from core.spec_registry import get_registry
 import os
 
 def render_sidebar():
     st.sidebar.header("Load Description File, Ontologies & Semantic Model")
 
     # === Swagger Handling ===
-    default_swagger_path = "C:/Users/grujd/PycharmProjects/JSTARS_2025-Version1/.venv/data/API_Definition_Files/reliefweb_openapi_31_enhanced_current.yaml"
-    if "swagger" not in st.session_state and os.path.exists(default_swagger_path):
-        with open(default_swagger_path, "rb") as f:
-            st.session_state.swagger = load_swagger(f)
+    registry = get_registry()
+    if "swagger" not in st.session_state:
+        default_entry = registry.default("reliefweb")
+        if default_entry:
+            st.session_state.swagger = default_entry.swagger
+            st.session_state.api_id = default_entry.id
 
     swagger_file = st.sidebar.file_uploader("Upload Swagger/OpenAPI YAML", type=["yaml"], key="swagger_file")
     if swagger_file:
         st.session_state.swagger = load_swagger(swagger_file)
+        st.session_state.api_id = registry.register(st.session_state.swagger, swagger_file.name).id
 
     if "swagger" in st.session_state:
         st.sidebar.success("✅ OpenAPI file loaded successfully!")